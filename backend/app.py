@@ -1,4 +1,4 @@
-﻿from flask import Flask, request, jsonify, send_from_directory
+﻿from flask import Flask, request, jsonify, send_from_directory, Response
 from flask_cors import CORS
 from dotenv import load_dotenv
 import asyncio
@@ -11,13 +11,14 @@ import sys
 load_dotenv()
 
 # Import our scripts
-import script
 import gee
-import gee
-import opencv_superimpose
-import groq_service
-import dashboard_insights_service
+import pipeline
+import jobs
+import batch
+import metrics
 import report_service
+import pipeline_context
+import plot_index
 
 
 
@@ -25,6 +26,9 @@ import report_service
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
 
+# Earth Engine session setup takes seconds; do it once per worker, off the request path
+gee.start_warmup()
+
 # Define absolute path for downloads directory (pointing to project_root/downloads)
 # app.py is in backend/, so we go up one level
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -58,197 +62,155 @@ def run_analysis():
                 "error": "Zone parameter is required"
             }), 400
         
-        print(f"\n{'='*60}")
-        print(f"Starting analysis for zone: {zone}")
-        print(f"{'='*60}\n")
-        
-        # Step 1: Run script.py to scrape industrial area data
-        print("Step 1: Running script.py...")
-        script_result = asyncio.run(script.run(zone))
-        
-        if script_result['status'] != 'success':
-            return jsonify({
-                "status": "error",
-                "error": f"Script.py failed: {script_result.get('error', 'Unknown error')}"
-            }), 500
-        
-        json_path = script_result.get('json_path')
-        image_path = script_result.get('image_path')
-        
-        print(f"âœ“ Script.py completed")
-        print(f"  - Image: {image_path}")
-        print(f"  - JSON: {json_path}\n")
-        
-        # Step 2: Run gee.py to fetch satellite/OSM images
-        print("Step 2: Running gee.py...")
-        gee_result = gee.main(json_path)
-        
-        if gee_result['status'] != 'success':
-            print(f"❌ GEE.py failed! Error: {gee_result.get('error')}")
-            print(f"Detailed Result: {json.dumps(gee_result, indent=2, default=str)}")
-            return jsonify({
-                "status": "error",
-                "error": f"GEE.py failed: {gee_result.get('error', 'Unknown error')}"
-            }), 500
-        
-        satellite_path = gee_result.get('satellite_image')
-        osm_path = gee_result.get('osm_image')
-        
-        print(f"âœ“ GEE.py completed")
-        print(f"  - Satellite: {satellite_path}")
-        print(f"  - OSM: {osm_path}\n")
-        
-        # Step 3: Run Encroachment Detection
-        print("Step 3: Running Encroachment Detection...")
-        
-        # We need historical_satellite and current_satellite from gee_result
-        # gee.py returns:
-        # "current_satellite": path
-        # "historical_satellite_2years" or "historical_satellite": path (depending on version)
-        
-        # Let's handle keys safely
-        past_sat_path = gee_result.get('historical_satellite_2years') or gee_result.get('historical_satellite')
-        current_sat_path = gee_result.get('current_satellite') or gee_result.get('satellite_image') # fallback
-        
-        if not past_sat_path or not current_sat_path:
-             print(f"âš  Missing satellite images for detection. Past: {past_sat_path}, Present: {current_sat_path}")
-             encroachment_result = {"status": "skipped", "error": "Missing satellite images"}
-        else:
-            try:
-                detector = opencv_superimpose.EncroachmentDetector(zone)
-                encroachment_result = detector.process(
-                    image_path,      # CSIDC map (boundary source)
-                    past_sat_path,   # Past Satellite (Yellow)
-                    current_sat_path # Present Satellite (Blue)
-                )
-                print(f"âœ“ Encroachment Analysis completed")
-                print(f"  - Analysis Image: {encroachment_result.get('analysis_image')}")
-                print(f"  - Metrics: {encroachment_result.get('metrics')}\n")
-            except Exception as e:
-                print(f"âš  Encroachment Analysis failed: {e}")
-                import traceback
-                traceback.print_exc()
-                encroachment_result = {"status": "error", "error": str(e)}
-        
-        # Step 4: Run Groq Vision Analysis (if encroachment detection succeeded)
-        groq_analysis = None
-        if encroachment_result.get('status') == 'success':
-            print("Step 4: Running Groq Vision Analysis...")
-            try:
-                groq_analysis = groq_service.analyze_encroachment(
-                    past_sat_path,
-                    current_sat_path,
-                    encroachment_result.get('analysis_image'),
-                    area_name=zone
-                )
-                
-                if groq_analysis.get('error'):
-                    print(f"⚠ Groq Analysis failed: {groq_analysis['error']}")
-                    print("  Continuing without AI analysis...")
-                else:
-                    print(f"✓ Groq Analysis completed")
-                    print(f"  - Status: {groq_analysis.get('encroachment_status')}")
-                    print(f"  - Construction: {groq_analysis.get('construction_percentage')}%")
-                    print(f"  - Vegetation: {groq_analysis.get('vegetation_percentage')}%")
-                    print(f"  - Idle Status: {groq_analysis.get('idle_status')}\n")
-            except Exception as e:
-                print(f"⚠ Groq Analysis exception: {e}")
-                print("  Continuing without AI analysis...")
-                groq_analysis = {"error": str(e)}
-        else:
-            print("⚠ Skipping Groq Analysis (encroachment detection failed)\n")
-
-        
-        # Step 5: Generate Comprehensive Dashboard Insights
-        dashboard_insights = None
-        if groq_analysis and not groq_analysis.get('error'):
-            print("Step 5: Generating Comprehensive Report with LLM...")
-            try:
-                dashboard_insights = dashboard_insights_service.generate_comprehensive_report(
-                    zone,
-                    encroachment_result.get('metrics') if encroachment_result.get('status') == 'success' else None,
-                    groq_analysis
-                )
-                
-                if dashboard_insights.get('error'):
-                    print(f"⚠ Insights generation failed: {dashboard_insights['error']}")
-                    print("  Continuing without LLM insights...")
-                else:
-                    print(f"✓ Comprehensive Report Generated")
-                    print(f"  - Sections: {list(dashboard_insights.keys())}\n")
-            except Exception as e:
-                print(f"⚠ Report generation exception: {e}")
-                print("  Continuing without LLM insights...")
-                dashboard_insights = {"error": str(e)}
-        else:
-            print("⚠ Skipping Dashboard Insights (Groq analysis unavailable)\n")
-
-        # Step 6: Detailed Plot Status Detection (New Step)
-        plot_status = None
-        if encroachment_result.get('status') == 'success' and image_path:
-             print("Step 6: Detecting specific plot status (Encroachment/Idle/Veg)...")
-             try:
-                 plot_status = groq_service.detect_plot_status(
-                     image_path, # Original CSIDC map with plot numbers
-                     encroachment_result.get('analysis_image'), # Analysis result
-                     zone
-                 )
-                 
-                 if plot_status.get('error'):
-                     print(f"⚠ Plot status detection failed: {plot_status['error']}")
-                 else:
-                     print(f"✓ Plot Status Detected")
-                     print(f"  - Encroachment Risk: {plot_status.get('encroachment_plots')}")
-                     print(f"  - Idle: {plot_status.get('idle_plots')}")
-                     
-                     # Merge into dashboard_insights if it exists, or create a partial one
-                     if dashboard_insights:
-                         dashboard_insights['plot_status'] = plot_status
-                     else:
-                         dashboard_insights = {'plot_status': plot_status}
-                         
-             except Exception as e:
-                 print(f"⚠ Plot detection exception: {e}")
-
-
+        response = pipeline.run_pipeline(zone)
         
-        # Prepare response with image filenames
-        response = {
-            "status": "success",
-            "zone": zone,
-            "images": {
-                "industrial_area": os.path.basename(image_path) if image_path else None,
-                "satellite_present": os.path.basename(current_sat_path) if current_sat_path else None,
-                "satellite_past": os.path.basename(past_sat_path) if past_sat_path else None,
-                "osm": os.path.basename(osm_path) if osm_path else None,
-                "encroachment_analysis": os.path.basename(encroachment_result.get('analysis_image')) if encroachment_result.get('status') == 'success' else None,
-                "past_overlay": os.path.basename(encroachment_result.get('past_overlay')) if encroachment_result.get('status') == 'success' else None,
-                "present_overlay": os.path.basename(encroachment_result.get('present_overlay')) if encroachment_result.get('status') == 'success' else None
-            },
-            "metrics": encroachment_result.get('metrics') if encroachment_result.get('status') == 'success' else None,
-            "groq_analysis": groq_analysis if groq_analysis and not groq_analysis.get('error') else None,
-            "dashboard_insights": dashboard_insights if dashboard_insights and not dashboard_insights.get('error') else None
-        }
-        
-        print(f"{'='*60}")
-        print("Analysis completed successfully!")
-        print(f"{'='*60}\n")
+        if response['status'] != 'success':
+            return jsonify(response), 500
         
         return jsonify(response), 200
         
     except Exception as e:
-        print(f"âœ— Error in run_analysis: {str(e)}")
+        print(f"✗ Error in run_analysis: {str(e)}")
         return jsonify({
             "status": "error",
             "error": str(e)
         }), 500
 
+@app.route('/api/run-analysis-batch', methods=['POST'])
+def run_analysis_batch():
+    """
+    Run the analysis for several zones, streaming results as they finish.
+    
+    Expected JSON body: { "zones": ["Kapan", "Borai"] | "all", "concurrency": 2 }
+    
+    Returns: newline-delimited JSON (application/x-ndjson), one object per line:
+        {"type": "zones", "zones": [...], "concurrency": 2}
+        {"type": "result", "zone": "Kapan", "status": "success", "result": {...}}
+        ...
+        {"type": "summary", "total": 2, "succeeded": 2, "failed": 0}
+    """
+    data = request.get_json(silent=True) or {}
+    zones = data.get('zones')
+    
+    if zones != "all" and (not isinstance(zones, list) or not zones
+                           or not all(isinstance(z, str) and z.strip() for z in zones)):
+        return jsonify({
+            "status": "error",
+            "error": 'zones must be a non-empty list of zone names or "all"'
+        }), 400
+    
+    try:
+        concurrency = int(data.get('concurrency', batch.DEFAULT_CONCURRENCY))
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "error": "concurrency must be an integer"}), 400
+    
+    def generate():
+        try:
+            for event in batch.run_batch(zones, concurrency):
+                yield json.dumps(event, default=str) + "\n"
+        except Exception as e:
+            print(f"✗ Error in run_analysis_batch: {str(e)}")
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue an analysis run and return immediately.
+    
+    Expected JSON body: { "zone": "Kapan" }
+    
+    Returns: 202 { "status": "queued", "job_id": "...", "status_url": "/api/jobs/<id>" }
+    """
+    data = request.get_json(silent=True) or {}
+    zone = data.get('zone')
+    
+    if not zone:
+        return jsonify({
+            "status": "error",
+            "error": "Zone parameter is required"
+        }), 400
+    
+    try:
+        job = jobs.manager.submit(zone)
+    except jobs.QueueFullError as e:
+        return jsonify({"status": "error", "error": str(e)}), 503
+    
+    return jsonify({
+        "status": "queued",
+        "job_id": job.id,
+        "zone": zone,
+        "status_url": f"/api/jobs/{job.id}"
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Return per-step status of a queued analysis and, once finished,
+    the same payload /api/run-analysis would have returned.
+    """
+    job = jobs.manager.get(job_id)
+    if not job:
+        return jsonify({
+            "status": "error",
+            "error": f"Unknown job: {job_id}"
+        }), 404
+    
+    return jsonify(job.to_dict()), 200
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """
+    Stream a job's progress as Server-Sent Events.
+    
+    Each event carries the step name, its status ('running', 'success',
+    'skipped', 'error'), timings and partial results (image filenames,
+    detector metrics) as soon as the step finishes. The stream ends after
+    the final "job" event, which holds the full analysis payload.
+    Reconnecting clients resume from the Last-Event-ID header.
+    """
+    job = jobs.manager.get(job_id)
+    if not job:
+        return jsonify({
+            "status": "error",
+            "error": f"Unknown job: {job_id}"
+        }), 404
+    
+    try:
+        start = int(request.headers.get('Last-Event-ID', -1)) + 1
+    except ValueError:
+        start = 0
+    
+    def generate():
+        cursor = start
+        while True:
+            events = job.wait_for_events(cursor)
+            if not events and job.finished:
+                return
+            if not events:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                cursor = event["id"] + 1
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+                if event["type"] == "job" and event["status"] in ("succeeded", "failed"):
+                    return
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 @app.route('/api/images/<filename>', methods=['GET'])
 def get_image(filename):
     """
     Serve images from the downloads directory.
     """
     try:
+        # Stage events can announce an image before its background write lands
+        pipeline_context.wait_for_write(os.path.join(DOWNLOAD_DIR, filename))
         return send_from_directory(DOWNLOAD_DIR, filename)
     except Exception as e:
         return jsonify({
@@ -256,6 +218,60 @@ def get_image(filename):
             "error": f"Image not found: {str(e)}"
         }), 404
 
+@app.route('/api/zones/<zone>/plots', methods=['GET'])
+def query_plots(zone):
+    """
+    Look up plots in a zone's plot index (written by the last analysis).
+    
+    Query: ?lat=&lon= for the plot containing a point, or
+    ?bbox=west,south,east,north for the plots intersecting a box; ?x=&y= and
+    ?pixel_bbox=x0,y0,x1,y1 do the same on the imagery grid. Without any,
+    lists the indexed plot ids. "source" is "contours" when the plots were
+    traced from the map image; such an index is not georeferenced and only
+    answers pixel queries.
+    """
+    index = plot_index.load(zone)
+    if index is None:
+        return jsonify({
+            "status": "error",
+            "error": f"No plot index for {zone}; run an analysis first"
+        }), 404
+    
+    result = {"status": "success", "zone": zone, "source": index.source}
+    try:
+        if request.args.get('x') and request.args.get('y'):
+            result["plot_id"] = index.locate(float(request.args['x']), float(request.args['y']))
+            return jsonify(result), 200
+        if request.args.get('pixel_bbox'):
+            box = [float(v) for v in request.args['pixel_bbox'].split(',')]
+            if len(box) != 4:
+                raise ValueError("pixel_bbox needs x0,y0,x1,y1")
+            result["plot_ids"] = index.query_bbox(box)
+            return jsonify(result), 200
+        if request.args.get('lat') and request.args.get('lon'):
+            lat, lon = float(request.args['lat']), float(request.args['lon'])
+            result["plot_id"] = index.locate_lonlat(lat, lon)
+            return jsonify(result), 200
+        if request.args.get('bbox'):
+            bbox = [float(v) for v in request.args['bbox'].split(',')]
+            if len(bbox) != 4:
+                raise ValueError("bbox needs west,south,east,north")
+            result["plot_ids"] = index.query_lonlat_bbox(bbox)
+            return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"status": "error", "source": index.source, "error": str(e)}), 400
+    
+    result["plot_ids"] = [p["plot_id"] for p in index.plots]
+    return jsonify(result), 200
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Per-stage latency histograms, stage outcome counters, bytes transferred
+    and cache hit counts in Prometheus text format.
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """
@@ -263,6 +279,7 @@ def health_check():
     """
     return jsonify({
         "status": "healthy",
+        "earth_engine": gee.ee_status(),
         "timestamp": datetime.now().isoformat()
     }), 200
 
@@ -300,7 +317,13 @@ if __name__ == '__main__':
     print("Server starting on http://localhost:5000")
     print("Endpoints:")
     print("  - POST /api/run-analysis")
+    print("  - POST /api/run-analysis-batch")
+    print("  - POST /api/jobs")
+    print("  - GET  /api/jobs/<job_id>")
+    print("  - GET  /api/jobs/<job_id>/events")
     print("  - GET  /api/images/<filename>")
+    print("  - GET  /api/zones/<zone>/plots")
+    print("  - GET  /api/metrics")
     print("  - GET  /api/health")
     print("="*60 + "\n")
     
@@ -0,0 +1,193 @@
+"""
+Content-addressed cache for scraped maps and fetched imagery.
+
+Entries are keyed by (zone, source, bbox, acquisition window). The file
+itself is stored once under downloads/cache/blobs/<sha256><ext>, so two
+keys producing identical bytes share one blob. An SQLite index records
+sizes and access times; entries expire after ARTIFACT_CACHE_TTL seconds
+and the least recently used ones are evicted once the blobs exceed
+ARTIFACT_CACHE_MAX_BYTES.
+"""
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+
+import metrics
+
+# artifact_cache.py is in backend/, so we go up one level
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOWNLOAD_DIR = os.path.join(BASE_DIR, "downloads")
+CACHE_DIR = os.environ.get("ARTIFACT_CACHE_DIR", os.path.join(DOWNLOAD_DIR, "cache"))
+BLOB_DIR = os.path.join(CACHE_DIR, "blobs")
+INDEX_PATH = os.path.join(CACHE_DIR, "index.sqlite3")
+
+ENABLED = os.environ.get("ARTIFACT_CACHE_ENABLED", "1") not in ("0", "false", "False")
+TTL_SECONDS = int(os.environ.get("ARTIFACT_CACHE_TTL", 24 * 3600))
+MAX_BYTES = int(os.environ.get("ARTIFACT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _db():
+    global _conn
+    if _conn is None:
+        os.makedirs(BLOB_DIR, exist_ok=True)
+        _conn = sqlite3.connect(INDEX_PATH, check_same_thread=False)
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                zone TEXT,
+                source TEXT,
+                params TEXT,
+                blob TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        _conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        _conn.commit()
+    return _conn
+
+
+def make_key(zone, source, bbox=None, window=None):
+    """Stable hash of the cache key fields."""
+    params = json.dumps({"zone": zone, "source": source, "bbox": bbox, "window": window},
+                        sort_keys=True, default=str)
+    return hashlib.sha256(params.encode("utf-8")).hexdigest(), params
+
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _blob_path(blob):
+    return os.path.join(BLOB_DIR, blob)
+
+
+def _delete_entry(conn, key, blob):
+    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+    still_used = conn.execute("SELECT 1 FROM entries WHERE blob = ? LIMIT 1", (blob,)).fetchone()
+    if not still_used:
+        try:
+            os.remove(_blob_path(blob))
+        except FileNotFoundError:
+            pass
+
+
+def get(zone, source, bbox=None, window=None):
+    """
+    Look up an artifact.
+
+    Returns:
+        str | None: Path of the cached blob, or None on a miss/expired entry.
+            The blob can still be evicted before the caller reads it, so
+            readers treat OSError as a miss.
+    """
+    if not ENABLED:
+        return None
+
+    key, _ = make_key(zone, source, bbox, window)
+    with _lock:
+        conn = _db()
+        row = conn.execute("SELECT blob, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if not row:
+            metrics.CACHE_LOOKUPS.inc(source=source, result="miss")
+            return None
+
+        blob, created_at = row
+        path = _blob_path(blob)
+        if time.time() - created_at > TTL_SECONDS or not os.path.exists(path):
+            _delete_entry(conn, key, blob)
+            conn.commit()
+            metrics.CACHE_LOOKUPS.inc(source=source, result="miss")
+            return None
+
+        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        conn.commit()
+        metrics.CACHE_LOOKUPS.inc(source=source, result="hit")
+        return path
+
+
+def put(zone, source, file_path, bbox=None, window=None):
+    """
+    Store a file under the given key and evict old entries if over budget.
+
+    Returns:
+        str | None: Path of the stored blob
+    """
+    if not ENABLED or not file_path or not os.path.exists(file_path):
+        return None
+
+    key, params = make_key(zone, source, bbox, window)
+    blob = _sha256_file(file_path) + os.path.splitext(file_path)[1]
+    path = _blob_path(blob)
+
+    with _lock:
+        conn = _db()
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            shutil.copyfile(file_path, tmp_path)
+            os.replace(tmp_path, path)
+
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, zone, source, params, blob, size, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, zone, source, params, blob, os.path.getsize(path), now, now)
+        )
+        _evict(conn)
+        conn.commit()
+    return path
+
+
+def _evict(conn):
+    """Drop expired entries, then least recently used ones until under MAX_BYTES."""
+    cutoff = time.time() - TTL_SECONDS
+    for key, blob in conn.execute("SELECT key, blob FROM entries WHERE created_at < ?", (cutoff,)).fetchall():
+        _delete_entry(conn, key, blob)
+
+    # Blobs are shared between keys, so count each one once
+    total = conn.execute(
+        "SELECT COALESCE(SUM(size), 0) FROM (SELECT blob, MAX(size) AS size FROM entries GROUP BY blob)"
+    ).fetchone()[0]
+    if total <= MAX_BYTES:
+        return
+
+    for key, blob, size in conn.execute("SELECT key, blob, size FROM entries ORDER BY last_access ASC").fetchall():
+        _delete_entry(conn, key, blob)
+        if not os.path.exists(_blob_path(blob)):
+            total -= size
+        if total <= MAX_BYTES:
+            break
+
+
+def materialize(blob_path, dest_path):
+    """
+    Copy a cached blob to its usual place in downloads/ so it can be served
+    by name. Blobs are never handed out directly because later steps write
+    to the downloaded files in place.
+    """
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    shutil.copyfile(blob_path, dest_path)
+    return dest_path
+
+
+def stats():
+    """Entry count and total blob bytes, for diagnostics."""
+    with _lock:
+        conn = _db()
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT blob, MAX(size) AS size FROM entries GROUP BY blob)"
+        ).fetchone()[0]
+    return {"entries": entries, "bytes": total, "max_bytes": MAX_BYTES, "ttl_seconds": TTL_SECONDS}
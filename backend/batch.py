@@ -0,0 +1,79 @@
+"""
+Multi-zone batch analysis.
+
+Runs pipeline.run_pipeline for several zones at once with bounded
+concurrency. All zones scrape through the worker's persistent browser
+pool (browser_pool.py) instead of launching a browser per zone, and
+results are yielded as each zone finishes so the endpoint can stream them.
+"""
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import browser_pool
+import pipeline
+
+# Zones analysed at the same time when the request doesn't say
+DEFAULT_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 2))
+# Upper bound on the concurrency a request may ask for
+MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", 4))
+
+
+def _run_zone(zone):
+    start = time.perf_counter()
+    try:
+        result = pipeline.run_pipeline(zone)
+    except Exception as e:
+        traceback.print_exc()
+        result = {"status": "error", "zone": zone, "error": str(e)}
+    return result, round(time.perf_counter() - start, 3)
+
+
+def run_batch(zones, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Analyse several zones, yielding events as they complete.
+
+    Args:
+        zones (list[str] | str): Zone names, or "all" for every option in
+            the CSIDC Old Industrial Area dropdown
+        concurrency (int): Zones analysed at once, capped at MAX_CONCURRENCY
+
+    Yields:
+        dict: {"type": "zones", ...} once, then one {"type": "result", ...}
+            per zone in completion order, then a final {"type": "summary", ...}
+    """
+    concurrency = max(1, min(int(concurrency), MAX_CONCURRENCY))
+    batch_start = time.perf_counter()
+
+    if zones == "all":
+        zones = browser_pool.get_pool().zones()
+    yield {"type": "zones", "zones": zones, "concurrency": concurrency}
+
+    succeeded = 0
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+    try:
+        futures = {executor.submit(_run_zone, zone): zone for zone in zones}
+        for future in as_completed(futures):
+            zone = futures[future]
+            result, elapsed = future.result()
+            if result.get("status") == "success":
+                succeeded += 1
+            yield {
+                "type": "result",
+                "zone": zone,
+                "status": result.get("status"),
+                "duration_seconds": elapsed,
+                "result": result,
+            }
+    finally:
+        # Drop zones that haven't started if the client went away
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    yield {
+        "type": "summary",
+        "total": len(zones),
+        "succeeded": succeeded,
+        "failed": len(zones) - succeeded,
+        "duration_seconds": round(time.perf_counter() - batch_start, 3),
+    }
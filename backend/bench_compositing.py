@@ -0,0 +1,113 @@
+"""
+Compositing benchmark: EncroachmentDetector.composite against the former
+per-overlay sequence (create_overlay twice, then bitwise masks and blends),
+kept here as the reference implementation.
+
+    python backend/bench_compositing.py --sizes 1024,4096,8192 --repeat 3
+
+Uses synthetic past/present frames with a grid of plot lines. Reports the
+per-zone time (best of --repeat, after a warm-up run that allocates the
+scratch buffers) and the peak memory allocated during one run (tracemalloc
+sees numpy and OpenCV output arrays). Both paths must produce identical
+images and match counts.
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from opencv_superimpose import EncroachmentDetector
+
+
+def create_overlay(background_img, boundary_mask, color):
+    """The former EncroachmentDetector.create_overlay: boundary_mask painted in color (B, G, R)."""
+    colored_mask = np.zeros_like(background_img)
+    colored_mask[:] = color
+    overlay = cv2.bitwise_and(colored_mask, colored_mask, mask=boundary_mask)
+    mask_inv = cv2.bitwise_not(boundary_mask)
+    bg_bg = cv2.bitwise_and(background_img, background_img, mask=mask_inv)
+    overlay_fg = cv2.bitwise_and(overlay, overlay, mask=boundary_mask)
+    return cv2.add(bg_bg, overlay_fg), overlay_fg
+
+
+def legacy_composite(detector, past_img, present_img, mask):
+    """The overlay and composite steps of process() before the fused pass."""
+    past_out, _ = create_overlay(past_img, mask, (0, 255, 255))
+    present_out, _ = create_overlay(present_img, mask, (255, 0, 0))
+    mask_past = mask_present = mask
+    final_composite = np.zeros_like(past_img)
+    background_blend = cv2.addWeighted(past_img, 0.5, present_img, 0.5, 0)
+    intersection = cv2.bitwise_and(mask_past, mask_present)
+    past_only = cv2.bitwise_and(mask_past, cv2.bitwise_not(mask_present))
+    present_only = cv2.bitwise_and(mask_present, cv2.bitwise_not(mask_past))
+    final_composite[intersection > 0] = (0, 255, 0)
+    final_composite[past_only > 0] = (0, 255, 255)
+    final_composite[present_only > 0] = (255, 0, 0)
+    total_mask = cv2.bitwise_or(mask_past, mask_present)
+    mask_inv = cv2.bitwise_not(total_mask)
+    bg_part = cv2.bitwise_and(background_blend, background_blend, mask=mask_inv)
+    fg_part = cv2.bitwise_and(final_composite, final_composite, mask=total_mask)
+    final_output = cv2.add(bg_part, fg_part)
+    return past_out, present_out, final_output, (int(np.sum(total_mask > 0)), int(np.sum(intersection > 0)))
+
+
+def fused_composite(detector, past_img, present_img, mask):
+    past_out, present_out, final_output, counts = detector.composite(past_img, present_img, mask)
+    return past_out, present_out, final_output, (int(counts[1:].sum()), int(counts[3]))
+
+
+def synthetic_frames(size, seed=0):
+    rng = np.random.default_rng(seed)
+    past = rng.integers(40, 200, size=(size, size, 3), dtype=np.uint8)
+    present = past.copy()
+    present[size // 4:size // 2, size // 4:size // 2] = (200, 200, 205)
+    mask = np.zeros((size, size), dtype=np.uint8)
+    for v in range(0, size, max(16, size // 20)):
+        cv2.line(mask, (v, 0), (v, size - 1), 255, 3)
+        cv2.line(mask, (0, v), (size - 1, v), 255, 3)
+    return past, present, mask
+
+
+def measure(func, detector, frames, repeat):
+    func(detector, *frames)  # warm-up
+    best = min(_timed(func, detector, frames) for _ in range(repeat))
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    result = func(detector, *frames)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def _timed(func, detector, frames):
+    start = time.perf_counter()
+    func(detector, *frames)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1024,4096,8192")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    detector = EncroachmentDetector("bench")
+    print(f"{'size':>6} {'legacy ms':>10} {'fused ms':>10} {'legacy MB':>10} {'fused MB':>10}")
+    for size in (int(v) for v in args.sizes.split(",")):
+        frames = synthetic_frames(size)
+        legacy_t, legacy_peak, legacy = measure(legacy_composite, detector, frames, args.repeat)
+        fused_t, fused_peak, fused = measure(fused_composite, detector, frames, args.repeat)
+        for a, b in zip(legacy, fused):
+            assert np.array_equal(a, b), f"fused output differs from legacy at {size}px"
+        print(f"{size:>6} {legacy_t * 1000:>10.1f} {fused_t * 1000:>10.1f} "
+              f"{legacy_peak / 2**20:>10.1f} {fused_peak / 2**20:>10.1f}")
+        del frames, legacy, fused
+
+
+if __name__ == "__main__":
+    main()
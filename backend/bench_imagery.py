@@ -0,0 +1,95 @@
+"""
+Imagery throughput benchmark against the local stand-in (standin_server.py).
+
+    python backend/standin_server.py --latency-ms 80 --error-rate 0.02 &
+    python backend/bench_imagery.py --zones 20 --concurrency 4
+
+Runs the current, street map and historical fetch stages (gee.fetch_stages)
+for synthetic zones around Raipur with all providers set to "standin", and
+reports zones per second plus per-zone latency percentiles. Zone names
+include a run id, so the artifact cache never short-circuits a fetch.
+Images and the artifact cache (with its tile and Wayback caches) go to a
+temporary directory, removed afterwards unless --keep, so the benchmark
+never touches downloads/ or the production cache.
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Providers and the cache location are read at import time
+for _kind in ("CURRENT", "STREET", "HISTORICAL"):
+    os.environ.setdefault(f"IMAGERY_{_kind}_PROVIDER", "standin")
+WORK_DIR = tempfile.mkdtemp(prefix="bench_imagery_")
+os.environ["ARTIFACT_CACHE_DIR"] = os.path.join(WORK_DIR, "cache")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import gee
+from dag import Stage, run_stages
+from pipeline_context import PipelineContext
+
+CENTRE = (21.25, 81.63)
+
+gee.DOWNLOAD_DIR = os.path.join(WORK_DIR, "downloads")
+os.makedirs(gee.DOWNLOAD_DIR, exist_ok=True)
+
+
+def run_zone(name, latitude, longitude):
+    context = PipelineContext()
+    stages = [
+        Stage("location", lambda r: (name, latitude, longitude)),
+        Stage("grid", lambda r: gee.point_grid(latitude, longitude), deps=["location"]),
+    ] + gee.fetch_stages(context=context)
+    start = time.perf_counter()
+    run = run_stages(stages, max_workers=3)
+    context.flush()
+    ok = all(run["results"].get(step) for step in ("current_satellite", "current_osm", "historical_satellite"))
+    return time.perf_counter() - start, ok
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def bench(args):
+    rng = random.Random(args.seed)
+    run_id = int(time.time())
+    zones = [(f"bench{run_id}_{i}", CENTRE[0] + rng.uniform(-0.2, 0.2), CENTRE[1] + rng.uniform(-0.2, 0.2))
+             for i in range(args.zones)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda z: run_zone(*z), zones))
+    elapsed = time.perf_counter() - start
+
+    latencies = [t for t, _ in results]
+    failed = sum(1 for _, ok in results if not ok)
+    print(f"\n{args.zones} zones, concurrency {args.concurrency}: {elapsed:.2f}s, "
+          f"{args.zones / elapsed:.2f} zones/s, {failed} incomplete")
+    print(f"zone latency p50 {percentile(latencies, 0.5):.2f}s  p95 {percentile(latencies, 0.95):.2f}s  "
+          f"max {max(latencies):.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--zones", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the temporary images and cache")
+    args = parser.parse_args()
+    try:
+        bench(args)
+    finally:
+        if args.keep:
+            print(f"Artifacts kept in {WORK_DIR}")
+        else:
+            shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Persistent Playwright browser pool for the CSIDC scraper.
+
+Launching Chromium costs several seconds and a few hundred MB per run, so
+each worker process keeps one browser and a small pool of warm contexts
+alive. script.run borrows a context, opens a fresh page in it and hands
+it back. A context is recycled after BROWSER_CONTEXT_MAX_USES scrapes or
+as soon as a scrape on it fails, and the browser is relaunched if it
+disconnects.
+
+Playwright objects belong to the event loop that created them, so the pool
+runs its own loop on a background thread; callers on any thread use the
+blocking run()/zones() helpers.
+"""
+import os
+import atexit
+import asyncio
+import threading
+
+from playwright.async_api import async_playwright
+
+import script
+
+# Warm contexts kept per worker process (also the number of concurrent scrapes)
+POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", 2))
+# Scrapes served by one context before it is closed and replaced
+CONTEXT_MAX_USES = int(os.environ.get("BROWSER_CONTEXT_MAX_USES", 20))
+ENABLED = os.environ.get("BROWSER_POOL_ENABLED", "1") not in ("0", "false", "False")
+
+
+class _PooledContext:
+    def __init__(self, context, generation):
+        self.context = context
+        # Browser launch the context belongs to; older ones are not counted in _created
+        self.generation = generation
+        self.uses = 0
+
+
+class BrowserPool:
+    def __init__(self, size=POOL_SIZE, max_uses=CONTEXT_MAX_USES):
+        self.size = size
+        self.max_uses = max_uses
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+        self._thread.start()
+        self._playwright = None
+        self._browser = None
+        self._idle = None
+        self._created = 0
+        self._generation = 0
+        self._waiting = 0
+        self._closed = False
+        self.stats = {"launches": 0, "contexts_created": 0, "contexts_recycled": 0, "borrows": 0}
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    # ------------------------------------------------------
+    # Runs on the pool's event loop
+    # ------------------------------------------------------
+    async def _ensure_browser(self):
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        if self._browser is None or not self._browser.is_connected():
+            if self._browser is not None:
+                print("⚠ Pooled browser disconnected, relaunching")
+                # Contexts of the dead browser are unusable
+                while not self._idle.empty():
+                    self._idle.get_nowait()
+                self._created = 0
+                self._generation += 1
+            self._browser = await script.launch_browser(self._playwright)
+            self.stats["launches"] += 1
+
+    async def _new_context(self):
+        self._created += 1
+        try:
+            context = await script.new_scrape_context(self._browser)
+        except Exception:
+            self._created -= 1
+            raise
+        self.stats["contexts_created"] += 1
+        return _PooledContext(context, self._generation)
+
+    async def _acquire(self):
+        await self._ensure_browser()
+        if self._idle.empty() and self._created < self.size:
+            return await self._new_context()
+        self._waiting += 1
+        try:
+            return await self._idle.get()
+        finally:
+            self._waiting -= 1
+
+    async def _release(self, pooled, healthy):
+        pooled.uses += 1
+        current = pooled.generation == self._generation
+        if current and healthy and pooled.uses < self.max_uses and self._browser.is_connected():
+            try:
+                # Don't leak session state between zones
+                await pooled.context.clear_cookies()
+                self._idle.put_nowait(pooled)
+                return
+            except Exception:
+                pass
+
+        # A context from before a relaunch already lost its slot when _created was reset
+        if current:
+            self._created -= 1
+        self.stats["contexts_recycled"] += 1
+        try:
+            await pooled.context.close()
+        except Exception:
+            pass
+        # Hand the free slot to a caller already waiting for a context
+        if self._waiting > self._idle.qsize() and self._created < self.size:
+            try:
+                await self._ensure_browser()
+                self._idle.put_nowait(await self._new_context())
+            except Exception as e:
+                print(f"⚠ Could not replace pooled context: {e}")
+
+    async def _with_context(self, func):
+        pooled = await self._acquire()
+        self.stats["borrows"] += 1
+        healthy = False
+        try:
+            result = await func(pooled.context)
+            healthy = not (isinstance(result, dict) and result.get("status") == "error")
+            return result
+        finally:
+            await self._release(pooled, healthy)
+
+    async def _shutdown(self):
+        try:
+            if self._browser is not None:
+                await self._browser.close()
+        finally:
+            if self._playwright is not None:
+                await self._playwright.stop()
+
+    # ------------------------------------------------------
+    # Blocking API for worker threads
+    # ------------------------------------------------------
+    def run(self, area_name):
+        """Blocking equivalent of script.run(area_name) on a pooled context."""
+        # A same-day cache hit needs no browser: don't launch one or wait for a context
+        cached = script.cached_result(area_name)
+        if cached:
+            return cached
+        return self._call(self._with_context(lambda context: script.run(area_name, context=context)))
+
+    def zones(self):
+        """Blocking equivalent of script.list_zones() on a pooled context."""
+        return self._call(self._with_context(script.list_zones))
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._call(self._shutdown())
+        except Exception as e:
+            print(f"⚠ Browser pool shutdown failed: {e}")
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=10)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.close)
+        return _pool
+
+
+def scrape(area_name):
+    """Scrape a zone through the pool, or with a throwaway browser if the pool is disabled."""
+    if not ENABLED:
+        return asyncio.run(script.run(area_name))
+    return get_pool().run(area_name)
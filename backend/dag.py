@@ -0,0 +1,152 @@
+"""
+Minimal dependency-graph executor for pipeline stages.
+
+Each Stage names the stages it depends on. run_stages starts every stage
+whose dependencies have finished on a thread pool, so independent stages
+(e.g. the three imagery fetches, or the two Groq vision calls) overlap
+and the wall-clock time approaches the critical path of the graph.
+
+A stage is skipped when one of its dependencies failed or was skipped,
+or when its `when(results)` predicate returns False.
+"""
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class Stage:
+    def __init__(self, name, func, deps=(), when=None, describe=None):
+        """
+        Args:
+            name (str): Unique stage name
+            func (callable): func(results) -> value, where results maps
+                finished stage names to their return values
+            deps (iterable): Names of stages that must finish first
+            when (callable): Optional when(results) -> bool; the stage is
+                skipped if it returns False
+            describe (callable): Optional describe(value) -> dict of
+                partial results reported when the stage succeeds
+        """
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.when = when
+        self.describe = describe
+
+
+def _noop_stage(name, status, info=None):
+    pass
+
+
+def _check_graph(stages):
+    names = set()
+    for stage in stages:
+        if stage.name in names:
+            raise ValueError(f"Duplicate stage name: {stage.name}")
+        names.add(stage.name)
+
+    for stage in stages:
+        for dep in stage.deps:
+            if dep not in names:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+    # Kahn's algorithm to reject cycles up front
+    remaining = {stage.name: set(stage.deps) for stage in stages}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Dependency cycle between stages: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def run_stages(stages, max_workers=4, on_stage=None):
+    """
+    Run a graph of stages, starting each one as soon as its dependencies finish.
+
+    Args:
+        stages (list[Stage]): Stages to run
+        max_workers (int): Size of the thread pool
+        on_stage (callable): Optional on_stage(name, status, info) callback,
+            status being 'running', 'success', 'skipped' or 'error'
+
+    Returns:
+        dict: {
+            "results": {name: value} for successful stages,
+            "status": {name: "success" | "skipped" | "error"},
+            "errors": {name: message},
+            "timings": {name: seconds}
+        }
+    """
+    _check_graph(stages)
+    report = on_stage or _noop_stage
+
+    by_name = {stage.name: stage for stage in stages}
+    results = {}
+    status = {}
+    errors = {}
+    timings = {}
+    pending = dict(by_name)
+    running = {}
+
+    def execute(stage, inputs):
+        start = time.perf_counter()
+        try:
+            return stage.func(inputs), None, time.perf_counter() - start
+        except Exception as e:
+            traceback.print_exc()
+            return None, e, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage") as executor:
+        while pending or running:
+            progressed = False
+            for name, stage in list(pending.items()):
+                if any(dep not in status for dep in stage.deps):
+                    continue
+
+                del pending[name]
+                progressed = True
+
+                if any(status[dep] != "success" for dep in stage.deps):
+                    status[name] = "skipped"
+                    report(name, "skipped", {"reason": "dependency did not succeed"})
+                    continue
+
+                inputs = dict(results)
+                if stage.when is not None and not stage.when(inputs):
+                    status[name] = "skipped"
+                    report(name, "skipped")
+                    continue
+
+                report(name, "running")
+                running[executor.submit(execute, stage, inputs)] = stage
+
+            if progressed and not running:
+                # Skips may have unblocked further stages
+                continue
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                value, error, elapsed = future.result()
+                timings[stage.name] = round(elapsed, 3)
+                if error is not None:
+                    status[stage.name] = "error"
+                    errors[stage.name] = str(error)
+                    report(stage.name, "error", {"error": str(error), "duration_seconds": timings[stage.name]})
+                else:
+                    status[stage.name] = "success"
+                    results[stage.name] = value
+                    info = {"duration_seconds": timings[stage.name]}
+                    if stage.describe is not None:
+                        try:
+                            info.update(stage.describe(value) or {})
+                        except Exception as e:
+                            print(f"⚠ Could not describe stage {stage.name}: {e}")
+                    report(stage.name, "success", info)
+
+    return {"results": results, "status": status, "errors": errors, "timings": timings}
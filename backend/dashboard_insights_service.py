@@ -7,22 +7,16 @@ insights from the encroachment analysis results.
 
 import os
 import json
-from groq import Groq
 from dotenv import load_dotenv
 
-load_dotenv()
+import http_client
+from metrics import record_bytes
 
-client = None
+load_dotenv()
 
 def get_client():
-    global client
-    if not client:
-        api_key = os.environ.get("GROQ_API_KEY")
-        if not api_key:
-            print("[ERROR] GROQ_API_KEY not found in environment!")
-            return None
-        client = Groq(api_key=api_key)
-    return client
+    # Shared with groq_service so both reuse one connection pool
+    return http_client.get_groq_client()
 
 
 def generate_comprehensive_report(zone, metrics, groq_vision_analysis):
@@ -276,6 +270,8 @@ def generate_comprehensive_report(zone, metrics, groq_vision_analysis):
     }}
     """
 
+    record_bytes("groq_text", len(prompt), "sent")
+
     try:
         completion = client.chat.completions.create(
             model="meta-llama/llama-4-scout-17b-16e-instruct",
@@ -291,6 +287,7 @@ def generate_comprehensive_report(zone, metrics, groq_vision_analysis):
         )
 
         response_text = completion.choices[0].message.content.strip()
+        record_bytes("groq_text", len(response_text))
         
         # Parse JSON
         try:
@@ -319,7 +316,7 @@ def generate_comprehensive_report(zone, metrics, groq_vision_analysis):
 
 if __name__ == "__main__":
     # Test stub
-    test_metrics = {"match_percentage": 96.5, "status": "No Encroachment"}
+    test_metrics = {"new_construction_percentage": 0.4, "status": "No Encroachment"}
     test_vision = {
         "encroachment_status": "None",
         "construction_percentage": 45,
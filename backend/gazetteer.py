@@ -0,0 +1,188 @@
+"""
+Persistent gazetteer of industrial zones: name -> centroid, bbox and
+boundary geometry.
+
+Coordinates used to come only from the scraped "location" string (or from
+clicking around the CSIDC map until the viewer showed one), with hard-coded
+fallbacks for two zones. The gazetteer is filled from every successful
+scrape and can be bulk-imported, so a known zone needs neither:
+
+    python backend/gazetteer.py import zones.geojson   # or a CSV: name,lat,lon[,west,south,east,north]
+    python backend/gazetteer.py list
+
+It lives outside the artifact cache (GAZETTEER_PATH, default
+downloads/gazetteer.sqlite3) because its entries never expire.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import sqlite3
+import threading
+
+import geo
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.environ.get("GAZETTEER_PATH", os.path.join(BASE_DIR, "downloads", "gazetteer.sqlite3"))
+
+# Zones known before the gazetteer existed (previously hard-coded in gee.py)
+BUILTIN_ZONES = [
+    ("Kapan", 22.017307, 82.479004),
+    ("Gondwara", 21.290583, 81.614885),
+]
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _key(name):
+    return " ".join(name.split()).lower()
+
+
+def _db():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+        _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS zones (
+                key TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                lat REAL NOT NULL,
+                lon REAL NOT NULL,
+                bbox TEXT,
+                geometry TEXT,
+                source TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        _conn.executemany(
+            "INSERT OR IGNORE INTO zones (key, name, lat, lon, source, updated_at) VALUES (?, ?, ?, ?, 'builtin', ?)",
+            [(_key(name), name, lat, lon, time.time()) for name, lat, lon in BUILTIN_ZONES])
+        _conn.commit()
+    return _conn
+
+
+def _row_to_zone(row):
+    name, lat, lon, bbox, geometry, source = row
+    return {
+        "name": name,
+        "lat": lat,
+        "lon": lon,
+        "bbox": json.loads(bbox) if bbox else None,
+        "geometry": json.loads(geometry) if geometry else None,
+        "source": source,
+    }
+
+
+def lookup(name):
+    """
+    Known zone by name (case and whitespace insensitive), or None.
+
+    Returns:
+        dict: {"name", "lat", "lon", "bbox", "geometry": FeatureCollection
+            of boundary and plots or None, "source"}
+    """
+    if not name:
+        return None
+    with _lock:
+        row = _db().execute("SELECT name, lat, lon, bbox, geometry, source FROM zones WHERE key = ?",
+                            (_key(name),)).fetchone()
+    return _row_to_zone(row) if row else None
+
+
+def record(name, lat, lon, bbox=None, geometry=None, source="scrape"):
+    """
+    Insert or replace a zone. A missing bbox/geometry keeps the stored one,
+    so a coordinates-only update never drops a captured boundary.
+    """
+    with _lock:
+        conn = _db()
+        conn.execute("""
+            INSERT INTO zones (key, name, lat, lon, bbox, geometry, source, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                name = excluded.name, lat = excluded.lat, lon = excluded.lon,
+                bbox = COALESCE(excluded.bbox, zones.bbox),
+                geometry = COALESCE(excluded.geometry, zones.geometry),
+                source = excluded.source, updated_at = excluded.updated_at
+        """, (_key(name), " ".join(name.split()), float(lat), float(lon),
+              json.dumps(bbox) if bbox else None,
+              json.dumps(geometry, ensure_ascii=False) if geometry else None,
+              source, time.time()))
+        conn.commit()
+
+
+def zones():
+    """All zones, sorted by name."""
+    with _lock:
+        rows = _db().execute("SELECT name, lat, lon, bbox, geometry, source FROM zones ORDER BY key").fetchall()
+    return [_row_to_zone(row) for row in rows]
+
+
+# ==========================================================
+# BULK IMPORT
+# ==========================================================
+NAME_PROPERTIES = ("name", "zone", "area_name", "industrial_area", "NAME")
+
+
+def _feature_name(feature):
+    properties = feature.get("properties") or {}
+    for key in NAME_PROPERTIES:
+        if properties.get(key):
+            return str(properties[key])
+    return None
+
+
+def import_geojson(payload, source="import"):
+    """
+    Record every named polygon of a FeatureCollection (GeoJSON or ArcGIS
+    REST JSON) as a zone boundary. Returns the number imported.
+    """
+    count = 0
+    for feature in geo.extract_polygon_features(payload):
+        name = _feature_name(feature)
+        if not name:
+            continue
+        lon, lat = geo.centroid_of(feature)
+        boundary = dict(feature, properties=dict(feature["properties"], role="boundary"))
+        record(name, lat, lon, geo.bbox_of([feature]),
+               {"type": "FeatureCollection", "features": [boundary]}, source)
+        count += 1
+    return count
+
+
+def import_csv(path, source="import"):
+    """Record rows of name,lat,lon[,west,south,east,north] (header row required). Returns the count."""
+    count = 0
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                bbox = [float(row[k]) for k in ("west", "south", "east", "north")] \
+                    if all(row.get(k) for k in ("west", "south", "east", "north")) else None
+                record(row["name"], float(row["lat"]), float(row["lon"]), bbox, source=source)
+                count += 1
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"  Skipping gazetteer row {row}: {e}")
+    return count
+
+
+def import_file(path):
+    """Bulk import a .csv, or a .json/.geojson FeatureCollection."""
+    if path.lower().endswith(".csv"):
+        return import_csv(path)
+    return import_geojson(geo.load_feature_collection(path))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "import":
+        for path in sys.argv[2:]:
+            print(f"{path}: {import_file(path)} zones imported")
+    elif len(sys.argv) == 2 and sys.argv[1] == "list":
+        for zone in zones():
+            extras = ", ".join(k for k in ("bbox", "geometry") if zone[k])
+            print(f"{zone['name']}: {zone['lat']:.6f}, {zone['lon']:.6f} [{zone['source']}] {extras}")
+    else:
+        print("Usage: python gazetteer.py import <file.geojson|file.csv>... | list")
+        sys.exit(1)
@@ -1,27 +1,82 @@
 ﻿import ee
-import requests
 from datetime import datetime, timedelta
 import os
 import json
-from PIL import Image, ImageDraw, ImageFont
+import math
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+import artifact_cache
+import gazetteer
+import geo
+import http_client
+import image_metadata
+import imagery_providers
+import metrics
+import tiles
+import wayback
+from dag import Stage, run_stages
 
 # ==========================================================
-# INITIALIZE EARTH ENGINE (Lazy Init)
+# INITIALIZE EARTH ENGINE (once per process)
 # ==========================================================
+EE_PROJECT = os.environ.get("EE_PROJECT", "csidc-hackathon-487309")
+# Seconds a fetch waits for the startup warm-up to finish
+EE_READY_TIMEOUT = float(os.environ.get("EE_READY_TIMEOUT", 60))
+
 EE_INITIALIZED = False
+_ee_ready = threading.Event()
+_ee_lock = threading.Lock()
+_warmup_thread = None
 
 def initialize_ee():
+    """Initialize the Earth Engine session if it isn't yet. Returns True when ready."""
     global EE_INITIALIZED
-    if not EE_INITIALIZED:
-        try:
-            ee.Initialize(project="csidc-hackathon-487309")
-            print("âœ“ Earth Engine initialized with project csidc-hackathon-487309")
-            EE_INITIALIZED = True
-        except Exception as e:
-            print(f"âš  Earth Engine initialization failed: {e}")
-
-# Call init immediately but don't crash if fails (or maybe call it inside fetch functions)
-# initialize_ee()
+    with _ee_lock:
+        if not EE_INITIALIZED:
+            try:
+                ee.Initialize(project=EE_PROJECT)
+                print(f"âœ“ Earth Engine initialized with project {EE_PROJECT}")
+                EE_INITIALIZED = True
+                _ee_ready.set()
+            except Exception as e:
+                print(f"âš  Earth Engine initialization failed: {e}")
+    return EE_INITIALIZED
+
+def start_warmup():
+    """
+    Initialize Earth Engine on a background thread at worker startup, so
+    requests don't pay for authentication and session setup.
+    """
+    global _warmup_thread
+    with _ee_lock:
+        if _warmup_thread is None and not EE_INITIALIZED:
+            _warmup_thread = threading.Thread(target=initialize_ee, name="ee-warmup", daemon=True)
+            _warmup_thread.start()
+
+def ee_status():
+    """"ready", "initializing" (warm-up still running) or "unavailable"."""
+    if _ee_ready.is_set():
+        return "ready"
+    if _warmup_thread is not None and _warmup_thread.is_alive():
+        return "initializing"
+    return "unavailable"
+
+def ensure_ee(timeout=EE_READY_TIMEOUT):
+    """
+    True once Earth Engine is usable. Waits for a running warm-up, and
+    retries initialization if the warm-up never ran or failed.
+    """
+    if _ee_ready.is_set():
+        return True
+    thread = _warmup_thread
+    if thread is not None and thread.is_alive():
+        thread.join(timeout)
+        if thread.is_alive():
+            return False
+    return initialize_ee()
 
 # gee.py is in backend/, so we go up one level
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -29,83 +84,514 @@ DOWNLOAD_DIR = os.path.join(BASE_DIR, "downloads")
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
 # ==========================================================
-# ADD LABEL TO IMAGE
+# STORE IMAGES
+# ==========================================================
+def save_image(content, filepath, meta, area_name, source, bbox=None, window=None, context=None):
+    """
+    Store a downloaded image with its metadata sidecars (image_metadata.py)
+    and add it to the artifact cache.
+
+    With a pipeline context the encoded bytes are handed to later stages
+    as they are (decoded only if a stage needs the pixels); the file is
+    written (and cached) in the background.
+    """
+    image_metadata.write(filepath, meta)
+    if context is None:
+        with open(filepath, 'wb') as f:
+            f.write(content)
+        artifact_cache.put(area_name, source, filepath, bbox, window)
+        return filepath
+    return context.put_bytes(filepath, content,
+                             on_written=lambda path: artifact_cache.put(area_name, source, path, bbox, window))
+
+def save_pil_image(img, filepath, meta, area_name, source, bbox=None, window=None, context=None):
+    """Store an already decoded RGB image like save_image."""
+    image_metadata.write(filepath, meta)
+
+    def cache(path):
+        # source=None: derived image, the inputs are cached instead
+        if source:
+            artifact_cache.put(area_name, source, path, bbox, window)
+
+    if context is None:
+        img.save(filepath)
+        cache(filepath)
+        return filepath
+    # PIL is RGB, the detector works in OpenCV's BGR
+    return context.put_array(filepath, np.ascontiguousarray(np.asarray(img)[:, :, ::-1]), on_written=cache)
+
+# ==========================================================
+# ARTIFACT CACHE
 # ==========================================================
-def add_label_to_image(image_path, label_text):
-    """Add a text label to the image for verification"""
+def load_cached(area_name, source, filepath, bbox=None, window=None, context=None, meta=None):
+    """
+    Copy a cached image to filepath (and write its metadata sidecars).
+    Returns filepath on a hit, None on a miss.
+    """
+    blob = artifact_cache.get(area_name, source, bbox=bbox, window=window)
+    if not blob:
+        return None
     try:
-        img = Image.open(image_path)
-        draw = ImageDraw.Draw(img)
-        
-        # Try to use a font, fallback to default
+        if context is not None:
+            with open(blob, 'rb') as f:
+                context.put_bytes(filepath, f.read())
+        else:
+            artifact_cache.materialize(blob, filepath)
+    except OSError as e:
+        print(f"  Cache read failed for {source}: {e}")
+        return None
+    image_metadata.write(filepath, meta)
+    print(f"  ✓ Cache hit ({source}): {filepath}")
+    return filepath
+
+# ==========================================================
+# IMAGERY GRID
+# ==========================================================
+# Every image of a zone (current, OSM, historical) is fetched on one shared
+# EPSG:4326 pixel grid, so the detector never has to resample them
+IMAGERY_RESOLUTION_M = float(os.environ.get("IMAGERY_RESOLUTION_M", 2.0))
+# Fraction of the zone extent added on each side
+IMAGERY_MARGIN = float(os.environ.get("IMAGERY_MARGIN", 0.1))
+IMAGERY_MAX_PIXELS = int(os.environ.get("IMAGERY_MAX_PIXELS", 2048))
+# Half-size of the box used when the zone boundary is unknown
+CURRENT_OFFSET_DEG = 0.01
+
+def current_bbox(latitude, longitude):
+    """[west, south, east, north] of the fixed box around a point (EPSG:4326)."""
+    offset = CURRENT_OFFSET_DEG
+    return [longitude - offset, latitude - offset, longitude + offset, latitude + offset]
+
+def point_grid(latitude, longitude):
+    """Grid for a zone without a known boundary: the fixed box around its location."""
+    return geo.imagery_grid(current_bbox(latitude, longitude), IMAGERY_RESOLUTION_M, margin=0,
+                            max_pixels=IMAGERY_MAX_PIXELS)
+
+def zone_grid(json_path, latitude, longitude):
+    """
+    Shared pixel grid sized to the zone's boundary extent (the "bbox" that
+    script.py records from the captured geometry, else the gazetteer's), or
+    point_grid without one.
+    """
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        extent = data.get("bbox")
+        if not extent:
+            extent = (gazetteer.lookup(data.get("area_name")) or {}).get("bbox")
+    except (OSError, ValueError):
+        extent = None
+
+    if extent:
+        grid = geo.imagery_grid(extent, IMAGERY_RESOLUTION_M, IMAGERY_MARGIN, max_pixels=IMAGERY_MAX_PIXELS)
+    else:
+        print("  No zone boundary extent, using the box around the location")
+        grid = point_grid(latitude, longitude)
+    print(f"  Imagery grid: {grid['width']}x{grid['height']} px at {grid['resolution_m']} m")
+    return grid
+
+def grid_key(grid):
+    """Artifact cache key for images on a grid."""
+    return ",".join(f"{v:.6f}" for v in grid["bbox"]) + f"@{grid['width']}x{grid['height']}"
+
+# ==========================================================
+# SENTINEL-2 PIXELS (GEE)
+# ==========================================================
+# Historical providers (imagery_providers.py, IMAGERY_HISTORICAL_PROVIDER):
+# "pixels": cloud-masked median composite downloaded as band arrays
+# "thumbnail": the most recent low-cloud scene as a stretched PNG
+# "wayback": the ESRI World Imagery release nearest the date (wayback.py),
+#            falling back to "pixels"
+# "standin": tiles from the local standin_server.py
+HISTORICAL_WINDOW_DAYS = 30
+# Extra epochs (years before now) fetched in the same batch as the comparison
+# epoch, e.g. "1,3,5". Empty: only the comparison epoch.
+HISTORICAL_EPOCHS = [int(v) for v in os.environ.get("GEE_HISTORICAL_EPOCHS", "").split(",") if v.strip()]
+# Epochs per computePixels request; the requests of one stack run concurrently
+EPOCHS_PER_REQUEST = int(os.environ.get("GEE_EPOCHS_PER_REQUEST", 2))
+
+S2_COLLECTION = 'COPERNICUS/S2_SR_HARMONIZED'
+# Only the bands the analysis uses: RGB for display, NIR for vegetation indices
+# B11 (SWIR, 20 m, resampled onto the grid) is for the detector's NDBI/BSI
+S2_BANDS = {"blue": "B2", "green": "B3", "red": "B4", "nir": "B8", "swir1": "B11"}
+# Scene classification classes dropped from the composite: shadow, cloud (medium/high), cirrus
+S2_SCL_MASKED = (3, 8, 9, 10)
+
+def epoch_window(years_ago, window_days=HISTORICAL_WINDOW_DAYS):
+    """(start, end) dates of the composite window ending years_ago years before today."""
+    end_date = datetime.now() - timedelta(days=365 * years_ago)
+    start_date = end_date - timedelta(days=window_days)
+    return start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+
+def _mask_s2_clouds(image):
+    scl = image.select('SCL')
+    mask = scl.neq(S2_SCL_MASKED[0])
+    for value in S2_SCL_MASKED[1:]:
+        mask = mask.And(scl.neq(value))
+    return image.updateMask(mask)
+
+def _s2_masked(region):
+    return (
+        ee.ImageCollection(S2_COLLECTION)
+        .filterBounds(region)
+        .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 60))
+        .map(_mask_s2_clouds)
+        .select(list(S2_BANDS.values()))
+    )
+
+def _median(collection):
+    # An empty window yields zeros rather than a band-less image, so a stack
+    # with one missing epoch still downloads
+    empty = ee.Image.constant([0] * len(S2_BANDS)).rename(list(S2_BANDS.values()))
+    composite = ee.Image(ee.Algorithms.If(collection.size().gt(0), collection.median(), empty))
+    return composite.unmask(0).toUint16()
+
+def s2_composite(bbox, start, end):
+    """Server-side cloud-masked median of the S2 bands over [start, end)."""
+    return _median(_s2_masked(ee.Geometry.Rectangle(bbox)).filterDate(start, end))
+
+def epoch_stack_image(bbox, windows):
+    """
+    One multi-band image holding the composite of every [start, end] window,
+    built by mapping over the windows server-side. Bands are named
+    "<index>_<band>" (e.g. "0_B4") in window order.
+    """
+    base = _s2_masked(ee.Geometry.Rectangle(bbox))
+
+    def composite(window):
+        window = ee.List(window)
+        return _median(base.filterDate(window.get(0), window.get(1)))
+
+    return ee.ImageCollection.fromImages(ee.List(windows).map(composite)).toBands()
+
+def pixel_grid(grid):
+    """Earth Engine computePixels grid equivalent to an imagery grid."""
+    west, south, east, north = grid["bbox"]
+    width, height = grid["width"], grid["height"]
+    return {
+        'dimensions': {'width': width, 'height': height},
+        'affineTransform': {
+            'scaleX': (east - west) / width, 'shearX': 0, 'translateX': west,
+            'shearY': 0, 'scaleY': -(north - south) / height, 'translateY': north,
+        },
+        'crsCode': grid["crs"],
+    }
+
+def fetch_s2_bands(grid, start, end):
+    """
+    Download the composite on grid as arrays with ee.data.computePixels.
+
+    Returns:
+        dict: {"blue", "green", "red", "nir", "swir1"} -> uint16 surface reflectance (x10000)
+    """
+    if not ensure_ee():
+        raise RuntimeError("Earth Engine is not available")
+    pixels = ee.data.computePixels({
+        'expression': s2_composite(grid["bbox"], start, end),
+        'fileFormat': 'NUMPY_NDARRAY',
+        'grid': pixel_grid(grid),
+    })
+    bands = {name: np.ascontiguousarray(pixels[band]) for name, band in S2_BANDS.items()}
+    metrics.record_bytes("gee_s2_pixels", sum(b.nbytes for b in bands.values()))
+    return bands
+
+def save_bands(path, bands):
+    with open(path, 'wb') as f:
+        np.savez(f, **bands)
+    return path
+
+def load_bands(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+def cached_bands(area_name, cache_key, window):
+    """Cached S2_BANDS arrays for a window, or None (also for entries from before a band was added)."""
+    blob = artifact_cache.get(area_name, "gee_s2_bands", cache_key, list(window))
+    if not blob:
+        return None
+    try:
+        bands = load_bands(blob)
+    except (OSError, ValueError) as e:
+        # Evicted between the lookup and the read, or unreadable: fetch instead
+        print(f"  Cached bands unreadable, fetching instead: {e}")
+        return None
+    return bands if set(S2_BANDS) <= set(bands) else None
+
+def render_rgb(bands, vmin=0, vmax=3000, gamma=1.4):
+    """8-bit RGB with the same stretch the thumbnail used (min/max/gamma)."""
+    rgb = np.dstack([bands["red"], bands["green"], bands["blue"]]).astype(np.float32)
+    rgb = np.clip((rgb - vmin) / (vmax - vmin), 0, 1) ** (1 / gamma)
+    return (rgb * 255 + 0.5).astype(np.uint8)
+
+def masked_pct(bands):
+    """Percentage of pixels with no data in any band (masked cloud/shadow, or no scene)."""
+    valid = np.zeros(next(iter(bands.values())).shape, dtype=bool)
+    for band in bands.values():
+        valid |= band != 0
+    return round(100.0 * (1 - valid.mean()), 1)
+
+def fetch_historical_pixels(grid, area_name, start, end, filepath, label, context=None, bands=None):
+    """
+    Historical composite via raw band arrays. The display PNG is rendered
+    locally; the reflectance arrays are kept as context.raster(filepath) for
+    the detector's spectral indices, and in a _bands.npz next to the PNG. Pass bands when they were already
+    downloaded (fetch_epoch_stack). Returns filepath, or None on failure.
+    """
+    window = [start, end]
+    cache_key = grid_key(grid)
+
+    if bands is None:
         try:
-            font = ImageFont.truetype("arial.ttf", 40)
-        except:
-            font = ImageFont.load_default()
-        
-        # Add white background rectangle for text
-        bbox = draw.textbbox((10, 10), label_text, font=font)
-        draw.rectangle(bbox, fill='white')
-        
-        # Add black text
-        draw.text((10, 10), label_text, fill='black', font=font)
-        
-        img.save(image_path)
-        print(f"  Added label: {label_text}")
+            bands = cached_bands(area_name, cache_key, window)
+            if bands is not None:
+                print(f"  âœ“ Cache hit (gee_s2_bands): {start} to {end}")
+            else:
+                print(f"  Downloading S2 median composite {start} to {end}...")
+                bands = fetch_s2_bands(grid, start, end)
+                npz_path = save_bands(os.path.splitext(filepath)[0] + "_bands.npz", bands)
+                artifact_cache.put(area_name, "gee_s2_bands", npz_path, cache_key, window)
+        except Exception as e:
+            print(f"  Pixel download failed for {area_name}: {e}")
+            return None
+
+    if not any(band.any() for band in bands.values()):
+        print(f"  No cloud-free pixels for {area_name} between {start} and {end}")
+        return None
+
+    if context is not None:
+        context.put_raster(filepath, bands)
+    meta = image_metadata.describe(label, S2_COLLECTION, grid, window, masked_pct(bands))
+    return save_pil_image(Image.fromarray(render_rgb(bands)), filepath, meta, area_name, None, context=context)
+
+
+def fetch_epoch_stack(grid, area_name, years):
+    """
+    Composites for several epochs in one batch.
+
+    Epochs already in the artifact cache are reused. The rest are built by
+    one server-side map over their windows (epoch_stack_image) and pulled
+    with concurrent computePixels calls of EPOCHS_PER_REQUEST epochs each.
+
+    Args:
+        years (iterable[int]): Epochs as years before today
+
+    Returns:
+        dict: {"grid", "bands": band names, "epochs": [{"years_ago", "start",
+            "end", "available"}] oldest first, "stack": uint16 array of shape
+            (epochs, height, width, bands) in the same order}
+    """
+    cache_key = grid_key(grid)
+    years = sorted(set(years), reverse=True)
+    windows = {y: epoch_window(y) for y in years}
+
+    by_year = {}
+    missing = []
+    for y in years:
+        bands = cached_bands(area_name, cache_key, windows[y])
+        if bands is not None:
+            by_year[y] = bands
+        else:
+            missing.append(y)
+
+    if missing:
+        if not ensure_ee():
+            raise RuntimeError("Earth Engine is not available")
+        print(f"  Downloading S2 composites for {missing} years ago in one batch...")
+        stack_image = epoch_stack_image(grid["bbox"], [list(windows[y]) for y in missing])
+        ee_grid = pixel_grid(grid)
+
+        def download(indices):
+            names = [f"{i}_{band}" for i in indices for band in S2_BANDS.values()]
+            pixels = ee.data.computePixels({
+                'expression': stack_image.select(names),
+                'fileFormat': 'NUMPY_NDARRAY',
+                'grid': ee_grid,
+            })
+            return {missing[i]: {name: np.ascontiguousarray(pixels[f"{i}_{band}"]) for name, band in S2_BANDS.items()}
+                    for i in indices}
+
+        chunks = [list(range(i, min(i + EPOCHS_PER_REQUEST, len(missing))))
+                  for i in range(0, len(missing), EPOCHS_PER_REQUEST)]
+        with ThreadPoolExecutor(max_workers=len(chunks), thread_name_prefix="gee-epochs") as executor:
+            for part in executor.map(download, chunks):
+                by_year.update(part)
+
+        current_date = datetime.now().strftime("%Y-%m-%d")
+        for y in missing:
+            bands = by_year[y]
+            metrics.record_bytes("gee_s2_pixels", sum(b.nbytes for b in bands.values()))
+            npz_path = os.path.join(DOWNLOAD_DIR, f"satellite_{area_name}_{y}years_ago_{current_date}_bands.npz")
+            artifact_cache.put(area_name, "gee_s2_bands", save_bands(npz_path, bands), cache_key, list(windows[y]))
+
+    names = list(S2_BANDS)
+    return {
+        "grid": grid,
+        "bands": names,
+        "epochs": [{"years_ago": y, "start": windows[y][0], "end": windows[y][1],
+                    "available": any(by_year[y][n].any() for n in names)} for y in years],
+        "stack": np.stack([np.dstack([by_year[y][n] for n in names]) for y in years]),
+    }
+
+def fetch_historical_epochs(grid, latitude, longitude, area_name, years_ago, context=None):
+    """
+    Fetch HISTORICAL_EPOCHS plus years_ago as one stack and render the extra
+    epochs. The summary goes to context.value("historical_epochs").
+    Returns the years_ago bands for fetch_historical_pixels, or None.
+    """
+    try:
+        result = fetch_epoch_stack(grid, area_name, HISTORICAL_EPOCHS + [years_ago])
     except Exception as e:
-        print(f"  Could not add label: {e}")
+        print(f"  Epoch stack download failed for {area_name}: {e}")
+        return None
+
+    current_date = datetime.now().strftime("%Y-%m-%d")
+    summary = []
+    comparison = None
+    for epoch, image in zip(result["epochs"], result["stack"]):
+        bands = {name: image[:, :, i] for i, name in enumerate(result["bands"])}
+        y = epoch["years_ago"]
+        filename = f"satellite_{area_name}_{y}years_ago_{current_date}.png"
+        if y == years_ago:
+            comparison = bands
+        elif epoch["available"]:
+            filepath = os.path.join(DOWNLOAD_DIR, filename)
+            label = f"{area_name} ({latitude:.4f}, {longitude:.4f}) - {y}yr ago"
+            meta = image_metadata.describe(label, S2_COLLECTION, grid, [epoch["start"], epoch["end"]],
+                                           masked_pct(bands))
+            save_pil_image(Image.fromarray(render_rgb(bands)), filepath, meta, area_name, None, context=context)
+        summary.append({"years_ago": y, "window": [epoch["start"], epoch["end"]],
+                        "image": filename if epoch["available"] else None})
+
+    if context is not None:
+        context.put_value("historical_epochs", summary)
+    return comparison
+
+
+def fetch_present_bands(grid, area_name, context):
+    """
+    Latest HISTORICAL_WINDOW_DAYS composite on grid, kept as
+    context.value("present_bands") so the detector can compare reflectance
+    with the historical composite (the current image itself is ESRI RGB).
+    Only fetched when the historical provider downloads reflectance too
+    ("pixels"). Returns the bands, or None.
+    """
+    if context is None or imagery_providers.provider("historical")["name"] != "pixels":
+        return None
+    start, end = epoch_window(0)
+    cache_key = grid_key(grid)
+    try:
+        bands = cached_bands(area_name, cache_key, (start, end))
+        if bands is None:
+            print(f"  Downloading present S2 composite {start} to {end}...")
+            bands = fetch_s2_bands(grid, start, end)
+            current_date = datetime.now().strftime("%Y-%m-%d")
+            npz_path = save_bands(os.path.join(DOWNLOAD_DIR, f"satellite_{area_name}_present_{current_date}_bands.npz"),
+                                  bands)
+            artifact_cache.put(area_name, "gee_s2_bands", npz_path, cache_key, [start, end])
+    except Exception as e:
+        print(f"  Present S2 download failed for {area_name}: {e}")
+        return None
+    if not any(band.any() for band in bands.values()):
+        return None
+    context.put_value("present_bands", bands)
+    return bands
+
+
+def fetch_historical_wayback(grid, area_name, target_date, filepath, label, context=None):
+    """
+    Historical ESRI imagery on grid from the Wayback release nearest
+    target_date. Returns filepath, or None on failure.
+    """
+    try:
+        release = wayback.nearest_release(target_date)
+        source = wayback.source_for(release)
+        cache_bbox = grid_key(grid)
+        meta = image_metadata.describe(f"{label} (Wayback {release['date']})", source, grid, release["date"])
+        if load_cached(area_name, source, filepath, cache_bbox, release["date"], context, meta):
+            return filepath
+        print(f"  Wayback release {release['release']} ({release['date']}) for {target_date:%Y-%m-%d}")
+        img = tiles.fetch_mosaic(source, grid["bbox"], grid["width"], grid["height"])
+    except Exception as e:
+        print(f"  Wayback imagery failed for {area_name}: {e}")
+        return None
+    return save_pil_image(img, filepath, meta, area_name, source, cache_bbox, release["date"], context)
+
 
 # ==========================================================
 # FETCH HISTORICAL SATELLITE (GEE)
 # ==========================================================
-def fetch_historical_satellite(latitude, longitude, area_name, years_ago=2):
+def fetch_historical_satellite(latitude, longitude, area_name, years_ago=2, context=None, grid=None):
     try:
+        grid = grid or point_grid(latitude, longitude)
         end_date = datetime.now() - timedelta(days=365 * years_ago)
-        start_date = end_date - timedelta(days=30)
+        start_date = end_date - timedelta(days=HISTORICAL_WINDOW_DAYS)
+
+        current_date = datetime.now().strftime("%Y-%m-%d")
+        filename = f"satellite_{area_name}_{years_ago}years_ago_{current_date}.png"
+        filepath = os.path.join(DOWNLOAD_DIR, filename)
+        label = f"{area_name} ({latitude:.4f}, {longitude:.4f}) - {years_ago}yr ago"
+
+        provider = imagery_providers.provider("historical")
+        if provider.get("tiles"):
+            # Tile-based provider (e.g. the local stand-in): no Earth Engine involved
+            window = [start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')]
+            meta = image_metadata.describe(label, provider["source"], grid, window)
+            if load_cached(area_name, provider["source"], filepath, grid_key(grid), window, context, meta):
+                return filepath
+            img = tiles.fetch_mosaic(provider["tiles"], grid["bbox"], grid["width"], grid["height"])
+            save_pil_image(img, filepath, meta, area_name, provider["source"], grid_key(grid), window, context)
+            print(f"  âœ“ Historical satellite saved: {filepath}")
+            return filepath
+
+        if provider["name"] == "wayback":
+            if fetch_historical_wayback(grid, area_name, end_date, filepath, label, context):
+                print(f"  âœ“ Historical satellite saved: {filepath}")
+                return filepath
+            print("  Falling back to Sentinel-2 composite...")
+
+        if provider["name"] in ("pixels", "wayback"):
+            bands = fetch_historical_epochs(grid, latitude, longitude, area_name, years_ago, context) \
+                if HISTORICAL_EPOCHS else None
+            if fetch_historical_pixels(grid, area_name, start_date.strftime('%Y-%m-%d'),
+                                       end_date.strftime('%Y-%m-%d'), filepath, label, context, bands):
+                print(f"  âœ“ Historical satellite saved: {filepath}")
+                return filepath
+            print("  Falling back to thumbnail download...")
+
+        cache_bbox = grid_key(grid)
+        cache_window = [start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')]
+        meta = image_metadata.describe(label, 'COPERNICUS/S2_SR', grid, cache_window)
+        if load_cached(area_name, "gee_s2_historical", filepath, cache_bbox, cache_window, context, meta):
+            return filepath
+
+        if not ensure_ee():
+            print(f"  Earth Engine is not available for {area_name}")
+            return None
 
-        point = ee.Geometry.Point([longitude, latitude])
-        region = point.buffer(2000).bounds()
+        # The region is built locally; the rendered PNG is the only round trip
+        region = ee.Geometry(geo.bbox_polygon(grid["bbox"]))
 
         print(f"  Searching imagery from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}...")
         print(f"  Point: Lat={latitude}, Lon={longitude}")
 
         collection = (
             ee.ImageCollection('COPERNICUS/S2_SR')
-            .filterBounds(point)
+            .filterBounds(region)
             .filterDate(start_date.strftime('%Y-%m-%d'),
                         end_date.strftime('%Y-%m-%d'))
             .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
             .sort('system:time_start', False)
         )
 
-        image = collection.first()
-
-        if image is None:
-            print(f"  No historical imagery found for {area_name}.")
-            return None
-
-        url = image.select(['B4', 'B3', 'B2']).getThumbURL({
-            'region': region.getInfo(),
-            'dimensions': 1024,
-            'format': 'png',
-            'min': 0,
-            'max': 3000,
-            'gamma': 1.4
+        image = collection.first().select(['B4', 'B3', 'B2']).visualize(min=0, max=3000, gamma=1.4)
+        content = ee.data.computePixels({
+            'expression': image,
+            'fileFormat': 'PNG',
+            'grid': pixel_grid(grid),
         })
+        metrics.record_bytes("gee_s2_historical", len(content))
 
-        response = requests.get(url, timeout=60)
-
-        if response.status_code == 200:
-            current_date = datetime.now().strftime("%Y-%m-%d")
-            filename = f"satellite_{area_name}_{years_ago}years_ago_{current_date}.png"
-            filepath = os.path.join(DOWNLOAD_DIR, filename)
-
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
-
-            # Add label with coordinates
-            label = f"{area_name} ({latitude:.4f}, {longitude:.4f}) - {years_ago}yr ago"
-            add_label_to_image(filepath, label)
+        if content:
+            save_image(content, filepath, meta, area_name, "gee_s2_historical", cache_bbox, cache_window, context)
 
             print(f"  âœ“ Historical satellite saved: {filepath}")
             return filepath
@@ -120,20 +606,39 @@ def fetch_historical_satellite(latitude, longitude, area_name, years_ago=2):
         return None
 
 
+# Build ESRI imagery from cached XYZ tiles instead of the /export renderer
+ESRI_TILES_ENABLED = os.environ.get("ESRI_TILES_ENABLED", "1") not in ("0", "false", "False")
+
+def fetch_from_tiles(source, grid, area_name, filepath, meta, cache_bbox, window, context=None):
+    """
+    Mosaic the grid from tiles (tiles.py) and store it.
+    Returns filepath, or None so the caller can fall back to /export.
+    """
+    if not ESRI_TILES_ENABLED:
+        return None
+    try:
+        img = tiles.fetch_mosaic(source, grid["bbox"], grid["width"], grid["height"])
+    except Exception as e:
+        print(f"  Tile mosaic failed for {source}, falling back to export: {e}")
+        return None
+    return save_pil_image(img, filepath, meta, area_name, source, cache_bbox, window, context)
+
+
 # ==========================================================
-# FETCH CURRENT SATELLITE (ESRI)
+# FETCH CURRENT SATELLITE (imagery_providers "current", ESRI by default)
 # ==========================================================
-def fetch_current_satellite(latitude, longitude, area_name):
+def fetch_current_satellite(latitude, longitude, area_name, context=None, grid=None):
     try:
-        base_url = "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/export"
+        grid = grid or point_grid(latitude, longitude)
+        provider = imagery_providers.provider("current")
+        source = provider["source"]
 
-        offset = 0.01
-        bbox = f"{longitude-offset},{latitude-offset},{longitude+offset},{latitude+offset}"
+        bbox = grid_key(grid)
 
         params = {
-            'bbox': bbox,
+            'bbox': ",".join(str(v) for v in grid["bbox"]),
             'bboxSR': 4326,
-            'size': '1024,1024',
+            'size': f"{grid['width']},{grid['height']}",
             'imageSR': 4326,
             'format': 'png',
             'f': 'image'
@@ -141,19 +646,28 @@ def fetch_current_satellite(latitude, longitude, area_name):
 
         print(f"  Fetching current satellite...")
         print(f"  BBox: {bbox}")
-        response = requests.get(base_url, params=params, timeout=30)
+        current_date = datetime.now().strftime("%Y-%m-%d")
+        filename = f"satellite_{area_name}_current_{current_date}.png"
+        filepath = os.path.join(DOWNLOAD_DIR, filename)
+        # Caption and georeferencing, stored next to the image
+        label = f"{area_name} ({latitude:.4f}, {longitude:.4f}) - Current"
+        meta = image_metadata.describe(label, source, grid)
+        if load_cached(area_name, source, filepath, bbox, current_date, context, meta):
+            return filepath
 
-        if response.status_code == 200:
-            current_date = datetime.now().strftime("%Y-%m-%d")
-            filename = f"satellite_{area_name}_current_{current_date}.png"
-            filepath = os.path.join(DOWNLOAD_DIR, filename)
+        if provider.get("tiles") and \
+                fetch_from_tiles(provider["tiles"], grid, area_name, filepath, meta, bbox, current_date, context):
+            print(f"  âœ“ Current satellite saved: {filepath}")
+            return filepath
 
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
+        if not provider.get("export"):
+            print(f"  âœ— No export fallback for {provider['name']} satellite imagery of {area_name}")
+            return None
+        response = http_client.get(provider["export"], params=params, timeout=30)
+        metrics.record_bytes(source, len(response.content))
 
-            # Add label with coordinates
-            label = f"{area_name} ({latitude:.4f}, {longitude:.4f}) - Current"
-            add_label_to_image(filepath, label)
+        if response.status_code == 200:
+            save_image(response.content, filepath, meta, area_name, source, bbox, current_date, context)
 
             print(f"  âœ“ Current satellite saved: {filepath}")
             return filepath
@@ -169,38 +683,48 @@ def fetch_current_satellite(latitude, longitude, area_name):
 
 
 # ==========================================================
-# FETCH CURRENT OSM (ESRI)
+# FETCH CURRENT OSM (imagery_providers "street", ESRI by default)
 # ==========================================================
-def fetch_current_osm(latitude, longitude, area_name):
+def fetch_current_osm(latitude, longitude, area_name, context=None, grid=None):
     try:
-        base_url = "https://server.arcgisonline.com/ArcGIS/rest/services/World_Street_Map/MapServer/export"
+        grid = grid or point_grid(latitude, longitude)
+        provider = imagery_providers.provider("street")
+        source = provider["source"]
 
-        offset = 0.01
-        bbox = f"{longitude-offset},{latitude-offset},{longitude+offset},{latitude+offset}"
+        bbox = grid_key(grid)
 
         params = {
-            'bbox': bbox,
+            'bbox': ",".join(str(v) for v in grid["bbox"]),
             'bboxSR': 4326,
-            'size': '1024,1024',
+            'size': f"{grid['width']},{grid['height']}",
             'imageSR': 4326,
             'format': 'png',
             'f': 'image'
         }
 
         print(f"  Fetching current OSM...")
-        response = requests.get(base_url, params=params, timeout=30)
+        current_date = datetime.now().strftime("%Y-%m-%d")
+        filename = f"osm_{area_name}_current_{current_date}.png"
+        filepath = os.path.join(DOWNLOAD_DIR, filename)
+        # Caption and georeferencing, stored next to the image
+        label = f"{area_name} ({latitude:.4f}, {longitude:.4f}) - OSM"
+        meta = image_metadata.describe(label, source, grid)
+        if load_cached(area_name, source, filepath, bbox, current_date, context, meta):
+            return filepath
 
-        if response.status_code == 200:
-            current_date = datetime.now().strftime("%Y-%m-%d")
-            filename = f"osm_{area_name}_current_{current_date}.png"
-            filepath = os.path.join(DOWNLOAD_DIR, filename)
+        if provider.get("tiles") and \
+                fetch_from_tiles(provider["tiles"], grid, area_name, filepath, meta, bbox, current_date, context):
+            print(f"  âœ“ Current OSM saved: {filepath}")
+            return filepath
 
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
+        if not provider.get("export"):
+            print(f"  âœ— No export fallback for {provider['name']} OSM imagery of {area_name}")
+            return None
+        response = http_client.get(provider["export"], params=params, timeout=30)
+        metrics.record_bytes(source, len(response.content))
 
-            # Add label with coordinates
-            label = f"{area_name} ({latitude:.4f}, {longitude:.4f}) - OSM"
-            add_label_to_image(filepath, label)
+        if response.status_code == 200:
+            save_image(response.content, filepath, meta, area_name, source, bbox, current_date, context)
 
             print(f"  âœ“ Current OSM saved: {filepath}")
             return filepath
@@ -232,62 +756,98 @@ def haversine(lon1, lat1, lon2, lat2):
 
 
 
+# ==========================================================
+# PARSE COORDINATES
+# ==========================================================
+def parse_coordinates(json_path):
+    """
+    Read the scraped zone JSON and return (area_name, lat, lon). The scraped
+    location wins; the gazetteer is only the fallback when it is missing.
+    Raises ValueError if no coordinates can be determined.
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+        
+    area_name = data.get('area_name', 'Unknown')
+    location_str = data.get('location', '')
+    
+    # script.py output: "22.0173Â°N, 82.4790Â°E"
+    import re
+    
+    # Extract numbers using regex
+    nums = re.findall(r"[-+]?\d*\.\d+|\d+", location_str)
+    if len(nums) >= 2:
+        lat = float(nums[0])
+        lon = float(nums[1])
+        print(f"  Parsed Coordinates: {lat}, {lon}")
+        return area_name, lat, lon
+
+    known = gazetteer.lookup(area_name)
+    if known:
+        print(f"  Gazetteer Coordinates ({known['source']}): {known['lat']}, {known['lon']}")
+        return area_name, known["lat"], known["lon"]
+    raise ValueError("Could not parse coordinates")
+
+
+# ==========================================================
+# IMAGERY STAGES
+# ==========================================================
+def fetch_stages(deps=("location", "grid"), context=None):
+    """
+    The independent imagery fetches as dag.Stage objects: the three images
+    and the present-day reflectance (present_bands, context only), which
+    runs alongside the historical composite rather than after it.
+    Each expects results["location"] == (area_name, lat, lon) and
+    results["grid"] from zone_grid. Images are handed over through the
+    pipeline context when one is given.
+    """
+    def loc(results):
+        return results["location"]
+
+    def describe(path):
+        return {"image": os.path.basename(path) if path else None}
+
+    return [
+        Stage("current_satellite",
+              lambda r: fetch_current_satellite(loc(r)[1], loc(r)[2], loc(r)[0], context=context, grid=r["grid"]),
+              deps=deps, describe=describe),
+        Stage("current_osm",
+              lambda r: fetch_current_osm(loc(r)[1], loc(r)[2], loc(r)[0], context=context, grid=r["grid"]),
+              deps=deps, describe=describe),
+        Stage("historical_satellite",
+              lambda r: fetch_historical_satellite(loc(r)[1], loc(r)[2], loc(r)[0], 2, context=context, grid=r["grid"]),
+              deps=deps, describe=describe),
+        Stage("present_bands",
+              lambda r: fetch_present_bands(r["grid"], loc(r)[0], context),
+              deps=deps, describe=lambda bands: {"reflectance": bands is not None}),
+    ]
+
+
 # ==========================================================
 # MAIN EXECUTION API
 # ==========================================================
 def main(json_path):
     """
-    Main entry point called by app.py.
+    Main entry point for standalone use.
+    Fetches current satellite, OSM and historical imagery concurrently.
     """
     print(f"GEE: Starting processing for {json_path}")
     
-    # Ensure initialized
-    initialize_ee()
-    
+    # Earth Engine is initialized on first use (ensure_ee), only when a
+    # historical image actually has to be downloaded
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        area_name = data.get('area_name', 'Unknown')
-        location_str = data.get('location', '')
-        
-        # Parse location "22.0173Â°N, 82.4790Â°E" or similar
-        # script.py output: "22.0173Â°N, 82.4790Â°E"
-        # We need to parse this.
-        import re
-        # Pattern: digits optionally decimal, optional degree, optional space, N/S, etc.
-        # But script.py might output clean string or raw?
-        # script.py: f"{match[0]}Â°{match[1]}, {match[2]}Â°{match[3]}" -> "22.0173Â°N, 82.4790Â°E"
-        
-        # Simple parser
-        lat = 0.0
-        lon = 0.0
-        
-        # Remove deg symbol and whitespace
-        clean_loc = location_str.replace('Â°', '').replace(',', ' ').strip()
-        parts = clean_loc.split() 
-        # e.g. ["22.0173N", "82.4790E"] or ["22.0173", "N", "82.4790", "E"]
+        stages = [
+            Stage("location", lambda r: parse_coordinates(json_path)),
+            Stage("grid", lambda r: zone_grid(json_path, r["location"][1], r["location"][2]), deps=["location"]),
+        ] + fetch_stages()
+        run = run_stages(stages, max_workers=3)
         
-        # Extract numbers using regex
-        nums = re.findall(r"[-+]?\d*\.\d+|\d+", location_str)
-        if len(nums) >= 2:
-            lat = float(nums[0])
-            lon = float(nums[1])
-        else:
-            # Fallback for known areas if parsing fails
-            if "Kapan" in area_name:
-                lat, lon = 22.017307, 82.479004
-            elif "Gondwara" in area_name:
-                lat, lon = 21.290583, 81.614885
-            else:
-                 return {"status": "error", "error": "Could not parse coordinates"}
-
-        print(f"  Parsed Coordinates: {lat}, {lon}")
+        if run["status"].get("location") != "success":
+            return {"status": "error", "error": run["errors"].get("location", "Could not parse coordinates")}
         
-        # Fetch images
-        current_sat = fetch_current_satellite(lat, lon, area_name)
-        current_osm = fetch_current_osm(lat, lon, area_name)
-        historical_sat = fetch_historical_satellite(lat, lon, area_name, 2)
+        current_sat = run["results"].get("current_satellite")
+        current_osm = run["results"].get("current_osm")
+        historical_sat = run["results"].get("historical_satellite")
         
         result = {
             "status": "success",
@@ -0,0 +1,228 @@
+"""
+Geometry helpers for CSIDC zone boundaries and plot polygons.
+
+The CSIDC viewer loads plot geometry as ArcGIS REST JSON or GeoJSON,
+sometimes in Web Mercator. These helpers normalise such payloads to
+GeoJSON features in lon/lat (EPSG:4326) and compute bboxes, centroids and
+pixel coordinates for georeferenced images.
+"""
+import math
+import json
+
+EARTH_RADIUS_M = 6378137.0
+WEB_MERCATOR_WKIDS = {102100, 102113, 900913, 3857, 3785}
+
+
+def web_mercator_to_lonlat(x, y):
+    lon = math.degrees(x / EARTH_RADIUS_M)
+    lat = math.degrees(2 * math.atan(math.exp(y / EARTH_RADIUS_M)) - math.pi / 2)
+    return lon, lat
+
+
+def _convert_ring(ring, mercator):
+    if not mercator:
+        return [[float(pt[0]), float(pt[1])] for pt in ring]
+    return [list(web_mercator_to_lonlat(pt[0], pt[1])) for pt in ring]
+
+
+def _looks_projected(rings):
+    # Lon/lat can't exceed 180; anything larger must be metres
+    return any(abs(pt[0]) > 180 or abs(pt[1]) > 90 for ring in rings for pt in ring[:1])
+
+
+def _wkid(spatial_reference):
+    if not isinstance(spatial_reference, dict):
+        return None
+    return spatial_reference.get("latestWkid") or spatial_reference.get("wkid")
+
+
+def _arcgis_feature(feature, wkid):
+    geometry = feature.get("geometry") or {}
+    rings = geometry.get("rings")
+    if not rings:
+        return None
+    mercator = _wkid(geometry.get("spatialReference")) in WEB_MERCATOR_WKIDS or wkid in WEB_MERCATOR_WKIDS \
+        or _looks_projected(rings)
+    return {
+        "type": "Feature",
+        "properties": dict(feature.get("attributes") or {}),
+        "geometry": {"type": "Polygon", "coordinates": [_convert_ring(r, mercator) for r in rings]},
+    }
+
+
+def _geojson_feature(feature):
+    geometry = feature.get("geometry") or {}
+    gtype = geometry.get("type")
+    if gtype == "Polygon":
+        polygons = [geometry.get("coordinates") or []]
+    elif gtype == "MultiPolygon":
+        polygons = geometry.get("coordinates") or []
+    else:
+        return None
+    polygons = [p for p in polygons if p]
+    if not polygons:
+        return None
+    mercator = _looks_projected(polygons[0])
+    converted = [[_convert_ring(r, mercator) for r in polygon] for polygon in polygons]
+    geometry = ({"type": "Polygon", "coordinates": converted[0]} if gtype == "Polygon"
+                else {"type": "MultiPolygon", "coordinates": converted})
+    return {"type": "Feature", "properties": dict(feature.get("properties") or {}), "geometry": geometry}
+
+
+def extract_polygon_features(payload):
+    """
+    Pull polygon features out of a map-service response.
+
+    Understands GeoJSON FeatureCollections/Features and ArcGIS REST
+    query results ({"features": [{"attributes", "geometry": {"rings"}}]}).
+    Returns GeoJSON features in lon/lat; anything else yields [].
+    """
+    if not isinstance(payload, dict):
+        return []
+
+    features = []
+    if payload.get("type") == "FeatureCollection":
+        for feature in payload.get("features") or []:
+            converted = _geojson_feature(feature) if isinstance(feature, dict) else None
+            if converted:
+                features.append(converted)
+    elif payload.get("type") == "Feature":
+        converted = _geojson_feature(payload)
+        if converted:
+            features.append(converted)
+    elif isinstance(payload.get("features"), list):
+        wkid = _wkid(payload.get("spatialReference"))
+        for feature in payload["features"]:
+            converted = _arcgis_feature(feature, wkid) if isinstance(feature, dict) else None
+            if converted:
+                features.append(converted)
+    return features
+
+
+def polygons_of(geometry):
+    """List of polygons (each a list of rings) for a Polygon or MultiPolygon."""
+    if geometry.get("type") == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry.get("type") == "MultiPolygon":
+        return geometry["coordinates"]
+    return []
+
+
+def ring_area(ring):
+    """Signed shoelace area in squared degrees."""
+    area = 0.0
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        area += x1 * y2 - x2 * y1
+    return area / 2.0
+
+
+def feature_area(feature):
+    """Approximate area (squared degrees) of outer rings minus holes."""
+    total = 0.0
+    for polygon in polygons_of(feature["geometry"]):
+        if not polygon:
+            continue
+        total += abs(ring_area(polygon[0])) - sum(abs(ring_area(hole)) for hole in polygon[1:])
+    return total
+
+
+def bbox_of(features):
+    """[west, south, east, north] covering all features, or None."""
+    xs, ys = [], []
+    for feature in features:
+        for polygon in polygons_of(feature["geometry"]):
+            for ring in polygon:
+                for x, y in ring:
+                    xs.append(x)
+                    ys.append(y)
+    if not xs:
+        return None
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def centroid_of(feature):
+    """Area-weighted centroid (lon, lat) of a polygon feature's outer rings."""
+    cx = cy = total = 0.0
+    for polygon in polygons_of(feature["geometry"]):
+        ring = polygon[0] if polygon else []
+        for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+            cross = x1 * y2 - x2 * y1
+            cx += (x1 + x2) * cross
+            cy += (y1 + y2) * cross
+            total += cross
+    if abs(total) < 1e-18:
+        west, south, east, north = bbox_of([feature])
+        return (west + east) / 2, (south + north) / 2
+    return cx / (3 * total), cy / (3 * total)
+
+
+def format_location(lat, lon):
+    """Same "22.0173°N, 82.4790°E" form that script.py scrapes from the viewer."""
+    return f"{abs(lat):.4f}°{'N' if lat >= 0 else 'S'}, {abs(lon):.4f}°{'E' if lon >= 0 else 'W'}"
+
+
+def feature_key(feature):
+    """Stable identity used to de-duplicate features seen in several responses."""
+    return json.dumps(feature["geometry"], sort_keys=True)
+
+
+METRES_PER_DEGREE = 111320.0
+
+
+def imagery_grid(extent, resolution_m=2.0, margin=0.1, min_pixels=256, max_pixels=2048, min_extent_m=200.0):
+    """
+    Shared EPSG:4326 pixel grid for every image of a zone.
+
+    Covers extent ([west, south, east, north]) plus margin on each side at
+    about resolution_m per pixel, coarsened so the longer side is at most
+    max_pixels and refined so it is at least min_pixels.
+
+    Returns:
+        dict: {"bbox", "width", "height", "crs", "resolution_m"}
+    """
+    west, south, east, north = extent
+    cos_lat = math.cos(math.radians((south + north) / 2))
+
+    # Degenerate extents (a point, a sliver) still get a usable footprint
+    min_dlon = min_extent_m / (METRES_PER_DEGREE * cos_lat)
+    min_dlat = min_extent_m / METRES_PER_DEGREE
+    if east - west < min_dlon:
+        west, east = (west + east - min_dlon) / 2, (west + east + min_dlon) / 2
+    if north - south < min_dlat:
+        south, north = (south + north - min_dlat) / 2, (south + north + min_dlat) / 2
+
+    pad_lon, pad_lat = (east - west) * margin, (north - south) * margin
+    west, east, south, north = west - pad_lon, east + pad_lon, south - pad_lat, north + pad_lat
+
+    width_m = (east - west) * METRES_PER_DEGREE * cos_lat
+    height_m = (north - south) * METRES_PER_DEGREE
+    longest = max(width_m, height_m)
+    resolution = min(max(resolution_m, longest / max_pixels), longest / min_pixels)
+
+    return {
+        "bbox": [west, south, east, north],
+        "width": max(1, round(width_m / resolution)),
+        "height": max(1, round(height_m / resolution)),
+        "crs": "EPSG:4326",
+        "resolution_m": round(resolution, 3),
+    }
+
+
+def bbox_polygon(bbox):
+    """GeoJSON Polygon geometry of a [west, south, east, north] bbox."""
+    west, south, east, north = bbox
+    return {"type": "Polygon",
+            "coordinates": [[[west, south], [east, south], [east, north], [west, north], [west, south]]]}
+
+
+def lonlat_to_pixel(lon, lat, bbox, width, height):
+    """Pixel (x, y) of a lon/lat point in an EPSG:4326 image covering bbox."""
+    west, south, east, north = bbox
+    x = (lon - west) / (east - west) * width
+    y = (north - lat) / (north - south) * height
+    return x, y
+
+
+def load_feature_collection(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
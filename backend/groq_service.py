@@ -2,43 +2,48 @@
 import os
 import base64
 import json
-from groq import Groq
 
-# Initialize Groq client
-# Ensure GROQ_API_KEY is in environment variables (loaded by dotenv in app.py)
-client = None
+import cv2
+import numpy as np
 
+import http_client
+import metrics
+
+# Groq rejects base64 images over 4 MB; full-resolution grids can exceed that
+MAX_IMAGE_BYTES = int(os.environ.get("GROQ_MAX_IMAGE_BYTES", 3 * 1024 * 1024))
+MAX_IMAGE_SIDE = int(os.environ.get("GROQ_MAX_IMAGE_SIDE", 1024))
+
+# The Groq client is shared with dashboard_insights_service (see http_client.py)
 def get_client():
-    global client
-    if not client:
-        # Check .env or os.environ
-        api_key = os.environ.get("GROQ_API_KEY")
-        if not api_key:
-            # Fallback to loading from .env manually if not running via app.py
-            try:
-                from dotenv import load_dotenv
-                load_dotenv()
-                api_key = os.environ.get("GROQ_API_KEY")
-            except:
-                pass
-        
-        if not api_key:
-            print("[ERROR] GROQ_API_KEY not found in environment!")
-            return None
-            
-        client = Groq(api_key=api_key)
-    return client
+    return http_client.get_groq_client()
 
-def encode_image(image_path):
-    """Encode image to base64 string"""
-    if not os.path.exists(image_path):
+def _shrink(data):
+    """Downscaled JPEG of an encoded image that is too large to send."""
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return data
+    scale = MAX_IMAGE_SIDE / max(img.shape[:2])
+    if scale < 1:
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return buffer.tobytes() if ok else data
+
+def encode_image(image_path, context=None):
+    """Encode image to base64 string (from the pipeline context if it holds the image)"""
+    if context is not None and context.has(image_path):
+        data = context.encoded(image_path)
+    elif not os.path.exists(image_path):
         print(f"[WARN] Image not found for encoding: {image_path}")
         return None
-        
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+    else:
+        with open(image_path, "rb") as image_file:
+            data = image_file.read()
+
+    if len(data) > MAX_IMAGE_BYTES:
+        data = _shrink(data)
+    return base64.b64encode(data).decode('utf-8')
 
-def analyze_encroachment(past_image_path, present_image_path, overlay_image_path, area_name="Unknown"):
+def analyze_encroachment(past_image_path, present_image_path, overlay_image_path, area_name="Unknown", context=None):
     """
     Analyze satellite images using Llama-3.2-90b-vision-preview on Groq.
     
@@ -47,6 +52,7 @@ def analyze_encroachment(past_image_path, present_image_path, overlay_image_path
         present_image_path: Path to current satellite image
         overlay_image_path: Path to the encroachment analysis overlay (Green/Yellow/Blue)
         area_name: Name of the zone
+        context: Optional pipeline_context.PipelineContext holding the images
         
     Returns:
         dict: JSON analysis result
@@ -58,9 +64,9 @@ def analyze_encroachment(past_image_path, present_image_path, overlay_image_path
         return {"error": "Groq client not initialized (missing API key)"}
 
     # Encode images
-    past_b64 = encode_image(past_image_path)
-    present_b64 = encode_image(present_image_path)
-    overlay_b64 = encode_image(overlay_image_path)
+    past_b64 = encode_image(past_image_path, context)
+    present_b64 = encode_image(present_image_path, context)
+    overlay_b64 = encode_image(overlay_image_path, context)
     
     if not past_b64 or not present_b64:
         return {"error": "Missing source images for analysis"}
@@ -122,6 +128,8 @@ def analyze_encroachment(past_image_path, present_image_path, overlay_image_path
             }
         })
 
+    metrics.record_bytes("groq_vision", len(prompt) + sum(len(b or "") for b in (past_b64, present_b64, overlay_b64)), "sent")
+
     try:
         completion = client.chat.completions.create(
             model="meta-llama/llama-4-maverick-17b-128e-instruct",  # Multimodal model with vision support
@@ -134,6 +142,7 @@ def analyze_encroachment(past_image_path, present_image_path, overlay_image_path
         )
         
         response_text = completion.choices[0].message.content
+        metrics.record_bytes("groq_vision", len(response_text or ""))
         print("Groq Response received.")
         print(f"[DEBUG] Raw Groq response: {response_text[:200]}...")
         
@@ -159,7 +168,7 @@ def analyze_encroachment(past_image_path, present_image_path, overlay_image_path
         print(f"[ERROR] Groq API failed: {e}")
         return {"error": str(e)}
 
-def detect_plot_status(original_map_path, analysis_image_path, zone):
+def detect_plot_status(original_map_path, analysis_image_path, zone, context=None):
     """
     Analyze the original map (with plot numbers) and the analysis image to identify specific plots.
     
@@ -167,6 +176,7 @@ def detect_plot_status(original_map_path, analysis_image_path, zone):
         original_map_path: Path to the original CSIDC map image (contains plot numbers)
         analysis_image_path: Path to the analysis result image (shows encroachment/status)
         zone: Zone name
+        context: Optional pipeline_context.PipelineContext holding the images
         
     Returns:
         dict: Lists of plot numbers for different categories
@@ -178,8 +188,8 @@ def detect_plot_status(original_map_path, analysis_image_path, zone):
         return {"error": "Groq client not initialized"}
 
     # Encode images
-    map_b64 = encode_image(original_map_path)
-    analysis_b64 = encode_image(analysis_image_path)
+    map_b64 = encode_image(original_map_path, context)
+    analysis_b64 = encode_image(analysis_image_path, context)
     
     if not map_b64 or not analysis_b64:
         return {"error": "Missing source images for plot detection"}
@@ -232,6 +242,8 @@ def detect_plot_status(original_map_path, analysis_image_path, zone):
         }
     ]
 
+    metrics.record_bytes("groq_vision", len(prompt) + len(map_b64) + len(analysis_b64), "sent")
+
     try:
         completion = client.chat.completions.create(
             model="meta-llama/llama-4-maverick-17b-128e-instruct", # Using vision model
@@ -243,6 +255,7 @@ def detect_plot_status(original_map_path, analysis_image_path, zone):
         )
         
         response_text = completion.choices[0].message.content
+        metrics.record_bytes("groq_vision", len(response_text or ""))
         print("Groq Plot Detection Response received.")
         
         # Parse JSON
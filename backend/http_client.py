@@ -0,0 +1,146 @@
+"""
+Shared HTTP clients for every external call the backend makes.
+
+One pooled requests.Session per process keeps TCP/TLS connections to
+ESRI, Earth Engine thumbnails and the tile servers alive between calls,
+with at most HTTP_POOL_MAXSIZE connections per host. Requests are retried
+on connection errors, timeouts and 429/5xx responses with jittered
+exponential backoff, honouring Retry-After when the server sends it.
+
+The Groq SDK client is shared the same way (get_groq_client), so the
+vision and insights services reuse one connection pool; the SDK does its
+own Retry-After aware retries, configured with the same limits.
+"""
+import os
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# Connections kept open per host (also the cap on concurrent requests to it)
+POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", 10))
+# Distinct hosts whose pools are kept
+POOL_HOSTS = int(os.environ.get("HTTP_POOL_HOSTS", 10))
+# Retries after the first attempt
+MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", 3))
+BACKOFF_BASE = float(os.environ.get("HTTP_BACKOFF_BASE", 0.5))
+# Upper bound on one backoff sleep, including a server's Retry-After
+BACKOFF_MAX = float(os.environ.get("HTTP_BACKOFF_MAX", 30))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_session = None
+_groq_client = None
+_lock = threading.Lock()
+
+
+def get_session():
+    """The process-wide pooled session."""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            # pool_block: wait for a free connection instead of opening extras
+            adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_MAXSIZE,
+                                  pool_block=True, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _retry_after(response):
+    """Seconds requested by a Retry-After header (delta or HTTP date), or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff for the given retry (0-based)."""
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def request(method, url, retries=MAX_RETRIES, **kwargs):
+    """
+    requests.request through the shared session, retried on transient failures.
+
+    Returns the last response (callers still check status_code), or raises
+    the last requests.RequestException if no response was ever received.
+    """
+    session = get_session()
+    host = urlsplit(url).hostname or ""
+    for attempt in range(retries + 1):
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= retries:
+                raise
+            reason, delay = type(e).__name__, backoff_delay(attempt)
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                return response
+            reason, delay = str(response.status_code), backoff_delay(attempt, _retry_after(response))
+            response.close()
+
+        metrics.HTTP_RETRIES.inc(host=host, reason=reason)
+        print(f"  HTTP {method} {host} failed ({reason}), retry {attempt + 1}/{retries} in {delay:.1f}s")
+        time.sleep(delay)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def get_groq_client():
+    """
+    The shared Groq client, or None if GROQ_API_KEY is not set.
+    Falls back to loading .env when not running via app.py.
+    """
+    global _groq_client
+    with _lock:
+        if _groq_client is not None:
+            return _groq_client
+
+        api_key = os.environ.get("GROQ_API_KEY")
+        if not api_key:
+            try:
+                from dotenv import load_dotenv
+                load_dotenv()
+                api_key = os.environ.get("GROQ_API_KEY")
+            except ImportError:
+                pass
+        if not api_key:
+            print("[ERROR] GROQ_API_KEY not found in environment!")
+            return None
+
+        import httpx
+        from groq import Groq
+
+        limits = httpx.Limits(max_connections=POOL_MAXSIZE, max_keepalive_connections=POOL_MAXSIZE)
+        _groq_client = Groq(
+            api_key=api_key,
+            max_retries=MAX_RETRIES,
+            http_client=httpx.Client(limits=limits),
+        )
+        return _groq_client
@@ -0,0 +1,98 @@
+"""
+Georeferencing metadata for fetched imagery.
+
+Images used to carry a text label burned into their top-left corner, which
+cost a full decode/encode per image and hid pixels from the detector and
+the vision model. Instead every image in downloads/ gets two sidecars:
+
+    satellite_X.json   label, source, bbox, CRS, size, acquisition date or
+                       window, masked (cloud) percentage, fetch date
+    satellite_X.pgw    ESRI world file, so GIS tools place the PNG directly
+
+Labels are rendered by the frontend from the JSON at display time.
+"""
+import os
+import json
+import threading
+from datetime import datetime
+
+WORLD_FILE_EXTENSIONS = {".png": ".pgw", ".jpg": ".jgw", ".jpeg": ".jgw", ".tif": ".tfw", ".tiff": ".tfw"}
+
+
+def describe(label, source, grid=None, acquired=None, cloud_pct=None):
+    """
+    Metadata dict for an image.
+
+    Args:
+        label (str): Caption for display
+        source (str): Provider / artifact cache source name
+        grid (dict): gee.zone_grid grid the image is on (bbox, size, CRS)
+        acquired (str | list): Acquisition date, or [start, end] window
+        cloud_pct (float): Percentage of pixels masked as cloud/shadow
+    """
+    meta = {
+        "label": label,
+        "source": source,
+        "acquired": acquired,
+        "cloud_pct": cloud_pct,
+        "fetched": datetime.now().strftime("%Y-%m-%d"),
+    }
+    if grid:
+        meta.update({
+            "bbox": list(grid["bbox"]),
+            "crs": grid["crs"],
+            "width": grid["width"],
+            "height": grid["height"],
+            "resolution_m": grid["resolution_m"],
+        })
+    return meta
+
+
+def sidecar_path(image_path):
+    return os.path.splitext(image_path)[0] + ".json"
+
+
+def world_file_path(image_path):
+    base, ext = os.path.splitext(image_path)
+    return base + WORLD_FILE_EXTENSIONS.get(ext.lower(), ".wld")
+
+
+def world_file(bbox, width, height):
+    """
+    World file text for an EPSG:4326 image covering bbox: pixel size, two
+    rotation terms, negative pixel height, then the upper-left pixel centre.
+    """
+    west, south, east, north = bbox
+    dx, dy = (east - west) / width, (north - south) / height
+    return "\n".join(f"{v:.12f}" for v in (dx, 0.0, 0.0, -dy, west + dx / 2, north - dy / 2)) + "\n"
+
+
+def _write_text(path, text):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write(image_path, meta):
+    """Write the JSON sidecar (and world file when meta has a bbox) next to image_path."""
+    if not meta:
+        return
+    try:
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        _write_text(sidecar_path(image_path), json.dumps(meta, indent=2))
+        if meta.get("bbox") and meta.get("width") and meta.get("height"):
+            _write_text(world_file_path(image_path), world_file(meta["bbox"], meta["width"], meta["height"]))
+    except OSError as e:
+        print(f"  Could not write metadata for {image_path}: {e}")
+
+
+def read(image_path):
+    """Metadata written by write(), or None."""
+    if not image_path:
+        return None
+    try:
+        with open(sidecar_path(image_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
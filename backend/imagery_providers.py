@@ -0,0 +1,92 @@
+"""
+Imagery providers for the three image kinds a zone needs.
+
+    current      current satellite imagery
+    street       street map reference
+    historical   imagery from years_ago
+
+Each kind has named providers, chosen with IMAGERY_CURRENT_PROVIDER,
+IMAGERY_STREET_PROVIDER and IMAGERY_HISTORICAL_PROVIDER. A provider is a
+dict describing where gee.py gets the pixels:
+
+    source   artifact cache / metrics source name
+    tiles    tiles.py source to mosaic from (optional)
+    export   ArcGIS-style /export URL taking bbox/size/imageSR (optional)
+
+The historical providers "pixels", "thumbnail" and "wayback" are the
+Earth Engine and Wayback paths in gee.py. GEE_HISTORICAL_MODE still works
+as the historical default.
+
+The "standin" providers point at standin_server.py, a local server that
+replays recorded tiles and exports, with configurable latency and errors.
+The pipeline can then be benchmarked offline, without credentials.
+"""
+import os
+
+import tiles
+
+STANDIN_URL = os.environ.get("IMAGERY_STANDIN_URL", "http://127.0.0.1:8765").rstrip("/")
+
+ESRI_EXPORT_URL = "https://server.arcgisonline.com/ArcGIS/rest/services/{service}/MapServer/export"
+
+PROVIDERS = {
+    "current": {
+        "esri": {
+            "source": "esri_world_imagery",
+            "tiles": "esri_world_imagery",
+            "export": ESRI_EXPORT_URL.format(service="World_Imagery"),
+        },
+    },
+    "street": {
+        "esri": {
+            "source": "esri_world_street_map",
+            "tiles": "esri_world_street_map",
+            "export": ESRI_EXPORT_URL.format(service="World_Street_Map"),
+        },
+    },
+    "historical": {
+        "pixels": {"source": "gee_s2_bands"},
+        "thumbnail": {"source": "gee_s2_historical"},
+        "wayback": {"source": "wayback"},
+    },
+}
+
+SELECTED = {
+    "current": os.environ.get("IMAGERY_CURRENT_PROVIDER", "esri"),
+    "street": os.environ.get("IMAGERY_STREET_PROVIDER", "esri"),
+    "historical": os.environ.get("IMAGERY_HISTORICAL_PROVIDER", os.environ.get("GEE_HISTORICAL_MODE", "pixels")),
+}
+
+
+def register(kind, name, source, tiles_source=None, export=None):
+    """Add a provider of kind ("current", "street" or "historical")."""
+    PROVIDERS[kind][name] = {"source": source, "tiles": tiles_source, "export": export}
+
+
+def provider(kind, name=None):
+    """
+    The provider dict for kind (the configured one unless name is given),
+    with its "name" filled in.
+
+    Raises:
+        ValueError: If no such provider is registered
+    """
+    name = name or SELECTED[kind]
+    spec = PROVIDERS[kind].get(name)
+    if spec is None:
+        raise ValueError(f"Unknown {kind} imagery provider '{name}' (have: {', '.join(PROVIDERS[kind])})")
+    return dict(spec, name=name)
+
+
+def _register_standin():
+    # The stand-in names its tile layers after the real sources it replays
+    for kind, layer in (("current", "esri_world_imagery"), ("street", "esri_world_street_map"),
+                        ("historical", "historical")):
+        source = f"standin_{layer}"
+        # Not cached on disk: every benchmark request has to reach the server
+        tiles.register_source(source, f"{STANDIN_URL}/tiles/{layer}/{{z}}/{{y}}/{{x}}", cache=False)
+        register(kind, "standin", source, tiles_source=source,
+                 export=f"{STANDIN_URL}/export/{layer}" if kind != "historical" else None)
+
+
+_register_standin()
@@ -0,0 +1,177 @@
+"""
+Background job manager for pipeline runs.
+
+POST /api/jobs submits a zone and returns a job id straight away; a bounded
+pool of worker threads runs pipeline.run_pipeline and records per-step
+status, which GET /api/jobs/<id> returns together with the final payload.
+Every step transition is also kept as an event so GET /api/jobs/<id>/events
+can stream progress to the dashboard as Server-Sent Events.
+
+Jobs are kept in memory, so run gunicorn with a single worker process and
+several threads (see Dockerfile) for job ids to resolve on every request.
+"""
+import os
+import time
+import uuid
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pipeline
+
+# Number of pipelines allowed to run at the same time
+MAX_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", 2))
+# Queued + running jobs accepted before new submissions are rejected
+MAX_PENDING_JOBS = int(os.environ.get("ANALYSIS_MAX_PENDING", 20))
+# Finished jobs are forgotten after this many seconds
+JOB_TTL_SECONDS = int(os.environ.get("ANALYSIS_JOB_TTL", 3600))
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue already holds MAX_PENDING_JOBS jobs."""
+
+
+class Job:
+    def __init__(self, zone):
+        self.id = uuid.uuid4().hex
+        self.zone = zone
+        self.status = "queued"
+        self.steps = OrderedDict(
+            (step, {"status": "pending"}) for step in pipeline.STEPS
+        )
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self._finished_ts = None
+        self._start_ts = None
+        self._lock = threading.Lock()
+        # Progress events for the SSE stream; waiters are woken on each append
+        self.events = []
+        self._cond = threading.Condition(self._lock)
+        with self._lock:
+            self._emit({"type": "job", "status": "queued"})
+
+    @property
+    def finished(self):
+        return self.status in ("succeeded", "failed")
+
+    def _emit(self, event):
+        """Append an event. Caller must hold self._lock."""
+        event["id"] = len(self.events)
+        event["elapsed_seconds"] = round(time.time() - self._start_ts, 3) if self._start_ts else 0.0
+        self.events.append(event)
+        self._cond.notify_all()
+
+    def set_status(self, status, **fields):
+        with self._lock:
+            self.status = status
+            if status == "running":
+                self._start_ts = time.time()
+                self.started_at = datetime.now().isoformat()
+            elif status in ("succeeded", "failed"):
+                self._finished_ts = time.time()
+                self.finished_at = datetime.now().isoformat()
+            for name, value in fields.items():
+                setattr(self, name, value)
+            event = {"type": "job", "status": status}
+            if status in ("succeeded", "failed"):
+                event["result"] = self.result
+                event["error"] = self.error
+            self._emit(event)
+
+    def on_step(self, step, status, info=None):
+        """Callback handed to run_pipeline to record step progress."""
+        with self._lock:
+            entry = self.steps.setdefault(step, {"status": "pending"})
+            now = time.time()
+            if status == "running":
+                entry["started_at"] = now
+            elif "started_at" in entry:
+                entry["duration_seconds"] = round(now - entry["started_at"], 3)
+            entry["status"] = status
+            if info:
+                entry.update(info)
+            event = {"type": "step", "step": step, "status": status}
+            if "duration_seconds" in entry and status != "running":
+                event["duration_seconds"] = entry["duration_seconds"]
+            if info:
+                event["info"] = info
+            self._emit(event)
+
+    def wait_for_events(self, after, timeout=15):
+        """
+        Return events with id >= `after`, blocking up to `timeout` seconds
+        until at least one is available. Returns [] on timeout.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: len(self.events) > after or self.finished, timeout=timeout)
+            return list(self.events[after:])
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "zone": self.zone,
+                "status": self.status,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "steps": {name: dict(entry) for name, entry in self.steps.items()},
+                "result": self.result,
+                "error": self.error,
+            }
+
+
+class JobManager:
+    def __init__(self, max_workers=MAX_WORKERS, max_pending=MAX_PENDING_JOBS):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, zone):
+        """Queue a pipeline run for `zone` and return the Job."""
+        with self._lock:
+            self._prune()
+            pending = sum(1 for job in self._jobs.values() if job.status in ("queued", "running"))
+            if pending >= self.max_pending:
+                raise QueueFullError(f"Too many pending jobs ({pending}), try again later")
+            job = Job(zone)
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        job.set_status("running")
+        try:
+            result = pipeline.run_pipeline(job.zone, on_step=job.on_step)
+            if result.get("status") == "success":
+                job.set_status("succeeded", result=result)
+            else:
+                job.set_status("failed", result=result, error=result.get("error"))
+        except Exception as e:
+            print(f"✗ Job {job.id} failed: {e}")
+            traceback.print_exc()
+            job.set_status("failed", error=str(e))
+
+    def _prune(self):
+        cutoff = time.time() - JOB_TTL_SECONDS
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job._finished_ts is not None and job._finished_ts < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+# Shared manager used by app.py
+manager = JobManager()
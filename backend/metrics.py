@@ -0,0 +1,151 @@
+"""
+In-process Prometheus metrics for the analysis pipeline.
+
+A small dependency-free implementation of labelled counters and
+histograms, rendered in the Prometheus text exposition format by
+GET /api/metrics. Values are per process, which matches the single
+gunicorn process the server runs as.
+"""
+import threading
+
+# Stage latencies range from milliseconds (OpenCV) to minutes (scraping)
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    le = f'le="{_format_number(bound)}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_number(series['sum'])}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+# ==========================================================
+# PIPELINE METRICS
+# ==========================================================
+STAGE_DURATION = Histogram(
+    "pipeline_stage_duration_seconds",
+    "Wall-clock duration of each pipeline stage.",
+    ["stage"],
+)
+STAGE_RESULTS = Counter(
+    "pipeline_stage_total",
+    "Finished pipeline stages by outcome (success, error, skipped).",
+    ["stage", "status"],
+)
+PIPELINE_RUNS = Counter(
+    "pipeline_runs_total",
+    "Finished zone analyses by outcome.",
+    ["status"],
+)
+BYTES_TRANSFERRED = Counter(
+    "pipeline_bytes_transferred_total",
+    "Bytes exchanged with external services.",
+    ["source", "direction"],
+)
+CACHE_LOOKUPS = Counter(
+    "artifact_cache_lookups_total",
+    "Artifact cache lookups by source and result (hit, miss).",
+    ["source", "result"],
+)
+SCRAPE_WAITS = Histogram(
+    "scrape_wait_seconds",
+    "Per scrape: time spent waiting on the CSIDC portal (waited) and fixed sleep avoided (saved).",
+    ["kind"],
+    buckets=(0.5, 1, 2, 5, 10, 15, 20, 26, 30, 60),
+)
+HTTP_RETRIES = Counter(
+    "http_retries_total",
+    "Retried external HTTP requests by host and reason (status code or error).",
+    ["host", "reason"],
+)
+
+REGISTRY = [STAGE_DURATION, STAGE_RESULTS, PIPELINE_RUNS, BYTES_TRANSFERRED, CACHE_LOOKUPS, SCRAPE_WAITS,
+            HTTP_RETRIES]
+
+
+def observe_stage(stage, status, duration_seconds=None):
+    """Record a finished stage; called from the pipeline's on_step hook."""
+    if status == "running":
+        return
+    STAGE_RESULTS.inc(stage=stage, status=status)
+    if duration_seconds is not None:
+        STAGE_DURATION.observe(duration_seconds, stage=stage)
+
+
+def record_bytes(source, num_bytes, direction="received"):
+    """Count bytes downloaded from (or uploaded to) an external service."""
+    if num_bytes:
+        BYTES_TRANSFERRED.inc(num_bytes, source=source, direction=direction)
+
+
+def render():
+    """All metrics in Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -1,24 +1,181 @@
 ﻿"""
 Advanced Encroachment Detection using Computer Vision
 Logic: Yellow (Past) + Blue (Present) = Green (Stable)
+
+Change detection: past and present imagery share one grid, so they are
+compared pixel by pixel inside the zone boundary. Spectral indices
+(NDVI, NDBI, BSI) from the Sentinel-2 reflectance of both frames, or RGB
+proxies when only rendered imagery is available (tile or thumbnail
+providers), classify each pixel as vegetation, built-up or bare soil, and a
+radiometrically normalized colour difference gives the change magnitude. The resulting
+construction / vegetation / change percentages take milliseconds and need
+no network call.
 """
 import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 import cv2
 import numpy as np
 from datetime import datetime
 import json
 
+import artifact_cache
+import geo
+import metrics
+import plot_index
+
+# Index thresholds for the RGB land-cover classes (see rgb_indices)
+VEGETATION_THRESHOLD = float(os.environ.get("DETECTOR_VEGETATION_THRESHOLD", 0.05))
+BUILTUP_THRESHOLD = float(os.environ.get("DETECTOR_BUILTUP_THRESHOLD", 0.45))
+BARE_SOIL_THRESHOLD = float(os.environ.get("DETECTOR_BARE_SOIL_THRESHOLD", 0.12))
+# Spectral index thresholds, used when Sentinel-2 reflectance is available
+NDVI_THRESHOLD = float(os.environ.get("DETECTOR_NDVI_THRESHOLD", 0.3))
+NDBI_THRESHOLD = float(os.environ.get("DETECTOR_NDBI_THRESHOLD", 0.0))
+BSI_THRESHOLD = float(os.environ.get("DETECTOR_BSI_THRESHOLD", 0.05))
+REFLECTANCE_BANDS = ("blue", "red", "nir", "swir1")
+# Change magnitude (in per-channel standard deviations) counted as change
+CHANGE_THRESHOLD = float(os.environ.get("DETECTOR_CHANGE_THRESHOLD", 1.0))
+# Floor on a channel's spread (grey levels), so flat scenes don't turn noise into change
+CHANGE_MIN_SCALE = 12.0
+CHANGE_SAMPLE_PIXELS = 250_000
+# New construction (percent of the zone) that flags an encroachment
+NEW_CONSTRUCTION_ALERT_PCT = float(os.environ.get("DETECTOR_NEW_CONSTRUCTION_ALERT_PCT", 2.0))
+
+# Per-plot status rules (see plot_status)
+PLOT_CROSSING_MIN_PIXELS = int(os.environ.get("DETECTOR_PLOT_CROSSING_PIXELS", 20))
+PLOT_IDLE_BUILTUP_PCT = float(os.environ.get("DETECTOR_PLOT_IDLE_BUILTUP_PCT", 10.0))
+PLOT_LOW_VEGETATION_PCT = float(os.environ.get("DETECTOR_PLOT_LOW_VEGETATION_PCT", 5.0))
+# New construction blobs mapped to plots through the plot index
+CHANGE_BLOB_MIN_PIXELS = 25
+MAX_CHANGE_BLOBS = 50
+
+
+# Boundary colours (BGR) on the past and present overlays
+YELLOW = np.array((0, 255, 255), dtype=np.uint8)
+BLUE = np.array((255, 0, 0), dtype=np.uint8)
+# Composite line colour per boundary code: bit 0 past boundary, bit 1 present boundary
+PAST_ONLY, PRESENT_ONLY, BOTH = 1, 2, 3
+COMPOSITE_COLORS = {PAST_ONLY: YELLOW, PRESENT_ONLY: BLUE, BOTH: np.array((0, 255, 0), dtype=np.uint8)}
+
+_scratch = threading.local()
+
+
+def _scratch_buffers(shape):
+    """Per-thread full-frame scratch arrays for composite(), reallocated only when the frame size changes."""
+    buffers = getattr(_scratch, "buffers", None)
+    if buffers is None or buffers["code"].shape != shape:
+        buffers = _scratch.buffers = {
+            "code": np.empty(shape, dtype=np.uint8),
+            "past": np.empty(shape, dtype=np.bool_),
+            "present": np.empty(shape, dtype=np.bool_),
+            "select": np.empty(shape, dtype=np.bool_),
+        }
+    return buffers
+
+
+def _paint(img, mask, color):
+    """Set img to color wherever mask is non-zero, in place."""
+    cv2.bitwise_and(img, (0, 0, 0, 0), dst=img, mask=mask)
+    cv2.bitwise_or(img, tuple(int(c) for c in color) + (0,), dst=img, mask=mask)
+    return img
+
+
+# Boundaries extracted from CSIDC maps, by content hash of the map: the last
+# BOUNDARY_CACHE_ENTRIES in memory, and on disk as compressed .npz entries of
+# the artifact cache (so its TTL and size budget apply)
+BOUNDARY_CACHE_SOURCE = "csidc_boundary"
+BOUNDARY_CACHE_ENTRIES = int(os.environ.get("BOUNDARY_CACHE_ENTRIES", 16))
+# Bump when extract_boundary's processing changes, so stale masks are not reused
+BOUNDARY_VERSION = "canny50-150-dilate3-ccomp"
+
+_boundary_cache = OrderedDict()
+_boundary_lock = threading.Lock()
+
+
+def _frozen(mask, contours, hierarchy):
+    # Cached arrays are shared between runs; make in-place edits fail loudly
+    for array in (mask, hierarchy, *contours):
+        if array is not None:
+            array.flags.writeable = False
+    return mask, contours, hierarchy
+
+
+def _load_boundary(key):
+    """(mask, contours, hierarchy) for a map hash from memory or disk, or None."""
+    with _boundary_lock:
+        if key in _boundary_cache:
+            _boundary_cache.move_to_end(key)
+            return _boundary_cache[key]
+    blob = artifact_cache.get("", BOUNDARY_CACHE_SOURCE, window=key)
+    if blob is None:
+        return None
+    # The blob can be evicted between the lookup and the read; that is a miss
+    try:
+        with np.load(blob) as data:
+            points, offsets = data["points"], data["offsets"]
+            contours = tuple(points[offsets[i]:offsets[i + 1]].reshape(-1, 1, 2) for i in range(len(offsets) - 1))
+            hierarchy = data["hierarchy"] if data["hierarchy"].size else None
+            entry = _frozen(data["mask"], contours, hierarchy)
+    except (OSError, KeyError, ValueError):
+        return None
+    _remember_boundary(key, entry)
+    return entry
+
+
+def _remember_boundary(key, entry):
+    with _boundary_lock:
+        _boundary_cache[key] = entry
+        _boundary_cache.move_to_end(key)
+        while len(_boundary_cache) > BOUNDARY_CACHE_ENTRIES:
+            _boundary_cache.popitem(last=False)
+
+
+def _store_boundary(key, entry):
+    _remember_boundary(key, entry)
+    if not artifact_cache.ENABLED:
+        return
+    mask, contours, hierarchy = entry
+    tmp_path = os.path.join(artifact_cache.CACHE_DIR, f"boundary_{key}.{threading.get_ident()}.tmp.npz")
+    offsets = np.cumsum([0] + [len(c) for c in contours])
+    points = np.concatenate([c.reshape(-1, 2) for c in contours]) if contours else np.zeros((0, 2), np.int32)
+    try:
+        os.makedirs(artifact_cache.CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, mask=mask, points=points, offsets=offsets,
+                                hierarchy=hierarchy if hierarchy is not None else np.zeros((0,), np.int32))
+        artifact_cache.put("", BOUNDARY_CACHE_SOURCE, tmp_path, window=key)
+    except OSError as e:
+        print(f"  Could not cache boundary {key[:12]}: {e}")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _pixel_rings(polygon, bbox, width, height, min_points=3):
+    """Rings of a GeoJSON polygon as int32 pixel arrays for cv2 drawing."""
+    return [
+        np.array([geo.lonlat_to_pixel(lon, lat, bbox, width, height) for lon, lat in ring],
+                 dtype=np.float32).round().astype(np.int32)
+        for ring in polygon if len(ring) >= min_points
+    ]
+
 # opencv_superimpose.py is in backend/, so we go up one level
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DOWNLOAD_DIR = os.path.join(BASE_DIR, "downloads")
 
 class EncroachmentDetector:
-    def __init__(self, area_name):
+    def __init__(self, area_name, context=None):
         self.area_name = area_name
         self.output_dir = DOWNLOAD_DIR
+        # pipeline_context.PipelineContext: images in memory, written in the background
+        self.context = context
         os.makedirs(self.output_dir, exist_ok=True)
         
     def load_image(self, path):
+        if self.context is not None:
+            return self.context.array(path)
         if not os.path.exists(path):
             raise FileNotFoundError(f"Image not found: {path}")
         img = cv2.imread(path)
@@ -31,8 +188,45 @@ class EncroachmentDetector:
         Extract the industrial area boundary from the CSIDC map image.
         Returns a binary mask (white boundary on black background).
         """
-        img = self.load_image(csidc_img_path)
-        
+        return self.extract_boundary_contours(csidc_img_path)[0]
+
+    def extract_boundary_contours(self, csidc_img_path):
+        """
+        extract_boundary, also returning the edge contours.
+
+        Results are cached by content hash of the map file, so an unchanged
+        map is never decoded or processed twice. The returned arrays are
+        shared and read-only.
+
+        Returns:
+            tuple: (mask, contours, hierarchy) where contours come from
+                cv2.findContours with RETR_CCOMP, so the holes (contours
+                with a parent) are the closed plot cells
+        """
+        if self.context is not None:
+            data = self.context.encoded(csidc_img_path)
+        elif os.path.exists(csidc_img_path):
+            with open(csidc_img_path, "rb") as f:
+                data = f.read()
+        else:
+            raise FileNotFoundError(f"Image not found: {csidc_img_path}")
+        key = hashlib.sha256(BOUNDARY_VERSION.encode("utf-8") + data).hexdigest()
+
+        cached = _load_boundary(key)
+        metrics.CACHE_LOOKUPS.inc(source="csidc_boundary", result="hit" if cached else "miss")
+        if cached:
+            print("  Boundary cache hit")
+            return cached
+
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError(f"Failed to load image: {csidc_img_path}")
+        entry = _frozen(*self._boundary_from_image(img))
+        _store_boundary(key, entry)
+        return entry
+
+    def _boundary_from_image(self, img):
+        """Edge mask, contours and hierarchy of a decoded CSIDC map."""
         # Convert to grayscale
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         
@@ -47,8 +241,8 @@ class EncroachmentDetector:
         kernel = np.ones((3,3), np.uint8)
         dilated_edges = cv2.dilate(edges, kernel, iterations=1)
         
-        # Find contours to filter out small noise
-        contours, _ = cv2.findContours(dilated_edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        # Find contours to filter out small noise; the inner ones outline the plots
+        contours, hierarchy = cv2.findContours(dilated_edges, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
         
         # Create a clean mask
         mask = np.zeros_like(gray)
@@ -60,58 +254,405 @@ class EncroachmentDetector:
         # For simplicity in this version, we use the dilated edges as the mask.
         mask = dilated_edges
         
+        return mask, contours, hierarchy
+
+    def save_image(self, path, img):
+        if self.context is not None:
+            self.context.put_array(path, img)
+        else:
+            cv2.imwrite(path, img)
+        return path
+
+    def boundary_mask_from_geojson(self, geojson_path, bbox, shape, thickness=3):
+        """
+        Rasterize the zone boundary and plot outlines captured from the CSIDC
+        viewer (script.GeometryCapture) onto an image covering bbox.
+
+        Args:
+            geojson_path (str): FeatureCollection saved by the scraper
+            bbox (list): [west, south, east, north] of the target image (EPSG:4326)
+            shape (tuple): (height, width) of the target image
+
+        Returns a binary mask in the same form as extract_boundary.
+        """
+        height, width = shape[:2]
+        mask = np.zeros((height, width), dtype=np.uint8)
+        collection = geo.load_feature_collection(geojson_path)
+        for feature in collection.get("features", []):
+            for polygon in geo.polygons_of(feature.get("geometry") or {}):
+                rings = _pixel_rings(polygon, bbox, width, height, min_points=2)
+                if rings:
+                    cv2.polylines(mask, rings, isClosed=True, color=255, thickness=thickness)
         return mask
 
-    def create_overlay(self, background_img, boundary_mask, color):
+    def region_mask_from_geojson(self, geojson_path, bbox, shape):
         """
-        Overlay the boundary mask on the background image with a specific color.
-        Color: Tuple (B, G, R) - e.g., Yellow is (0, 255, 255), Blue is (255, 0, 0)
+        Filled interior of the zone boundary (features with role "boundary",
+        or every polygon if none is tagged) on an image covering bbox.
+        Holes stay empty.
         """
-        # Resize mask to match background if needed
-        if boundary_mask.shape[:2] != background_img.shape[:2]:
-            boundary_mask = cv2.resize(boundary_mask, (background_img.shape[1], background_img.shape[0]))
-            
-        # Create a colored layer
-        colored_mask = np.zeros_like(background_img)
-        colored_mask[:] = color
-        
-        # Apply mask: where mask is white, use the color; otherwise black
-        # cv2.bitwise_and requires mask to be single channel
-        overlay = cv2.bitwise_and(colored_mask, colored_mask, mask=boundary_mask)
-        
-        # Combine: Background + Overlay
-        # We want the overlay to be opaque or semi-transparent?
-        # "Superimpose" usually implies visible on top.
-        # Let's add it.
-        
-        # Create a mask of the overlay for blending
-        # Where overlay is not black, we want to replace background or blend
-        
-        # Simple addition (might saturate):
-        # final = cv2.addWeighted(background_img, 1.0, overlay, 1.0, 0)
-        
-        # Better: Replace pixels where boundary exists
-        # Create an inverted mask
-        mask_inv = cv2.bitwise_not(boundary_mask)
-        
-        # Black-out the area of boundary in background
-        bg_bg = cv2.bitwise_and(background_img, background_img, mask=mask_inv)
-        
-        # Take only region of boundary from overlay
-        overlay_fg = cv2.bitwise_and(overlay, overlay, mask=boundary_mask)
-        
-        # Add the two
-        final = cv2.add(bg_bg, overlay_fg)
-        
-        return final, overlay_fg # Return final image and the isolated colored boundary layer
+        height, width = shape[:2]
+        region = np.zeros((height, width), dtype=np.uint8)
+        features = geo.load_feature_collection(geojson_path).get("features", [])
+        boundaries = [f for f in features if (f.get("properties") or {}).get("role") == "boundary"] or features
+        for feature in boundaries:
+            for polygon in geo.polygons_of(feature.get("geometry") or {}):
+                rings = _pixel_rings(polygon, bbox, width, height)
+                if rings:
+                    cv2.fillPoly(region, rings, 255)
+        return region
+
+    def plot_labels(self, geojson_path, bbox, shape, thickness=3):
+        """
+        Label rasters of the plots (features with role "plot") on an image
+        covering bbox: pixel value i is plot i (1-based), 0 is no plot.
+
+        Returns:
+            tuple: (plot ids, interior labels, outline labels drawn with
+                thickness for boundary-crossing counts)
+        """
+        height, width = shape[:2]
+        labels = np.zeros((height, width), dtype=np.int32)
+        outlines = np.zeros((height, width), dtype=np.int32)
+        features = geo.load_feature_collection(geojson_path).get("features", [])
+        plot_ids = []
+        for feature in features:
+            properties = feature.get("properties") or {}
+            if properties.get("role") != "plot":
+                continue
+            rings = [ring for polygon in geo.polygons_of(feature.get("geometry") or {})
+                     for ring in _pixel_rings(polygon, bbox, width, height)]
+            if not rings:
+                continue
+            plot_ids.append(str(properties.get("plot_id") or len(plot_ids) + 1))
+            label = len(plot_ids)
+            cv2.fillPoly(labels, rings, label)
+            cv2.polylines(outlines, rings, isClosed=True, color=label, thickness=thickness)
+        return plot_ids, labels, outlines
+
+    @staticmethod
+    def plot_stats(plot_ids, labels, outlines, masks):
+        """
+        Per-plot land cover and change for every plot at once: each statistic
+        is one np.bincount over the label raster, whatever the plot count.
+
+        Args:
+            masks (dict): detect_changes masks (present "builtup",
+                "vegetation", "bare_soil", "changed", "new_construction")
+
+        Returns:
+            list: {"plot_id", "area_pixels", "builtup_pct", "vegetation_pct",
+                "bare_soil_pct", "change_pct", "new_construction_pct",
+                "boundary_crossing_pixels"} per plot. Boundary-crossing pixels
+                are the outline pixels of new construction blobs that straddle
+                the plot: blobs with pixels off the outlines both inside the
+                plot and outside it. Blobs lying on outlines shared with a
+                neighbour, or wholly inside the plot, don't count.
+        """
+        n = len(plot_ids) + 1
+        area = np.bincount(labels.ravel(), minlength=n)
+        safe_area = np.maximum(area, 1)
+
+        def share(mask):
+            return np.round(100.0 * np.bincount(labels[mask], minlength=n) / safe_area, 2)
+
+        columns = {
+            "builtup_pct": share(masks["builtup"]),
+            "vegetation_pct": share(masks["vegetation"]),
+            "bare_soil_pct": share(masks["bare_soil"]),
+            "change_pct": share(masks["changed"]),
+            "new_construction_pct": share(masks["new_construction"]),
+        }
+        crossing = EncroachmentDetector.crossing_pixels(labels, outlines, masks["new_construction"], n)
+        return [
+            dict({"plot_id": plot_id, "area_pixels": int(area[i])},
+                 **{key: float(values[i]) for key, values in columns.items()},
+                 boundary_crossing_pixels=int(crossing[i]))
+            for i, plot_id in enumerate(plot_ids, start=1)
+        ]
+
+    @staticmethod
+    def crossing_pixels(labels, outlines, new_construction, n):
+        """
+        Per plot label (n including 0), pixels of straddling new construction
+        blobs on that plot's side of the outline band. The sides a blob
+        touches are the distinct labels (0 = no plot) of its pixels off the
+        band; a blob on two or more sides crosses every plot among them.
+        """
+        blob_count, blobs = cv2.connectedComponents(new_construction.view(np.uint8), connectivity=8)
+        band = outlines > 0
+        off_band = new_construction & ~band
+        sides = np.sort(blobs[off_band].astype(np.int64) * n + labels[off_band])
+        sides = sides[np.concatenate(([True], sides[1:] != sides[:-1]))] if len(sides) else sides
+        blob_of, plot_of = np.divmod(sides, n)
+        side_count = np.bincount(blob_of, minlength=blob_count)
+        crossing_keys = sides[(plot_of > 0) & (side_count[blob_of] > 1)]
+        crossing = np.zeros(n, dtype=np.int64)
+        if not len(crossing_keys):
+            return crossing
+        # A band pixel belongs to the plot it is filled in and the plot whose line was drawn over it
+        on_band = new_construction & band
+        blob_ids = blobs[on_band]
+        keep = (side_count > 1)[blob_ids]
+        blob_ids = blob_ids[keep].astype(np.int64)
+        inner, line = labels[on_band][keep], outlines[on_band][keep]
+        hit = np.isin(blob_ids * n + inner, crossing_keys)
+        crossing += np.bincount(inner[hit], minlength=n)
+        hit = np.isin(blob_ids * n + line, crossing_keys) & (line != inner)
+        crossing += np.bincount(line[hit], minlength=n)
+        return crossing
+
+    @staticmethod
+    def plot_status(plots):
+        """
+        Plot numbers per category, in the shape groq_service.detect_plot_status
+        returns: encroachment (new construction straddling the plot outline),
+        idle (little built-up area) and low vegetation.
+        """
+        plots = [p for p in plots if p["area_pixels"]]
+        return {
+            "encroachment_plots": [p["plot_id"] for p in plots
+                                   if p["boundary_crossing_pixels"] >= PLOT_CROSSING_MIN_PIXELS],
+            "idle_plots": [p["plot_id"] for p in plots if p["builtup_pct"] < PLOT_IDLE_BUILTUP_PCT],
+            "low_vegetation_plots": [p["plot_id"] for p in plots if p["vegetation_pct"] < PLOT_LOW_VEGETATION_PCT],
+            "source": "detector",
+        }
+
+    @staticmethod
+    def rgb_indices(img):
+        """
+        Per-pixel land-cover indices of a BGR uint8 image, as float32 arrays:
+
+            vegetation  green leaf index (2G - R - B) / (2G + R + B)
+            builtup     brightness x (1 - saturation): bright, grey surfaces
+            bare_soil   redness (R - B) / (R + B)
+        """
+        b, g, r = cv2.split(img.astype(np.float32) * (1.0 / 255.0))
+        eps = 1e-6
+        brightest = np.maximum(np.maximum(r, g), b)
+        darkest = np.minimum(np.minimum(r, g), b)
+        return {
+            "vegetation": (2 * g - r - b) / (2 * g + r + b + eps),
+            "builtup": brightest * (1 - (brightest - darkest) / (brightest + eps)),
+            "bare_soil": (r - b) / (r + b + eps),
+        }
+
+    @staticmethod
+    def reflectance_indices(bands):
+        """
+        Spectral indices of Sentinel-2 reflectance (gee.fetch_s2_bands arrays),
+        as float32 arrays:
+
+            vegetation  NDVI (B8 - B4) / (B8 + B4)
+            builtup     NDBI (B11 - B8) / (B11 + B8)
+            bare_soil   BSI ((B11 + B4) - (B8 + B2)) / ((B11 + B4) + (B8 + B2))
+
+        Pixels masked as cloud or without a scene (all bands 0) get 0.
+        """
+        blue, red, nir, swir = (bands[name].astype(np.float32) for name in REFLECTANCE_BANDS)
+        eps = 1e-6
+        return {
+            "vegetation": (nir - red) / (nir + red + eps),
+            "builtup": (swir - nir) / (swir + nir + eps),
+            "bare_soil": ((swir + red) - (nir + blue)) / ((swir + red) + (nir + blue) + eps),
+        }
+
+    @staticmethod
+    def has_reflectance(bands, shape):
+        """Whether bands hold the reflectance indices need, on a grid of shape."""
+        return bool(bands) and all(name in bands and bands[name].shape == tuple(shape[:2])
+                                   for name in REFLECTANCE_BANDS)
+
+    @staticmethod
+    def classify(indices, thresholds=None):
+        """
+        Mutually exclusive vegetation / built-up / bare-soil masks (vegetation
+        wins ties). thresholds is (vegetation, builtup, bare_soil), by default
+        the RGB ones.
+        """
+        vegetation_t, builtup_t, bare_soil_t = thresholds or (
+            VEGETATION_THRESHOLD, BUILTUP_THRESHOLD, BARE_SOIL_THRESHOLD)
+        vegetation = indices["vegetation"] > vegetation_t
+        builtup = (indices["builtup"] > builtup_t) & ~vegetation
+        bare_soil = (indices["bare_soil"] > bare_soil_t) & ~vegetation & ~builtup
+        return {"vegetation": vegetation, "builtup": builtup, "bare_soil": bare_soil}
+
+    @staticmethod
+    def change_magnitude(past_img, present_img, region):
+        """
+        Per-pixel colour change between two aligned BGR images, in units of
+        each channel's spread. Both images are smoothed and normalized per
+        channel by median and interquartile range over region, so sources
+        with different colour balance and resolution (Sentinel-2 vs ESRI)
+        stay comparable and a large changed area doesn't skew the scale.
+        """
+        inside = region > 0
+        # Statistics come from a strided sample; they barely move past ~250k pixels
+        step = max(1, int(np.sqrt(inside.size / CHANGE_SAMPLE_PIXELS)))
+        sample_inside = inside[::step, ::step]
+        normalized = []
+        for img in (past_img, present_img):
+            smooth = cv2.GaussianBlur(img, (5, 5), 0)
+            sample = smooth[::step, ::step][sample_inside] if sample_inside.any() else smooth.reshape(-1, 3)
+            q1, median, q3 = np.percentile(sample, [25, 50, 75], axis=0).astype(np.float32)
+            scale = np.maximum((q3 - q1) / 1.349, CHANGE_MIN_SCALE)
+            normalized.append((smooth.astype(np.float32) - median) / scale)
+        diff = normalized[1] - normalized[0]
+        return np.sqrt(np.einsum("ijk,ijk->ij", diff, diff) / 3.0)
+
+    def detect_changes(self, past_img, present_img, region, past_bands=None, present_bands=None):
+        """
+        Land-cover and change statistics inside region (uint8 mask).
+
+        Land cover comes from NDVI/NDBI/BSI when Sentinel-2 reflectance of
+        both frames is given on the image grid (past_bands, present_bands),
+        from the RGB indices otherwise; stats["index_source"] says which.
+
+        Returns:
+            tuple: (stats dict of percentages of the region, masks dict of
+                the present "builtup", "vegetation" and "bare_soil" classes,
+                "changed", "new_construction" and "vegetation_loss")
+        """
+        start = time.perf_counter()
+        inside = region > 0
+        area = int(np.count_nonzero(inside))
+
+        if self.has_reflectance(past_bands, present_img.shape) and \
+                self.has_reflectance(present_bands, present_img.shape):
+            index_source = "reflectance"
+            thresholds = (NDVI_THRESHOLD, NDBI_THRESHOLD, BSI_THRESHOLD)
+            past = self.classify(self.reflectance_indices(past_bands), thresholds)
+            present = self.classify(self.reflectance_indices(present_bands), thresholds)
+        else:
+            index_source = "rgb"
+            past = self.classify(self.rgb_indices(past_img))
+            present = self.classify(self.rgb_indices(present_img))
+        changed = (self.change_magnitude(past_img, present_img, region) > CHANGE_THRESHOLD) & inside
+        # Isolated pixels are registration and resampling noise, not change
+        changed = cv2.morphologyEx(changed.view(np.uint8), cv2.MORPH_OPEN, np.ones((3, 3), np.uint8)) > 0
+
+        masks = {
+            "builtup": present["builtup"],
+            "vegetation": present["vegetation"],
+            "bare_soil": present["bare_soil"],
+            "changed": changed,
+            "new_construction": changed & present["builtup"] & ~past["builtup"],
+            "vegetation_loss": changed & past["vegetation"] & ~present["vegetation"],
+        }
+
+        def pct(mask):
+            return round(100.0 * int(np.count_nonzero(mask & inside)) / area, 2) if area else 0.0
+
+        stats = {
+            "construction_percentage": pct(present["builtup"]),
+            "vegetation_percentage": pct(present["vegetation"]),
+            "bare_soil_percentage": pct(present["bare_soil"]),
+            "change_percentage": pct(masks["changed"]),
+            "new_construction_percentage": pct(masks["new_construction"]),
+            "vegetation_loss_percentage": pct(masks["vegetation_loss"]),
+            "past": {
+                "construction_percentage": pct(past["builtup"]),
+                "vegetation_percentage": pct(past["vegetation"]),
+                "bare_soil_percentage": pct(past["bare_soil"]),
+            },
+            "region_pixels": area,
+            "index_source": index_source,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        return stats, masks
+
+    @staticmethod
+    def change_blobs(mask, index):
+        """
+        Connected regions of mask, largest first, with the plots they touch
+        (looked up in index, a plot_index.PlotIndex on the same grid).
+
+        Returns:
+            list: {"area_pixels", "bbox_px": [x, y, w, h], "centroid_px",
+                "plot_id" (plot containing the centroid), "plot_ids"
+                (plots intersecting the blob's bbox)}
+        """
+        count, _, stats, centroids = cv2.connectedComponentsWithStats(mask.view(np.uint8), connectivity=8)
+        blobs = []
+        for i in np.argsort(-stats[1:, cv2.CC_STAT_AREA])[:MAX_CHANGE_BLOBS] + 1:
+            x, y, w, h, area = (int(v) for v in stats[i])
+            if area < CHANGE_BLOB_MIN_PIXELS:
+                break
+            cx, cy = (round(float(v), 1) for v in centroids[i])
+            blobs.append({
+                "area_pixels": area,
+                "bbox_px": [x, y, w, h],
+                "centroid_px": [cx, cy],
+                "plot_id": index.locate(cx, cy),
+                "plot_ids": index.query_bbox((x, y, x + w - 1, y + h - 1)),
+            })
+        return blobs
+
+    def change_map(self, present_img, masks, boundary_mask):
+        """Present image with changes tinted: red new construction, orange vegetation loss, magenta other."""
+        out = present_img.copy()
+        other = masks["changed"] & ~masks["new_construction"] & ~masks["vegetation_loss"]
+        for mask, color in ((other, (255, 0, 255)), (masks["vegetation_loss"], (0, 140, 255)),
+                            (masks["new_construction"], (0, 0, 255))):
+            out[mask] = (out[mask] * 0.4 + np.array(color, dtype=np.float32) * 0.6).astype(np.uint8)
+        out[boundary_mask > 0] = (0, 255, 0)
+        return out
+
+    def composite(self, past_img, present_img, mask_past, mask_present=None):
+        """
+        Yellow boundary on past, blue boundary on present, and the
+        composite of both over a 50/50 blend of the two images: green where
+        the boundaries agree, yellow where only the past one is, blue where
+        only the present one is.
+
+        The masks are folded into one boundary code per pixel and each
+        code's colour is written in place under its mask, so the only
+        full-frame allocations are the three output images (they are handed
+        to the background writer). Scratch masks are reused across calls on
+        the same thread.
+
+        Args:
+            mask_past, mask_present (ndarray): uint8 boundary masks at the
+                image size; mask_present defaults to mask_past
 
-    def process(self, csidc_path, past_sat_path, present_sat_path):
+        Returns:
+            tuple: (past overlay, present overlay, composite, pixel count
+                per boundary code)
+        """
+        buffers = _scratch_buffers(present_img.shape[:2])
+        if mask_present is None:
+            mask_present = mask_past
+        past_line = np.not_equal(mask_past, 0, out=buffers["past"])
+        present_line = np.not_equal(mask_present, 0, out=buffers["present"])
+        code = np.multiply(present_line, PRESENT_ONLY, out=buffers["code"], dtype=np.uint8)
+        np.add(code, past_line, out=code, casting="unsafe")
+
+        past_out = _paint(past_img.copy(), mask_past, YELLOW)
+        present_out = _paint(present_img.copy(), mask_present, BLUE)
+
+        composite = cv2.addWeighted(past_img, 0.5, present_img, 0.5, 0)
+        counts = np.zeros(BOTH + 1, dtype=np.int64)
+        select = buffers["select"]
+        for value, color in COMPOSITE_COLORS.items():
+            np.equal(code, value, out=select)
+            counts[value] = np.count_nonzero(select)
+            if counts[value]:
+                _paint(composite, select.view(np.uint8), color)
+        counts[0] = code.size - counts[PAST_ONLY:].sum()
+        return past_out, present_out, composite, counts
+
+    def process(self, csidc_path, past_sat_path, present_sat_path, boundary_geojson=None, bbox=None,
+                past_bands=None, present_bands=None):
         """
         Main processing pipeline.
-        1. Extract boundary from CSIDC.
+        1. Extract boundary from CSIDC (vector geometry when boundary_geojson
+           and the imagery bbox are given, edge detection on the map otherwise).
         2. Overlay Yellow on Past.
         3. Overlay Blue on Present.
-        4. Blend overlays to create Green/Yellow/Blue composite.
+        4. Blend overlays to create Green/Yellow/Blue composite
+           (2-4 are one pass, see composite).
+        5. Land cover and change (Sentinel-2 reflectance of both frames in
+           past_bands / present_bands enables the spectral indices).
         """
         print(f"Starting Encroachment Detection for {self.area_name}...")
         
@@ -119,178 +660,83 @@ class EncroachmentDetector:
         past_img = self.load_image(past_sat_path)
         present_img = self.load_image(present_sat_path)
         
-        # Ensure sizes match (Resize Past/CSIDC to Present)
+        # Past and present are fetched on the same grid (gee.zone_grid), so
+        # resampling is only a fallback for images from elsewhere
         target_size = (present_img.shape[1], present_img.shape[0])
-        past_img = cv2.resize(past_img, target_size)
+        if past_img is not None and past_img.shape[:2] != present_img.shape[:2]:
+            print(f"  [WARN] Past image {past_img.shape[1]}x{past_img.shape[0]} is not on the present grid "
+                  f"{target_size[0]}x{target_size[1]}, resampling")
+            past_img = cv2.resize(past_img, target_size)
         
         # Extract Boundary
-        print("  Extracting boundary from CSIDC map...")
-        boundary_mask = self.extract_boundary(csidc_path)
+        region = None
+        height, width = present_img.shape[:2]
+        if boundary_geojson and bbox and os.path.exists(boundary_geojson):
+            print("  Rasterizing boundary from CSIDC geometry...")
+            boundary_mask = self.boundary_mask_from_geojson(boundary_geojson, bbox, present_img.shape)
+            region = self.region_mask_from_geojson(boundary_geojson, bbox, present_img.shape)
+            plots_index = plot_index.from_geojson(boundary_geojson, bbox, width, height)
+        else:
+            print("  Extracting boundary from CSIDC map...")
+            boundary_mask, contours, hierarchy = self.extract_boundary_contours(csidc_path)
+            plots_index = plot_index.from_contours(contours, hierarchy, boundary_mask.shape, bbox, width, height)
         
-        # 2. Overlay Yellow on Past (Yellow = B:0, G:255, R:255)
-        print("  Creating Past Overlay (Yellow)...")
         if past_img is None:
              print("  [ERROR] Past image is None! Cannot create overlay.")
              return {"status": "error", "error": "Past image missing"}
-             
-        past_superimposed, past_layer = self.create_overlay(past_img, boundary_mask, (0, 255, 255))
-        past_out_path = os.path.join(self.output_dir, f"{self.area_name}_past_yellow.png")
-        cv2.imwrite(past_out_path, past_superimposed)
-        print(f"  [DEBUG] Saved yellow overlay: {past_out_path}")
-        
-        # 3. Overlay Blue on Present (Blue = B:255, G:0, R:0)
-        # Note: OpenCV uses BGR. Red is (0,0,255). 
-        # User asked for "Blue". Pure Blue is (255, 0, 0).
-        print("  Creating Present Overlay (Blue)...")
-        present_superimposed, present_layer = self.create_overlay(present_img, boundary_mask, (255, 0, 0))
-        present_out_path = os.path.join(self.output_dir, f"{self.area_name}_present_blue.png")
-        cv2.imwrite(present_out_path, present_superimposed)
-        
-        # 4. Create Composite (Green Logic)
-        print("  Generating Composite Encroachment Map...")
-        # Logic: 
-        # If pixel is in both (Alignment): Yellow (0,255,255) + Blue (255,0,0) = (255,255,255) White in additive?
-        # User logic: "Yellow + Blue = Green".
-        # This implies we need a specific blending arithmetic.
-        # Yellow=(R+G), Blue=(B). R+G+B = White.
-        # To get Green, we need (0, 255, 0).
-        
-        # Let's interpret the user's request visually:
-        # They want to see:
-        # - Yellow where only Past boundary exists.
-        # - Blue where only Present boundary exists.
-        # - Green where BOTH exist (perfect overlap).
-        
-        # Since we use the SAME boundary mask for both (derived from CSIDC), 
-        # they will ALWAYS overlap perfectly unless we simulate a shift or use different masks.
-        # The user said: "superimpose boundaries of CSIDC map on to past... and present... then superimpose the two... we get green".
-        # If the input boundary is identical, the result is ALWAYS Green.
-        
-        # However, to simulate the *encroachment detection* capability, 
-        # we naturally assume the "Present" boundary might be *actual* detected boundary from satellite?
-        # BUT, the instructions say "superimpose boundaries of CSIDC map on to...".
-        # This implies we are comparing the PLANNED boundary (CSIDC) against the SATELLITE reality.
-        # But the Green/Yellow/Blue logic applies to comparing Two Boundaries.
-        
-        # If we just overlay the SAME mask on two images, the "Composite" of the boundaries is boring (100% overlap).
-        # The actual value comes if the "Blue" boundary was derived from the Present Image (e.g. segmentation).
-        # BUT, the user prompt says: "superimpose boundaries of CSIDC map on to...".
-        # It DOES NOT say "segment the present satellite image".
-        
-        # Wait, maybe the loop is:
-        # CSIDC Boundary (Plan) -> Yellow.
-        # Present Reality (Segmentation) -> Blue?
-        # "superimpose boundaries of CSIDC map on to the present map in blue"
-        # This phrasing suggests taking the CSIDC lines and making them blue on the present map.
-        
-        # If so, "Combine their color pixels" of the two SUPERIMPOSED PICTURES?
-        # Picture A: Past Satellite + Yellow Lines.
-        # Picture B: Present Satellite + Blue Lines.
-        # Combine A + B.
-        # The background (Satellite) will blend (Past + Present = Messy Ghost).
-        # The Lines (Yellow + Blue) will blend (White/Grey).
-        
-        # The user's logic "Yellow + Blue = Green" is physically impossible with standard blending/addition of those colors (R+G + B = White).
-        # It requires custom arithmetic: (R,G,0) + (0,0,B) -> (0,G,0) ? No.
-        # Maybe Subtract Red? Subtract Blue?
-        
-        # Let's implement a logical combination for visualization:
-        # Create a black background composite first to test the line logic.
-        # If we have Mask A (Yellow) and Mask B (Blue).
-        # Intersection = Green.
-        # Difference A-B = Yellow.
-        # Difference B-A = Blue.
-        
-        # Since currently Mask A = Mask B (same source), the result is 100% Green.
-        # This is expected if the user just wants the pipeline to WORK mechanically.
-        # Later they might feed different inputs.
-        
-        # Implementation of "Yellow + Blue = Green" visualizer:
-        # We will create a fresh image.
-        # 1. For every pixel in Mask A: Set to Yellow.
-        # 2. For every pixel in Mask B: Set to Blue.
-        # 3. If Pixel is in BOTH: Set to Green.
         
-        # Create blank canvas for the calculation
-        composite_lines = np.zeros_like(past_img)
+        mask_resized = boundary_mask
+        if boundary_mask.shape[:2] != present_img.shape[:2]:
+            mask_resized = cv2.resize(boundary_mask, target_size)
         
-        # Get the masks resized
-        mask_resized = cv2.resize(boundary_mask, (target_size[0], target_size[1]))
-        
-        # Since we only have ONE mask source (CSIDC), let's just create the "Green" result 
-        # to satisfy the "Everything is fine" condition.
-        # And to demonstrate the feature, let's artificially shift the "Blue" mask slightly 
-        # to show the "Encroachment" (Yellow/Blue fringes) just for the demo?
-        # Start with perfect alignment (Green).
-        
-        # Define colors (BGR)
-        C_YELLOW = (0, 255, 255)
-        C_BLUE   = (255, 0, 0)
-        C_GREEN  = (0, 255, 0)
-        
-        # Create the composite logic manually
-        # Since mask is same, it's all intersection.
-        # We'll paint it Green.
-        
-        # To make it robust for future improvements (if we had 2 masks):
-        mask_past = mask_resized
-        mask_present = mask_resized # For now, identical.
-        
-        # Logic:
-        # Result = Black
-        # Where Past (Yellow) and Present (Blue): Green
-        # Where Past only: Yellow
-        # Where Present only: Blue
-        
-        # Apply this to the composite image
-        final_composite = np.zeros_like(past_img)
-        
-        # We can also blend the satellite backgrounds? 
-        # "superimpose the two superimposed pictures".
-        # This implies blending the full headers.
-        # Let's do a 50/50 blend of the backgrounds, but overwrite the lines with the Logic.
-        
-        background_blend = cv2.addWeighted(past_img, 0.5, present_img, 0.5, 0)
-        
-        # Now draw the lines on top of the blended background
-        # Intersection
-        intersection = cv2.bitwise_and(mask_past, mask_present)
-        # Past Only (A - B) -> bitwise_and(A, not B)
-        past_only = cv2.bitwise_and(mask_past, cv2.bitwise_not(mask_present))
-        # Present Only (B - A)
-        present_only = cv2.bitwise_and(mask_present, cv2.bitwise_not(mask_past))
-        
-        # Draw Green
-        final_composite[intersection > 0] = C_GREEN
-        # Draw Yellow
-        final_composite[past_only > 0] = C_YELLOW
-        # Draw Blue
-        final_composite[present_only > 0] = C_BLUE
-        
-        # Combine with background (where lines are not present)
-        # Create total line mask
-        total_mask = cv2.bitwise_or(mask_past, mask_present)
-        mask_inv = cv2.bitwise_not(total_mask)
-        
-        bg_part = cv2.bitwise_and(background_blend, background_blend, mask=mask_inv)
-        fg_part = cv2.bitwise_and(final_composite, final_composite, mask=total_mask)
-        
-        final_output = cv2.add(bg_part, fg_part)
+        # 2-4. Yellow boundary on past, blue on present, and their composite:
+        # green where the boundaries match, yellow past only, blue present only.
+        # Both overlays use the CSIDC boundary for now, so lines come out green;
+        # a boundary segmented from the present image would go in mask_present.
+        # Until then the boundary match is not measured and not reported.
+        print("  Compositing overlays (Yellow past, Blue present, Green match)...")
+        past_superimposed, present_superimposed, final_output, _ = self.composite(
+            past_img, present_img, mask_resized)
         
+        past_out_path = os.path.join(self.output_dir, f"{self.area_name}_past_yellow.png")
+        self.save_image(past_out_path, past_superimposed)
+        print(f"  [DEBUG] Saved yellow overlay: {past_out_path}")
+        present_out_path = os.path.join(self.output_dir, f"{self.area_name}_present_blue.png")
+        self.save_image(present_out_path, present_superimposed)
         composite_path = os.path.join(self.output_dir, f"{self.area_name}_encroachment_analysis.png")
-        cv2.imwrite(composite_path, final_output)
+        self.save_image(composite_path, final_output)
         print(f"  âœ“ Saved Analysis: {composite_path}")
         
-        # Calculate Metrics
-        total_pixels = np.sum(total_mask > 0)
-        matching_pixels = np.sum(intersection > 0)
-        deviating_pixels = total_pixels - matching_pixels
-        
-        match_percentage = (matching_pixels / total_pixels * 100) if total_pixels > 0 else 100
-        
+        # 5. Pixel-level change inside the zone (the whole frame without a vector boundary)
+        if region is None or not region.any():
+            region = np.full(present_img.shape[:2], 255, dtype=np.uint8)
+        change, change_masks = self.detect_changes(past_img, present_img, region, past_bands, present_bands)
+        change_path = os.path.join(self.output_dir, f"{self.area_name}_change_map.png")
+        self.save_image(change_path, self.change_map(present_img, change_masks, mask_resized))
+        print(f"  Change detection: {change['change_percentage']}% changed, "
+              f"{change['new_construction_percentage']}% new construction "
+              f"({change['index_source']} indices, {change['elapsed_ms']} ms)")
+        
+        # 6. Per-plot statistics from the captured plot polygons
+        plots = []
+        if boundary_geojson and bbox and os.path.exists(boundary_geojson):
+            start = time.perf_counter()
+            plot_ids, labels, outlines = self.plot_labels(boundary_geojson, bbox, present_img.shape)
+            plots = self.plot_stats(plot_ids, labels, outlines, change_masks)
+            print(f"  Plot statistics: {len(plots)} plots ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        
+        # 7. Plot index for point/bbox lookups, and the new construction mapped onto it
+        index_path = None
+        if plots_index.plots and bbox:
+            index_path = plots_index.save(plot_index.index_path(self.area_name))
+        change_blobs = self.change_blobs(change_masks["new_construction"], plots_index)
+        
+        plot_status = self.plot_status(plots) if plots else None
+        encroached = (change["new_construction_percentage"] >= NEW_CONSTRUCTION_ALERT_PCT
+                      or bool(plot_status and plot_status["encroachment_plots"]))
         stats = {
-            "match_percentage": round(match_percentage, 2),
-            "status": "No Encroachment" if match_percentage > 95 else "Encroachment Detected"
+            "status": "Encroachment Detected" if encroached else "No Encroachment",
+            **change,
         }
         
         return {
@@ -298,7 +744,12 @@ class EncroachmentDetector:
             "past_overlay": past_out_path,
             "present_overlay": present_out_path,
             "analysis_image": composite_path,
-            "metrics": stats
+            "change_image": change_path,
+            "metrics": stats,
+            "plots": plots,
+            "plot_index": index_path,
+            "change_blobs": change_blobs,
+            "plot_status": plot_status
         }
 
 def superimpose_with_opencv(csidc_image_path, osm_image_path, area_name):
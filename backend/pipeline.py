@@ -0,0 +1,336 @@
+"""
+Analysis pipeline for a single industrial zone.
+
+This is the workflow that used to live inside app.run_analysis: scrape the
+CSIDC map, fetch satellite/OSM imagery, run the OpenCV encroachment
+detector, ask Groq for a vision analysis, derive plot status (from the
+detector's per-plot statistics when plot polygons were captured, otherwise
+from Groq), and generate the dashboard insights.
+
+The steps are expressed as a dependency graph (see dag.py) so independent
+ones run concurrently:
+
+    scrape -> location -> grid -> current_satellite  --+--> encroachment_detection
+                               -> historical_satellite -+          |
+                               -> present_bands -------+          +--> groq_analysis -> dashboard_insights
+                               -> current_osm                      +--> plot_status
+
+The grid stage fixes one georeferenced pixel grid, sized to the zone's
+boundary extent, that every imagery source is fetched on.
+
+Images are handed between stages in memory through a PipelineContext
+(pipeline_context.py); downloads/ is written in the background and is
+complete by the time run_pipeline returns.
+
+Progress is reported through an optional `on_step(step, status, info)`
+callback so the job API can expose per-step status.
+"""
+import os
+import traceback
+
+import browser_pool
+import gee
+import opencv_superimpose
+import groq_service
+import dashboard_insights_service
+import image_metadata
+import metrics
+from dag import Stage, run_stages
+from pipeline_context import PipelineContext
+
+# Stages reported by run_pipeline, in topological order
+STEPS = [
+    "scrape",
+    "location",
+    "grid",
+    "current_satellite",
+    "current_osm",
+    "historical_satellite",
+    "present_bands",
+    "encroachment_detection",
+    "groq_analysis",
+    "plot_status",
+    "dashboard_insights",
+]
+
+# Threads used to run independent stages of one zone
+STAGE_WORKERS = int(os.environ.get("PIPELINE_STAGE_WORKERS", 4))
+
+
+def _basename(path):
+    return os.path.basename(path) if path else None
+
+
+def _detection_ok(results):
+    return (results.get("encroachment_detection") or {}).get("status") == "success"
+
+
+def _groq_ok(results):
+    analysis = results.get("groq_analysis")
+    return bool(analysis) and not analysis.get("error")
+
+
+# ==========================================================
+# STAGE FUNCTIONS
+# ==========================================================
+def _scrape(zone, scraper=None):
+    print("Running script.py...")
+    script_result = (scraper or browser_pool.scrape)(zone)
+
+    if script_result['status'] != 'success':
+        raise RuntimeError(f"Script.py failed: {script_result.get('error', 'Unknown error')}")
+
+    print(f"✓ Script.py completed")
+    print(f"  - Image: {script_result.get('image_path')}")
+    print(f"  - JSON: {script_result.get('json_path')}\n")
+    return script_result
+
+
+def _detect(zone, results, context=None):
+    image_path = results["scrape"].get("image_path")
+    past_sat_path = results.get("historical_satellite")
+    current_sat_path = results.get("current_satellite")
+
+    print("Running Encroachment Detection...")
+    if not past_sat_path or not current_sat_path:
+        print(f"⚠ Missing satellite images for detection. Past: {past_sat_path}, Present: {current_sat_path}")
+        return {"status": "skipped", "error": "Missing satellite images"}
+
+    # Vector boundary captured while scraping, drawn on the shared imagery grid
+    try:
+        detector = opencv_superimpose.EncroachmentDetector(zone, context=context)
+        encroachment_result = detector.process(
+            image_path,       # CSIDC map (boundary source)
+            past_sat_path,    # Past Satellite (Yellow)
+            current_sat_path, # Present Satellite (Blue)
+            boundary_geojson=results["scrape"].get("geojson_path"),
+            bbox=results["grid"]["bbox"],
+            # Sentinel-2 reflectance, when the historical stage fetched it (pixels mode)
+            past_bands=context.raster(past_sat_path) if context is not None else None,
+            present_bands=context.value("present_bands") if context is not None else None,
+        )
+        print(f"✓ Encroachment Analysis completed")
+        print(f"  - Analysis Image: {encroachment_result.get('analysis_image')}")
+        print(f"  - Metrics: {encroachment_result.get('metrics')}\n")
+        return encroachment_result
+    except Exception as e:
+        print(f"⚠ Encroachment Analysis failed: {e}")
+        traceback.print_exc()
+        return {"status": "error", "error": str(e)}
+
+
+def _groq_analysis(zone, results, context=None):
+    print("Running Groq Vision Analysis...")
+    try:
+        groq_analysis = groq_service.analyze_encroachment(
+            results.get("historical_satellite"),
+            results.get("current_satellite"),
+            results["encroachment_detection"].get('analysis_image'),
+            area_name=zone,
+            context=context
+        )
+    except Exception as e:
+        print(f"⚠ Groq Analysis exception: {e}")
+        print("  Continuing without AI analysis...")
+        return {"error": str(e)}
+
+    if groq_analysis.get('error'):
+        print(f"⚠ Groq Analysis failed: {groq_analysis['error']}")
+        print("  Continuing without AI analysis...")
+    else:
+        print(f"✓ Groq Analysis completed")
+        print(f"  - Status: {groq_analysis.get('encroachment_status')}")
+        print(f"  - Construction: {groq_analysis.get('construction_percentage')}%")
+        print(f"  - Vegetation: {groq_analysis.get('vegetation_percentage')}%")
+        print(f"  - Idle Status: {groq_analysis.get('idle_status')}\n")
+    return groq_analysis
+
+
+def _dashboard_insights(zone, results):
+    print("Generating Comprehensive Report with LLM...")
+    encroachment_result = results["encroachment_detection"]
+    try:
+        dashboard_insights = dashboard_insights_service.generate_comprehensive_report(
+            zone,
+            encroachment_result.get('metrics') if encroachment_result.get('status') == 'success' else None,
+            results["groq_analysis"]
+        )
+    except Exception as e:
+        print(f"⚠ Report generation exception: {e}")
+        print("  Continuing without LLM insights...")
+        return {"error": str(e)}
+
+    if dashboard_insights.get('error'):
+        print(f"⚠ Insights generation failed: {dashboard_insights['error']}")
+        print("  Continuing without LLM insights...")
+    else:
+        print(f"✓ Comprehensive Report Generated")
+        print(f"  - Sections: {list(dashboard_insights.keys())}\n")
+    return dashboard_insights
+
+
+def _plot_status(zone, results, context=None):
+    print("Detecting specific plot status (Encroachment/Idle/Veg)...")
+    # Plot polygons were captured: the detector already has per-plot statistics
+    plot_status = results["encroachment_detection"].get("plot_status")
+    if plot_status:
+        print(f"✓ Plot Status from {len(results['encroachment_detection']['plots'])} plot polygons")
+        print(f"  - Encroachment Risk: {plot_status.get('encroachment_plots')}")
+        print(f"  - Idle: {plot_status.get('idle_plots')}")
+        return plot_status
+
+    try:
+        plot_status = groq_service.detect_plot_status(
+            results["scrape"].get("image_path"),  # Original CSIDC map with plot numbers
+            results["encroachment_detection"].get('analysis_image'),  # Analysis result
+            zone,
+            context=context
+        )
+    except Exception as e:
+        print(f"⚠ Plot detection exception: {e}")
+        return {"error": str(e)}
+
+    if plot_status.get('error'):
+        print(f"⚠ Plot status detection failed: {plot_status['error']}")
+    else:
+        print(f"✓ Plot Status Detected")
+        print(f"  - Encroachment Risk: {plot_status.get('encroachment_plots')}")
+        print(f"  - Idle: {plot_status.get('idle_plots')}")
+    return plot_status
+
+
+# ==========================================================
+# GRAPH
+# ==========================================================
+def _describe_detection(result):
+    """Partial results streamed as soon as detection finishes."""
+    return {
+        "detection_status": result.get("status"),
+        "metrics": result.get("metrics"),
+        "images": {
+            "encroachment_analysis": _basename(result.get("analysis_image")),
+            "past_overlay": _basename(result.get("past_overlay")),
+            "present_overlay": _basename(result.get("present_overlay")),
+            "change_map": _basename(result.get("change_image")),
+        },
+    }
+
+
+def build_stages(zone, scraper=None, context=None):
+    """Return the list of dag.Stage objects making up one zone's analysis."""
+    return [
+        Stage("scrape", lambda r: _scrape(zone, scraper),
+              describe=lambda v: {"industrial_area": _basename(v.get("image_path"))}),
+        Stage("location", lambda r: gee.parse_coordinates(r["scrape"]["json_path"]),
+              deps=["scrape"],
+              describe=lambda v: {"latitude": v[1], "longitude": v[2]}),
+        Stage("grid", lambda r: gee.zone_grid(r["scrape"]["json_path"], r["location"][1], r["location"][2]),
+              deps=["scrape", "location"],
+              describe=lambda v: {"width": v["width"], "height": v["height"], "resolution_m": v["resolution_m"]}),
+        *gee.fetch_stages(deps=["location", "grid"], context=context),
+        Stage("encroachment_detection", lambda r: _detect(zone, r, context),
+              deps=["scrape", "grid", "current_satellite", "historical_satellite", "present_bands"],
+              describe=_describe_detection),
+        Stage("groq_analysis", lambda r: _groq_analysis(zone, r, context),
+              deps=["encroachment_detection"], when=_detection_ok,
+              describe=lambda v: {"groq_analysis": v}),
+        Stage("plot_status", lambda r: _plot_status(zone, r, context),
+              deps=["encroachment_detection"],
+              when=lambda r: _detection_ok(r) and (r["encroachment_detection"].get("plot_status")
+                                                   or r["scrape"].get("image_path")),
+              describe=lambda v: {"plot_status": v}),
+        Stage("dashboard_insights", lambda r: _dashboard_insights(zone, r),
+              deps=["groq_analysis"], when=_groq_ok,
+              describe=lambda v: {"sections": list(v.keys())}),
+    ]
+
+
+def run_pipeline(zone, on_step=None, scraper=None):
+    """
+    Run the full analysis workflow for a zone.
+
+    Args:
+        zone (str): Industrial area name (e.g. 'Kapan')
+        on_step (callable): Optional callback `on_step(step, status, info)`
+            called with status 'running', 'success', 'skipped' or 'error'.
+        scraper (callable): Optional `scraper(zone) -> script.run result`.
+            Defaults to browser_pool.scrape, which reuses a warm browser.
+
+    Returns:
+        dict: Response payload with "status" of "success" or "error"
+    """
+    print(f"\n{'='*60}")
+    print(f"Starting analysis for zone: {zone}")
+    print(f"{'='*60}\n")
+
+    def on_stage(step, status, info=None):
+        metrics.observe_stage(step, status, (info or {}).get("duration_seconds"))
+        if on_step:
+            on_step(step, status, info)
+
+    context = PipelineContext()
+    run = run_stages(build_stages(zone, scraper, context), max_workers=STAGE_WORKERS, on_stage=on_stage)
+    # The response links to files in downloads/, so they must exist first
+    context.flush()
+    results = run["results"]
+
+    # Scraping and coordinates are required, everything else degrades gracefully
+    for required in ("scrape", "location"):
+        if run["status"].get(required) != "success":
+            error = run["errors"].get(required, f"{required} did not complete")
+            print(f"✗ Analysis failed at {required}: {error}")
+            metrics.PIPELINE_RUNS.inc(status="error")
+            return {"status": "error", "error": error}
+
+    image_path = results["scrape"].get("image_path")
+    current_sat_path = results.get("current_satellite")
+    past_sat_path = results.get("historical_satellite")
+    osm_path = results.get("current_osm")
+    encroachment_result = results.get("encroachment_detection") or {}
+    groq_analysis = results.get("groq_analysis")
+    dashboard_insights = results.get("dashboard_insights")
+    plot_status = results.get("plot_status")
+
+    # Merge plot status into dashboard_insights if it exists, or create a partial one
+    if plot_status and not plot_status.get('error'):
+        if dashboard_insights:
+            dashboard_insights['plot_status'] = plot_status
+        else:
+            dashboard_insights = {'plot_status': plot_status}
+
+    # Prepare response with image filenames
+    detection_ok = encroachment_result.get('status') == 'success'
+    response = {
+        "status": "success",
+        "zone": zone,
+        "images": {
+            "industrial_area": _basename(image_path),
+            "satellite_present": _basename(current_sat_path),
+            "satellite_past": _basename(past_sat_path),
+            "osm": _basename(osm_path),
+            "encroachment_analysis": _basename(encroachment_result.get('analysis_image')) if detection_ok else None,
+            "past_overlay": _basename(encroachment_result.get('past_overlay')) if detection_ok else None,
+            "present_overlay": _basename(encroachment_result.get('present_overlay')) if detection_ok else None,
+            "change_map": _basename(encroachment_result.get('change_image')) if detection_ok else None
+        },
+        "metrics": encroachment_result.get('metrics') if detection_ok else None,
+        "plots": encroachment_result.get('plots') if detection_ok else None,
+        "groq_analysis": groq_analysis if groq_analysis and not groq_analysis.get('error') else None,
+        "dashboard_insights": dashboard_insights if dashboard_insights and not dashboard_insights.get('error') else None,
+        "timings": run["timings"]
+    }
+    # Captions and georeferencing from the sidecars, for display-time labels
+    sidecars = {"satellite_present": current_sat_path, "satellite_past": past_sat_path, "osm": osm_path}
+    response["image_metadata"] = {key: meta for key, meta in
+                                  ((key, image_metadata.read(path)) for key, path in sidecars.items()) if meta}
+    # Extra historical epochs (gee.HISTORICAL_EPOCHS), oldest first
+    if context.value("historical_epochs"):
+        response["historical_epochs"] = context.value("historical_epochs")
+
+    metrics.PIPELINE_RUNS.inc(status="success")
+
+    print(f"{'='*60}")
+    print("Analysis completed successfully!")
+    print(f"{'='*60}\n")
+
+    return response
@@ -0,0 +1,188 @@
+"""
+In-memory image handoff between pipeline stages.
+
+Stages used to hand each other file paths and re-read them: gee wrote a
+PNG and reopened it to draw the label, the detector decoded it again with
+cv2.imread and groq_service read it a third time to base64-encode it.
+
+A PipelineContext lives for one run_pipeline call and holds every image
+it produces, keyed by its path under downloads/, as a decoded BGR array
+and/or encoded bytes. Each form is computed at most once and shared. The
+file itself is written once, on a background writer thread, only so the
+frontend can fetch it; flush() waits for those writes, and the image
+endpoint uses wait_for_write() for files announced before the run ends.
+"""
+import os
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import cv2
+import numpy as np
+
+# Threads encoding and writing images to downloads/ (shared by all runs)
+WRITER_THREADS = int(os.environ.get("IMAGE_WRITER_THREADS", 2))
+
+_writer = ThreadPoolExecutor(max_workers=WRITER_THREADS, thread_name_prefix="image-writer")
+# Absolute path -> Future of its latest pending write, across all contexts
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+class _Entry:
+    def __init__(self, array=None, data=None):
+        self.array = array
+        self.data = data
+        self.lock = threading.Lock()
+
+
+class PipelineContext:
+    """
+    Images shared between the stages of one zone's analysis.
+
+    Arrays handed out by array() are shared with other stages and the
+    writer, so callers must not modify them in place.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._rasters = {}
+        self._values = {}
+        self._lock = threading.Lock()
+        self._pending = []
+
+    def _entry(self, path):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                entry = self._entries[path] = _Entry()
+            return entry
+
+    def has(self, path):
+        with self._lock:
+            entry = self._entries.get(path)
+        return entry is not None and (entry.array is not None or entry.data is not None)
+
+    # ------------------------------------------------------
+    # Producers
+    # ------------------------------------------------------
+    def put_array(self, path, array, on_written=None):
+        """Hold a decoded BGR image for path and write it to disk in the background."""
+        with self._lock:
+            self._entries[path] = _Entry(array=array)
+        self._schedule(path, on_written)
+        return path
+
+    def put_bytes(self, path, data, on_written=None):
+        """Hold an encoded image for path and write it to disk in the background."""
+        with self._lock:
+            self._entries[path] = _Entry(data=data)
+        self._schedule(path, on_written)
+        return path
+
+    def put_raster(self, path, bands):
+        """Keep the source band arrays (e.g. reflectance) an image at path was rendered from."""
+        with self._lock:
+            self._rasters[path] = bands
+
+    def put_value(self, key, value):
+        """Keep a small non-image result (e.g. a summary) for later stages."""
+        with self._lock:
+            self._values[key] = value
+
+    # ------------------------------------------------------
+    # Consumers
+    # ------------------------------------------------------
+    def raster(self, path):
+        """Band arrays registered with put_raster, or None."""
+        with self._lock:
+            return self._rasters.get(path)
+
+    def value(self, key, default=None):
+        with self._lock:
+            return self._values.get(key, default)
+
+    def array(self, path):
+        """Decoded BGR image, decoding held bytes (or reading the file) on first use."""
+        entry = self._entry(path)
+        with entry.lock:
+            if entry.array is None:
+                data = entry.data if entry.data is not None else _read(path)
+                array = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+                if array is None:
+                    raise ValueError(f"Failed to load image: {path}")
+                entry.data, entry.array = data, array
+            return entry.array
+
+    def encoded(self, path):
+        """Encoded image bytes (format taken from the path's extension)."""
+        entry = self._entry(path)
+        with entry.lock:
+            if entry.data is None:
+                if entry.array is not None:
+                    ok, buffer = cv2.imencode(os.path.splitext(path)[1] or ".png", entry.array)
+                    if not ok:
+                        raise ValueError(f"Failed to encode image: {path}")
+                    entry.data = buffer.tobytes()
+                else:
+                    entry.data = _read(path)
+            return entry.data
+
+    def b64(self, path):
+        return base64.b64encode(self.encoded(path)).decode("utf-8")
+
+    # ------------------------------------------------------
+    # Background writes
+    # ------------------------------------------------------
+    def _schedule(self, path, on_written):
+        future = _writer.submit(self._write, path, on_written)
+        with self._lock:
+            self._pending.append(future)
+        key = os.path.abspath(path)
+        with _in_flight_lock:
+            _in_flight[key] = future
+        future.add_done_callback(lambda f: _forget(key, f))
+
+    def _write(self, path, on_written):
+        data = self.encoded(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        # Readers of downloads/ never see a half-written file
+        os.replace(tmp_path, path)
+        if on_written:
+            on_written(path)
+
+    def flush(self, timeout=None):
+        """Wait for all background writes. Returns the number that failed."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        done, not_done = wait(pending, timeout=timeout)
+        failed = len(not_done)
+        for future in done:
+            if future.exception() is not None:
+                failed += 1
+                print(f"⚠ Background image write failed: {future.exception()}")
+        return failed
+
+
+def _forget(key, future):
+    with _in_flight_lock:
+        if _in_flight.get(key) is future:
+            del _in_flight[key]
+
+
+def wait_for_write(path, timeout=10):
+    """Block until a pending background write of path (if any) has finished."""
+    with _in_flight_lock:
+        future = _in_flight.get(os.path.abspath(path))
+    if future is not None:
+        wait([future], timeout=timeout)
+
+
+def _read(path):
+    if not path or not os.path.exists(path):
+        raise FileNotFoundError(f"Image not found: {path}")
+    with open(path, "rb") as f:
+        return f.read()
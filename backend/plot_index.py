@@ -0,0 +1,274 @@
+"""
+Spatial index of a zone's plot polygons.
+
+Plots come from the captured CSIDC GeoJSON, or from the closed cells of the
+boundary edges when only the map image is available
+(EncroachmentDetector.extract_boundary). Polygons are kept in pixel
+coordinates of the zone's imagery grid, with the grid bbox, so queries work
+in pixels or lon/lat:
+
+    index = plot_index.load("Kapan")
+    index.locate_lonlat(21.29, 81.61)             # plot id containing the point, or None
+    index.query_lonlat_bbox([w, s, e, n])         # plot ids intersecting the bbox
+
+Only GeoJSON plots are georeferenced. Contour cells are traced on the CSIDC
+map screenshot and merely stretched onto the grid, so their source is
+recorded as "contours" and lon/lat lookups on them are refused; they answer
+pixel queries (locate, query_bbox) only.
+
+The tree is a Sort-Tile-Recursive packed R-tree: NODE_CAPACITY polygons per
+leaf node, grouped by sorting into vertical slices by x and then by y, and
+each level above packs the one below the same way. A point or bbox query
+descends only the nodes whose boxes overlap it, so mapping a change blob or
+a dashboard click to a plot is a logarithmic lookup. The packed levels are
+saved as downloads/<zone>_plot_index.json next to the other zone artifacts.
+"""
+import os
+import json
+import math
+import threading
+
+import cv2
+import numpy as np
+
+import geo
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOWNLOAD_DIR = os.path.join(BASE_DIR, "downloads")
+
+NODE_CAPACITY = 16
+
+# Where an index's polygons came from; only GEOJSON ones have real coordinates
+SOURCE_GEOJSON = "geojson"
+SOURCE_CONTOURS = "contours"
+
+# Contour simplification tolerance (pixels) and smallest plot cell kept
+SIMPLIFY_PX = 1.5
+MIN_PLOT_PIXELS = 64
+
+_lock = threading.Lock()
+_loaded = {}  # path -> (mtime, PlotIndex)
+
+
+def index_path(zone):
+    return os.path.join(DOWNLOAD_DIR, f"{zone}_plot_index.json")
+
+
+def _str_pack(boxes, capacity):
+    """
+    Sort-Tile-Recursive grouping of boxes (N x 4: x0, y0, x1, y1): sort by
+    centre x into vertical slices, sort each slice by centre y, and cut it
+    into runs of capacity. Returns the runs as index arrays.
+    """
+    count = len(boxes)
+    slices = max(1, math.ceil(math.sqrt(math.ceil(count / capacity))))
+    centres = (boxes[:, :2] + boxes[:, 2:]) / 2
+    by_x = np.argsort(centres[:, 0], kind="stable")
+    per_slice = slices * capacity
+    groups = []
+    for start in range(0, count, per_slice):
+        run = by_x[start:start + per_slice]
+        run = run[np.argsort(centres[run, 1], kind="stable")]
+        groups.extend(run[i:i + capacity] for i in range(0, len(run), capacity))
+    return groups
+
+
+def _segments_cross(a, b):
+    """Whether any segment of closed ring a crosses any segment of closed ring b (N x 2 arrays)."""
+    p, r = a, np.roll(a, -1, axis=0) - a
+    q, s = b, np.roll(b, -1, axis=0) - b
+    denom = np.cross(r[:, None, :], s[None, :, :])
+    qp = q[None, :, :] - p[:, None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.cross(qp, s[None, :, :]) / denom
+        u = np.cross(qp, r[:, None, :]) / denom
+    return bool(np.any((denom != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)))
+
+
+class PlotIndex:
+    """
+    Packed R-tree over plot polygons.
+
+    Args:
+        plots (list): {"plot_id", "polygon": [[x, y], ...] outer ring in
+            pixels} per plot
+        bbox (list): [west, south, east, north] of the pixel grid
+        width, height (int): Pixel grid size
+        source (str): SOURCE_GEOJSON or SOURCE_CONTOURS
+    """
+
+    def __init__(self, plots, bbox, width, height, source=SOURCE_GEOJSON, levels=None, capacity=NODE_CAPACITY):
+        self.plots = plots
+        self.bbox = list(bbox) if bbox else None
+        self.width = width
+        self.height = height
+        self.source = source
+        self.capacity = capacity
+        self._rings = [np.asarray(p["polygon"], dtype=np.float32) for p in plots]
+        if levels is None:
+            levels = self._build()
+        # Per level, root first: node boxes and each node's children in the level below
+        self.levels = [(np.asarray(boxes, dtype=np.float64).reshape(-1, 4),
+                        [np.asarray(c, dtype=np.int64) for c in children]) for boxes, children in levels]
+        self._leaf_boxes = np.array([np.concatenate([r.min(axis=0), r.max(axis=0)]) for r in self._rings],
+                                    dtype=np.float64).reshape(-1, 4)
+
+    def _build(self):
+        if not self.plots:
+            return []
+        below = np.array([np.concatenate([r.min(axis=0), r.max(axis=0)]) for r in self._rings], dtype=np.float64)
+        levels = []
+        while True:
+            groups = _str_pack(below, self.capacity)
+            boxes = np.array([np.concatenate([below[g, :2].min(axis=0), below[g, 2:].max(axis=0)]) for g in groups])
+            levels.insert(0, (boxes, groups))
+            if len(groups) == 1:
+                return levels
+            below = boxes
+
+    # ------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------
+    def _candidates(self, box):
+        """Plot positions whose boxes overlap box (x0, y0, x1, y1), walking down from the root."""
+        x0, y0, x1, y1 = box
+
+        def overlapping(boxes, ids):
+            hit = boxes[ids]
+            return ids[(hit[:, 0] <= x1) & (hit[:, 2] >= x0) & (hit[:, 1] <= y1) & (hit[:, 3] >= y0)]
+
+        if not self.levels:
+            return []
+        nodes = np.arange(len(self.levels[0][0]))
+        for boxes, children in self.levels:
+            nodes = overlapping(boxes, nodes)
+            if not len(nodes):
+                return []
+            nodes = np.concatenate([children[i] for i in nodes])
+        return overlapping(self._leaf_boxes, nodes).tolist()
+
+    def locate(self, x, y):
+        """Id of the plot containing pixel (x, y), or None."""
+        for i in self._candidates((x, y, x, y)):
+            if cv2.pointPolygonTest(self._rings[i], (float(x), float(y)), False) >= 0:
+                return self.plots[i]["plot_id"]
+        return None
+
+    def query_bbox(self, box):
+        """Ids of the plots intersecting pixel box (x0, y0, x1, y1)."""
+        x0, y0, x1, y1 = box
+        rect = np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.float32)
+        found = []
+        for i in self._candidates(box):
+            ring = self._rings[i]
+            if (np.any((ring[:, 0] >= x0) & (ring[:, 0] <= x1) & (ring[:, 1] >= y0) & (ring[:, 1] <= y1))
+                    or cv2.pointPolygonTest(ring, (float(x0), float(y0)), False) >= 0
+                    or _segments_cross(ring, rect)):
+                found.append(self.plots[i]["plot_id"])
+        return found
+
+    @property
+    def georeferenced(self):
+        """Whether lon/lat queries are meaningful (polygons came from CSIDC geometry)."""
+        return self.source == SOURCE_GEOJSON and self.bbox is not None
+
+    def to_pixel(self, lat, lon):
+        if not self.georeferenced:
+            raise ValueError(f"Plot index from {self.source} is not georeferenced; query in pixels")
+        return geo.lonlat_to_pixel(lon, lat, self.bbox, self.width, self.height)
+
+    def locate_lonlat(self, lat, lon):
+        """Id of the plot containing (lat, lon), or None."""
+        return self.locate(*self.to_pixel(lat, lon))
+
+    def query_lonlat_bbox(self, bbox):
+        """Ids of the plots intersecting [west, south, east, north]."""
+        west, south, east, north = bbox
+        x0, y0 = self.to_pixel(north, west)
+        x1, y1 = self.to_pixel(south, east)
+        return self.query_bbox((x0, y0, x1, y1))
+
+    # ------------------------------------------------------
+    # Serialization
+    # ------------------------------------------------------
+    def to_dict(self):
+        return {
+            "bbox": self.bbox,
+            "width": self.width,
+            "height": self.height,
+            "source": self.source,
+            "capacity": self.capacity,
+            "plots": self.plots,
+            "levels": [(boxes.tolist(), [c.tolist() for c in children])
+                       for boxes, children in self.levels],
+        }
+
+    def save(self, path):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def from_dict(cls, data):
+        # Files written before the source was recorded can't be trusted as georeferenced
+        return cls(data["plots"], data["bbox"], data["width"], data["height"],
+                   source=data.get("source", SOURCE_CONTOURS),
+                   levels=data.get("levels"), capacity=data.get("capacity", NODE_CAPACITY))
+
+
+# ==========================================================
+# BUILDING AND LOADING
+# ==========================================================
+def from_geojson(geojson_path, bbox, width, height):
+    """Index of the plots (role "plot") of a captured CSIDC FeatureCollection on a bbox grid."""
+    plots = []
+    for feature in geo.load_feature_collection(geojson_path).get("features", []):
+        properties = feature.get("properties") or {}
+        if properties.get("role") != "plot":
+            continue
+        for polygon in geo.polygons_of(feature.get("geometry") or {}):
+            if polygon and len(polygon[0]) >= 3:
+                ring = [list(geo.lonlat_to_pixel(lon, lat, bbox, width, height)) for lon, lat in polygon[0]]
+                plots.append({"plot_id": str(properties.get("plot_id") or len(plots) + 1), "polygon": ring})
+    return PlotIndex(plots, bbox, width, height, source=SOURCE_GEOJSON)
+
+
+def from_contours(contours, hierarchy, source_shape, bbox, width, height):
+    """
+    Index of the closed cells of a boundary edge raster: the inner contours
+    (holes) of cv2.findContours with RETR_CCOMP, simplified and scaled from
+    the source image to the width x height grid. Cells are numbered c1, c2,
+    ... from the top-left. The cells are in map-screenshot pixels stretched
+    to the grid, not georeferenced, so the index is marked SOURCE_CONTOURS.
+    """
+    sx, sy = width / source_shape[1], height / source_shape[0]
+    cells = []
+    for contour, (_, _, _, parent) in zip(contours, hierarchy[0] if hierarchy is not None else []):
+        if parent < 0 or cv2.contourArea(contour) < MIN_PLOT_PIXELS:
+            continue
+        simplified = cv2.approxPolyDP(contour, SIMPLIFY_PX, True).reshape(-1, 2).astype(np.float64)
+        if len(simplified) >= 3:
+            cells.append(simplified * (sx, sy))
+    cells.sort(key=lambda ring: (round(ring[:, 1].min() / 10), ring[:, 0].min()))
+    plots = [{"plot_id": f"c{i}", "polygon": ring.round(2).tolist()} for i, ring in enumerate(cells, start=1)]
+    return PlotIndex(plots, bbox, width, height, source=SOURCE_CONTOURS)
+
+
+def load(zone):
+    """The saved index of a zone, or None. Reloaded only when the file changes."""
+    path = index_path(zone)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _lock:
+        cached = _loaded.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with open(path, "r", encoding="utf-8") as f:
+        index = PlotIndex.from_dict(json.load(f))
+    with _lock:
+        _loaded[path] = (mtime, index)
+    return index
@@ -2,27 +2,145 @@
 import os
 import re
 import json
+import time
 from datetime import datetime
 from playwright.async_api import async_playwright
 
+import artifact_cache
+import gazetteer
+import geo
+import metrics
+
 # Define absolute path for downloads directory (pointing to project_root/downloads)
 # script.py is in backend/, so we go up one level
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DOWNLOAD_DIR = os.path.join(BASE_DIR, "downloads")
 
-async def run(area_name):
+# Fast mode waits for concrete page conditions instead of fixed sleeps;
+# SCRAPE_FAST_MODE=0 restores the original timings
+FAST_MODE = os.environ.get("SCRAPE_FAST_MODE", "1") not in ("0", "false", "False")
+# Safety net for each condition wait in fast mode
+WAIT_TIMEOUT_MS = int(os.environ.get("SCRAPE_WAIT_TIMEOUT_MS", 10000))
+
+COORD_PATTERN = r'(\d+\.?\d*)\s*[Â°]?\s*([NS])\s*,?\s*(\d+\.?\d*)\s*[Â°]?\s*([EW])'
+
+class PageWaits:
+    """
+    Replaces the scraper's fixed page.wait_for_timeout sleeps.
+    
+    In fast mode each settle() waits for a condition (element present,
+    network quiet, text rendered) bounded by WAIT_TIMEOUT_MS; otherwise it
+    sleeps for the legacy duration. Both the legacy sleep budget and the
+    time actually waited are recorded so the saving can be reported.
+    """
+    def __init__(self, page, fast=FAST_MODE):
+        self.page = page
+        self.fast = fast
+        self.legacy_ms = 0
+        self.waited_ms = 0.0
+        self.timeouts = 0
+        self._inflight = 0
+        self._last_activity = time.monotonic()
+        page.on("request", self._on_request)
+        page.on("requestfinished", self._on_request_done)
+        page.on("requestfailed", self._on_request_done)
+
+    def _on_request(self, request):
+        self._inflight += 1
+        self._last_activity = time.monotonic()
+
+    def _on_request_done(self, request):
+        self._inflight = max(0, self._inflight - 1)
+        self._last_activity = time.monotonic()
+
+    async def settle(self, legacy_ms, condition=None, label="page"):
+        """
+        Sleep `legacy_ms` (legacy mode) or await `condition()` (fast mode).
+        A None condition means nothing needs to be waited for.
+        """
+        self.legacy_ms += legacy_ms
+        start = time.perf_counter()
+        if not self.fast:
+            await self.page.wait_for_timeout(legacy_ms)
+        elif condition is not None:
+            try:
+                await asyncio.wait_for(condition(), WAIT_TIMEOUT_MS / 1000)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                print(f"  Wait for {label} timed out after {WAIT_TIMEOUT_MS} ms, continuing")
+        self.waited_ms += (time.perf_counter() - start) * 1000
+
+    async def network_quiet(self, quiet_ms=500):
+        """Return once no request has been in flight for `quiet_ms`, counting from now."""
+        mark = time.monotonic()
+        while True:
+            idle_since = max(self._last_activity, mark)
+            if self._inflight == 0 and (time.monotonic() - idle_since) * 1000 >= quiet_ms:
+                return
+            await asyncio.sleep(0.05)
+
+    async def until(self, predicate, interval=0.1):
+        """Poll an async predicate until it returns something truthy."""
+        while True:
+            value = await predicate()
+            if value:
+                return value
+            await asyncio.sleep(interval)
+
+    def summary(self):
+        return {
+            "fast_mode": self.fast,
+            "legacy_sleep_ms": self.legacy_ms,
+            "waited_ms": round(self.waited_ms),
+            "saved_ms": round(self.legacy_ms - self.waited_ms),
+            "timeouts": self.timeouts,
+        }
+
+async def run(area_name, browser=None, context=None):
     """
     Run the scraping script for a given industrial area.
     
     Args:
         area_name (str): Name of the industrial area (e.g., 'Gondwara', 'Kapan', 'Amaseoni')
+        browser: Optional already-launched Playwright browser. When given, the
+            scrape runs in a fresh context of that browser and leaves it open.
+        context: Optional browser context to scrape in (e.g. borrowed from
+            browser_pool). It is left open; only the page is closed.
     
     Returns:
         dict: Result containing status, image_path, and json_path
     """
-    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    # Same-day map and location already scraped: skip Playwright entirely
+    cached = cached_result(area_name)
+    if cached:
+        return cached
+
+    result = _new_result(area_name)
+
+    if context is not None:
+        await _scrape(context, area_name, result)
+    elif browser is not None:
+        await _scrape_in_new_context(browser, area_name, result)
+    else:
+        async with async_playwright() as p:
+            browser = await launch_browser(p)
+            try:
+                await _scrape_in_new_context(browser, area_name, result)
+            finally:
+                await browser.close()
     
-    result = {
+    _store_in_cache(area_name, result)
+    return result
+
+async def _scrape_in_new_context(browser, area_name, result):
+    context = await new_scrape_context(browser)
+    try:
+        await _scrape(context, area_name, result)
+    finally:
+        await context.close()
+
+def _new_result(area_name):
+    return {
         "status": "error",
         "area_name": area_name,
         "image_path": None,
@@ -30,224 +148,491 @@ async def run(area_name):
         "error": None
     }
 
-    async with async_playwright() as p:
-        # Detect if running in production (Render)
-        is_production = os.environ.get('RENDER') or os.environ.get('PORT')
-        
-        browser = await p.chromium.launch(headless=bool(is_production))
-        context = await browser.new_context(accept_downloads=True)
-        page = await context.new_page()
+def cached_result(area_name):
+    """
+    The run() result for a zone already scraped today, from the artifact
+    cache, or None. Needs no browser, so callers holding a browser pool can
+    check it before borrowing a context.
+    """
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    result = _new_result(area_name)
+    return result if _load_from_cache(area_name, result) else None
+
+def _load_from_cache(area_name, result):
+    """Fill `result` from the artifact cache. Returns True on a hit."""
+    current_date = datetime.now().strftime("%Y-%m-%d")
+    image_blob = artifact_cache.get(area_name, "csidc_map", window=current_date)
+    json_blob = artifact_cache.get(area_name, "csidc_location", window=current_date)
+    if not image_blob or not json_blob:
+        return False
+
+    try:
+        image_ext = os.path.splitext(image_blob)[1]
+        image_path = artifact_cache.materialize(
+            image_blob, os.path.join(DOWNLOAD_DIR, f"{area_name}_{current_date}{image_ext}"))
+        json_path = artifact_cache.materialize(
+            json_blob, os.path.join(DOWNLOAD_DIR, f"{area_name}_{current_date}.json"))
+    except OSError as e:
+        print(f"Cache read failed, scraping instead: {e}")
+        return False
 
+    geojson_blob = artifact_cache.get(area_name, "csidc_geometry", window=current_date)
+    if geojson_blob:
         try:
-            await page.goto("https://cggis.cgstate.gov.in/csidc/", timeout=60000)
-            await page.wait_for_load_state("networkidle")
-            await page.wait_for_timeout(5000)
-
-            frame = None
-            if len(page.frames) > 1:
-                frame = page.frames[1]
-            else:
-                frame = page
-
-            await frame.locator(".nav-icon-label").filter(has_text="Old Industrial Area").click(timeout=15000)
-            await page.wait_for_timeout(3000)
-
-            dropdown = frame.locator("#oldIndustrialPlotDropdown")
-            await dropdown.wait_for(state="visible", timeout=15000)
-            await page.wait_for_timeout(2000)
-            
-            options = await dropdown.locator("option").all_text_contents()
-            
-            matching_option = None
-            for option in options:
-                if area_name.lower() in option.lower():
-                    matching_option = option
-                    break
-            
-            if matching_option:
-                await dropdown.select_option(label=matching_option, timeout=15000)
-            else:
-                await dropdown.locator(f"option:has-text('{area_name}')").click(timeout=15000)
-            
-            await page.wait_for_timeout(5000)
+            result["geojson_path"] = artifact_cache.materialize(
+                geojson_blob, os.path.join(DOWNLOAD_DIR, f"{area_name}_{current_date}.geojson"))
+        except OSError as e:
+            print(f"Cache read failed for geometry: {e}")
 
-            # Export with default basemap
-            await frame.locator(".tool-icon").filter(has_text="Export").click(timeout=15000)
-            await page.wait_for_timeout(2000)
+    result.update({"status": "success", "image_path": image_path, "json_path": json_path, "cached": True})
+    print(f"✓ Cache hit for {area_name} ({current_date}), skipping scrape")
+    return True
 
-            export_map_button = frame.locator("text=Export Map").first
-            await export_map_button.scroll_into_view_if_needed()
-            await page.wait_for_timeout(1000)
+def _store_in_cache(area_name, result):
+    """Cache a successful scrape. Runs without coordinates are not cached so they get retried."""
+    if result.get("status") != "success" or not result.get("image_path") or not result.get("json_path"):
+        return
+    try:
+        with open(result["json_path"], "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("status") != "success":
+            return
+        window = data.get("date")
+        artifact_cache.put(area_name, "csidc_map", result["image_path"], window=window)
+        artifact_cache.put(area_name, "csidc_location", result["json_path"], window=window)
+        if result.get("geojson_path"):
+            artifact_cache.put(area_name, "csidc_geometry", result["geojson_path"], window=window)
+    except Exception as e:
+        print(f"Could not cache scrape result: {e}")
 
-            try:
-                async with page.expect_download(timeout=60000) as download_info:
-                    await export_map_button.click(timeout=15000)
+class GeometryCapture:
+    """
+    Collects zone and plot polygons from the viewer's own map-service traffic.
+    
+    Every JSON response the page receives is checked for GeoJSON or ArcGIS
+    REST features (geo.extract_polygon_features); polygons are kept in
+    lon/lat and de-duplicated across responses.
+    """
+    MAX_RESPONSE_BYTES = 20 * 1024 * 1024
 
-                download = await download_info.value
-                
-                current_date = datetime.now().strftime("%Y-%m-%d")
-                
-                original_filename = download.suggested_filename
-                file_extension = os.path.splitext(original_filename)[1]
-                
-                new_filename = f"{area_name}_{current_date}{file_extension}"
-                file_path = os.path.join(DOWNLOAD_DIR, new_filename)
-                
-                await download.save_as(file_path)
-                result["image_path"] = file_path
-                print(f"âœ“ Downloaded: {file_path}")
-                
-            except Exception as e:
-                print(f"Download error: {e}")
-                result["error"] = f"Download failed: {str(e)}"
+    def __init__(self, page):
+        self.features = []
+        self._seen = set()
+        self._tasks = []
+        page.on("response", self._on_response)
 
-            # Wait for export dialog to close
-            await page.wait_for_timeout(3000)
+    def _on_response(self, response):
+        content_type = response.headers.get("content-type", "")
+        url = response.url.lower()
+        if "json" not in content_type and "geojson" not in url and "f=json" not in url:
+            return
+        try:
+            if int(response.headers.get("content-length", 0)) > self.MAX_RESPONSE_BYTES:
+                return
+        except ValueError:
+            pass
+        self._tasks.append(asyncio.ensure_future(self._parse(response)))
 
-            # Find map element
-            map_selectors = ["canvas", ".mapboxgl-canvas", ".esri-view-surface", "#mapDiv", ".map-container"]
-            
-            map_element = None
-            for selector in map_selectors:
-                try:
-                    element = frame.locator(selector).first
-                    if await element.count() > 0:
-                        map_element = element
-                        break
-                except:
-                    continue
-            
-            if not map_element:
-                print("Warning: Could not find map element")
-            
-            # Click somewhere on the map (outside boundary region)
-            if map_element:
-                try:
-                    box = await map_element.bounding_box()
-                    
-                    if box:
-                        # Click in the top-left corner (outside boundary)
-                        click_x = box['x'] + box['width'] * 0.15
-                        click_y = box['y'] + box['height'] * 0.15
-                        await frame.mouse.click(click_x, click_y)
-                        await page.wait_for_timeout(1500)
-                except Exception as e:
-                    print(f"Error clicking outside boundary: {e}")
-
-            # Click inside the boundary region (center)
-            if map_element:
-                try:
-                    box = await map_element.bounding_box()
-                    
-                    if box:
-                        # Click in the center of the map (inside boundary)
-                        click_x = box['x'] + box['width'] / 2
-                        click_y = box['y'] + box['height'] / 2
-                        await frame.mouse.click(click_x, click_y)
-                        await page.wait_for_timeout(2000)
-                except Exception as e:
-                    print(f"Error clicking inside boundary: {e}")
+    async def _parse(self, response):
+        try:
+            payload = await response.json()
+        except Exception:
+            return
+        for feature in geo.extract_polygon_features(payload):
+            key = geo.feature_key(feature)
+            if key not in self._seen:
+                self._seen.add(key)
+                self.features.append(feature)
+
+    async def settle(self):
+        """Wait for responses that are still being parsed."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def split(self, area_name):
+        """
+        Return (boundary feature or None, plot features).
+        
+        The boundary is the largest polygon whose attributes mention the zone;
+        plots are the smaller polygons whose centroid lies inside the
+        boundary's bbox. With no such polygon the boundary is None, so the run
+        falls back to the export/OCR path rather than caching a guess.
+        """
+        if not self.features:
+            return None, []
+        
+        named = [f for f in self.features
+                 if area_name.lower() in json.dumps(f["properties"], ensure_ascii=False).lower()]
+        if not named:
+            return None, []
+        boundary = max(named, key=geo.feature_area)
+        west, south, east, north = geo.bbox_of([boundary])
+        boundary_area = geo.feature_area(boundary)
+        
+        plots = []
+        for feature in self.features:
+            if feature is boundary or geo.feature_area(feature) >= boundary_area:
+                continue
+            lon, lat = geo.centroid_of(feature)
+            if west <= lon <= east and south <= lat <= north:
+                plots.append(feature)
+        return boundary, plots
+
+    @staticmethod
+    def _plot_id(feature, index):
+        for key, value in feature["properties"].items():
+            if "plot" in key.lower() and value not in (None, ""):
+                return str(value)
+        return str(index + 1)
+
+    def save(self, path, boundary, plots):
+        """
+        Write boundary and plots to one GeoJSON FeatureCollection tagged by
+        "role", and return the collection.
+        """
+        features = [dict(boundary, properties=dict(boundary["properties"], role="boundary"))]
+        for index, plot in enumerate(plots):
+            features.append(dict(plot, properties=dict(plot["properties"], role="plot",
+                                                       plot_id=self._plot_id(plot, index))))
+        collection = {"type": "FeatureCollection", "features": features}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(collection, f, ensure_ascii=False)
+        return collection
+
+async def launch_browser(playwright):
+    """Launch Chromium, headless in production (Render)."""
+    is_production = os.environ.get('RENDER') or os.environ.get('PORT')
+    return await playwright.chromium.launch(headless=bool(is_production))
+
+async def new_scrape_context(browser):
+    """Browser context configured for scraping (map exports are downloads)."""
+    return await browser.new_context(accept_downloads=True)
+
+async def _open_old_industrial_dropdown(page, waits):
+    """Open the CSIDC viewer and return (frame, dropdown locator) for the Old Industrial Area list."""
+    await page.goto("https://cggis.cgstate.gov.in/csidc/", timeout=60000)
+    await page.wait_for_load_state("networkidle")
+
+    async def nav_rendered():
+        for candidate in page.frames:
+            if await candidate.locator(".nav-icon-label").filter(has_text="Old Industrial Area").count() > 0:
+                return True
+        return False
+
+    await waits.settle(5000, lambda: waits.until(nav_rendered), "viewer navigation")
+
+    frame = None
+    if len(page.frames) > 1:
+        frame = page.frames[1]
+    else:
+        frame = page
+
+    await frame.locator(".nav-icon-label").filter(has_text="Old Industrial Area").click(timeout=15000)
+
+    dropdown = frame.locator("#oldIndustrialPlotDropdown")
+    await waits.settle(3000, lambda: dropdown.wait_for(state="visible"), "dropdown")
+    await dropdown.wait_for(state="visible", timeout=15000)
+
+    async def dropdown_populated():
+        return await dropdown.locator("option").count() > 1
+
+    await waits.settle(2000, lambda: waits.until(dropdown_populated), "dropdown options")
+    return frame, dropdown
+
+async def list_zones(context=None):
+    """
+    Return the industrial area names listed in #oldIndustrialPlotDropdown.
+    
+    Args:
+        context: Optional browser context to reuse (e.g. from browser_pool)
+    """
+    if context is None:
+        async with async_playwright() as p:
+            browser = await launch_browser(p)
+            try:
+                return await list_zones(await new_scrape_context(browser))
+            finally:
+                await browser.close()
+    
+    page = await context.new_page()
+    try:
+        frame, dropdown = await _open_old_industrial_dropdown(page, PageWaits(page))
+        options = await dropdown.locator("option").all_text_contents()
+    finally:
+        await page.close()
+    
+    zones = []
+    for option in options:
+        name = option.strip()
+        # Skip the "Select ..." placeholder entry
+        if name and not name.lower().startswith("select"):
+            zones.append(name)
+    return zones
+
+def _parse_location(text):
+    """(lat, lon) from a scraped "22.0173°N, 82.4790°E" string, or None."""
+    match = re.search(COORD_PATTERN, text or "", re.IGNORECASE)
+    if not match:
+        return None
+    lat = float(match.group(1)) * (-1 if match.group(2).upper() == "S" else 1)
+    lon = float(match.group(3)) * (-1 if match.group(4).upper() == "W" else 1)
+    return lat, lon
+
+async def _scrape_location_text(page, frame, waits):
+    """
+    Legacy coordinate lookup: click the map outside and inside the zone and
+    regex-scrape the "Location" text the viewer shows. Returns the
+    "22.0173°N, 82.4790°E" string or None.
+    """
+    # Find map element
+    map_selectors = ["canvas", ".mapboxgl-canvas", ".esri-view-surface", "#mapDiv", ".map-container"]
+    
+    map_element = None
+    for selector in map_selectors:
+        try:
+            element = frame.locator(selector).first
+            if await element.count() > 0:
+                map_element = element
+                break
+        except:
+            continue
+    
+    if not map_element:
+        print("Warning: Could not find map element")
+    
+    # Click somewhere on the map (outside boundary region)
+    if map_element:
+        try:
+            box = await map_element.bounding_box()
             
-            # Extract coordinates with error handling
-            extracted_coordinates = None
+            if box:
+                # Click in the top-left corner (outside boundary)
+                click_x = box['x'] + box['width'] * 0.15
+                click_y = box['y'] + box['height'] * 0.15
+                await frame.mouse.click(click_x, click_y)
+                await waits.settle(1500, lambda: waits.network_quiet(300), "map click")
+        except Exception as e:
+            print(f"Error clicking outside boundary: {e}")
+
+    # Click inside the boundary region (center)
+    if map_element:
+        try:
+            box = await map_element.bounding_box()
             
+            if box:
+                # Click in the center of the map (inside boundary)
+                click_x = box['x'] + box['width'] / 2
+                click_y = box['y'] + box['height'] / 2
+                await frame.mouse.click(click_x, click_y)
+
+                async def location_rendered():
+                    body_text = await frame.locator('body').text_content()
+                    return re.search(COORD_PATTERN, body_text or "", re.IGNORECASE)
+
+                await waits.settle(2000, lambda: waits.until(location_rendered, 0.2), "location panel")
+        except Exception as e:
+            print(f"Error clicking inside boundary: {e}")
+    
+    # Extract coordinates with error handling
+    extracted_coordinates = None
+    
+    try:
+        coordinate_selectors = [
+            "text=Location",
+            ".coordinates",
+            ".location-info",
+            "[class*='coord']",
+            "[class*='location']",
+            "label:has-text('Location')",
+            "div:has-text('Location')",
+        ]
+        
+        coordinates_found = False
+        
+        for selector in coordinate_selectors:
             try:
-                coordinate_selectors = [
-                    "text=Location",
-                    ".coordinates",
-                    ".location-info",
-                    "[class*='coord']",
-                    "[class*='location']",
-                    "label:has-text('Location')",
-                    "div:has-text('Location')",
-                ]
-                
-                coordinates_found = False
+                location_element = frame.locator(selector).first
+                element_count = await location_element.count()
                 
-                for selector in coordinate_selectors:
+                if element_count > 0:
+                    location_text = await location_element.text_content()
+                    
                     try:
-                        location_element = frame.locator(selector).first
-                        element_count = await location_element.count()
-                        
-                        if element_count > 0:
-                            location_text = await location_element.text_content()
-                            
-                            try:
-                                parent = location_element.locator('..')
-                                parent_text = await parent.text_content()
-                            except:
-                                parent_text = ""
-                            
-                            try:
-                                next_sibling = location_element.locator('xpath=following-sibling::*[1]')
-                                sibling_text = await next_sibling.text_content()
-                            except:
-                                sibling_text = ""
-                            
-                            combined_text = f"{location_text} {parent_text} {sibling_text}"
-                            
-                            coord_pattern = r'(\d+\.?\d*)\s*[Â°]?\s*([NS])\s*,?\s*(\d+\.?\d*)\s*[Â°]?\s*([EW])'
-                            matches = re.findall(coord_pattern, combined_text, re.IGNORECASE)
-                            
-                            if matches:
-                                match = matches[0]
-                                extracted_coordinates = f"{match[0]}Â°{match[1]}, {match[2]}Â°{match[3]}"
-                                coordinates_found = True
-                                break
-                                
-                    except Exception as e:
-                        continue
-                
-                if not coordinates_found:
+                        parent = location_element.locator('..')
+                        parent_text = await parent.text_content()
+                    except:
+                        parent_text = ""
+                    
                     try:
-                        body_text = await frame.locator('body').text_content()
-                        
-                        coord_pattern = r'(\d+\.?\d*)\s*[Â°]?\s*([NS])\s*,?\s*(\d+\.?\d*)\s*[Â°]?\s*([EW])'
-                        matches = re.findall(coord_pattern, body_text, re.IGNORECASE)
-                        
-                        if matches:
-                            match = matches[0]
-                            extracted_coordinates = f"{match[0]}Â°{match[1]}, {match[2]}Â°{match[3]}"
-                    except Exception as e:
-                        print(f"Error searching body for coordinates: {e}")
+                        next_sibling = location_element.locator('xpath=following-sibling::*[1]')
+                        sibling_text = await next_sibling.text_content()
+                    except:
+                        sibling_text = ""
+                    
+                    combined_text = f"{location_text} {parent_text} {sibling_text}"
+                    
+                    matches = re.findall(COORD_PATTERN, combined_text, re.IGNORECASE)
+                    
+                    if matches:
+                        match = matches[0]
+                        extracted_coordinates = f"{match[0]}Â°{match[1]}, {match[2]}Â°{match[3]}"
+                        coordinates_found = True
+                        break
                         
             except Exception as e:
-                print(f"Error extracting coordinates: {e}")
-
-            # Save to JSON with error handling
+                continue
+        
+        if not coordinates_found:
             try:
-                json_filename = f"{area_name}_{current_date}.json"
-                json_path = os.path.join(DOWNLOAD_DIR, json_filename)
-                
-                json_data = {
-                    "area_name": area_name,
-                    "date": current_date,
-                    "location": extracted_coordinates if extracted_coordinates else "Not found",
-                    "status": "success" if extracted_coordinates else "coordinates_not_found"
-                }
+                body_text = await frame.locator('body').text_content()
                 
-                with open(json_path, 'w', encoding='utf-8') as json_file:
-                    json.dump(json_data, json_file, indent=2, ensure_ascii=False)
-                
-                result["json_path"] = json_path
-                result["status"] = "success"
-                print(f"âœ“ JSON saved: {json_path}")
+                matches = re.findall(COORD_PATTERN, body_text, re.IGNORECASE)
                 
+                if matches:
+                    match = matches[0]
+                    extracted_coordinates = f"{match[0]}Â°{match[1]}, {match[2]}Â°{match[3]}"
             except Exception as e:
-                print(f"Error saving JSON: {e}")
-                result["error"] = f"JSON save failed: {str(e)}"
+                print(f"Error searching body for coordinates: {e}")
+                
+    except Exception as e:
+        print(f"Error extracting coordinates: {e}")
 
-            # Keep browser open for a moment to see results
-            await page.wait_for_timeout(2000)
+    return extracted_coordinates
 
-        except Exception as e:
-            print(f"Fatal error: {e}")
-            result["error"] = f"Fatal error: {str(e)}"
+async def _scrape(context, area_name, result):
+    page = await context.new_page()
+    waits = PageWaits(page)
+    capture = GeometryCapture(page)
+
+    try:
+        frame, dropdown = await _open_old_industrial_dropdown(page, waits)
+        
+        options = await dropdown.locator("option").all_text_contents()
+        
+        matching_option = None
+        for option in options:
+            if area_name.lower() in option.lower():
+                matching_option = option
+                break
         
-        finally:
-            await browser.close()
+        if matching_option:
+            await dropdown.select_option(label=matching_option, timeout=15000)
+        else:
+            await dropdown.locator(f"option:has-text('{area_name}')").click(timeout=15000)
+        
+        # Selecting a zone zooms the map; wait for its layer requests to finish
+        await waits.settle(5000, lambda: waits.network_quiet(750), "map layers")
+
+        # Export with default basemap
+        await frame.locator(".tool-icon").filter(has_text="Export").click(timeout=15000)
+
+        export_map_button = frame.locator("text=Export Map").first
+        await waits.settle(2000, lambda: export_map_button.wait_for(state="visible"), "export panel")
+
+        await export_map_button.scroll_into_view_if_needed()
+        await waits.settle(1000, None)
+
+        try:
+            async with page.expect_download(timeout=60000) as download_info:
+                await export_map_button.click(timeout=15000)
+
+            download = await download_info.value
+            
+            current_date = datetime.now().strftime("%Y-%m-%d")
+            
+            original_filename = download.suggested_filename
+            file_extension = os.path.splitext(original_filename)[1]
+            
+            new_filename = f"{area_name}_{current_date}{file_extension}"
+            file_path = os.path.join(DOWNLOAD_DIR, new_filename)
+            
+            await download.save_as(file_path)
+            metrics.record_bytes("csidc_map", os.path.getsize(file_path))
+            result["image_path"] = file_path
+            print(f"âœ“ Downloaded: {file_path}")
+            
+        except Exception as e:
+            print(f"Download error: {e}")
+            result["error"] = f"Download failed: {str(e)}"
+
+        # Wait for export dialog to close
+        await waits.settle(3000, lambda: waits.network_quiet(300), "export dialog")
+
+        # Boundary geometry captured from the viewer's map-service responses
+        # gives exact coordinates. Failing that, a zone recorded by an earlier
+        # scrape or import needs no lookup. Otherwise the click-and-scrape
+        # lookup runs, and a builtin seed is only used when it finds nothing
+        await capture.settle()
+        boundary, plots = capture.split(area_name)
+        extracted_coordinates = None
+        zone_bbox = None
+        geojson_path = os.path.join(DOWNLOAD_DIR, f"{area_name}_{datetime.now().strftime('%Y-%m-%d')}.geojson")
+        known = None if boundary else gazetteer.lookup(area_name)
+        if boundary:
+            lon, lat = geo.centroid_of(boundary)
+            extracted_coordinates = geo.format_location(lat, lon)
+            zone_bbox = geo.bbox_of([boundary])
+            collection = capture.save(geojson_path, boundary, plots)
+            result["geojson_path"] = geojson_path
+            gazetteer.record(area_name, lat, lon, zone_bbox, collection)
+            print(f"✓ Captured boundary and {len(plots)} plots: {geojson_path}")
+        elif known and known["source"] != "builtin":
+            extracted_coordinates = geo.format_location(known["lat"], known["lon"])
+            zone_bbox = known["bbox"]
+            if known["geometry"]:
+                with open(geojson_path, "w", encoding="utf-8") as f:
+                    json.dump(known["geometry"], f, ensure_ascii=False)
+                result["geojson_path"] = geojson_path
+            print(f"✓ {area_name} found in gazetteer ({known['source']}), skipping coordinate lookup")
+        else:
+            extracted_coordinates = await _scrape_location_text(page, frame, waits)
+            coordinates = _parse_location(extracted_coordinates)
+            if coordinates:
+                gazetteer.record(area_name, *coordinates)
+            elif known:
+                extracted_coordinates = geo.format_location(known["lat"], known["lon"])
+                print(f"  No location scraped for {area_name}, using the builtin gazetteer entry")
+
+        # Save to JSON with error handling
+        try:
+            json_filename = f"{area_name}_{current_date}.json"
+            json_path = os.path.join(DOWNLOAD_DIR, json_filename)
+            
+            json_data = {
+                "area_name": area_name,
+                "date": current_date,
+                "location": extracted_coordinates if extracted_coordinates else "Not found",
+                "status": "success" if extracted_coordinates else "coordinates_not_found"
+            }
+            if zone_bbox:
+                json_data["bbox"] = zone_bbox
+            if result.get("geojson_path"):
+                json_data["geojson_path"] = os.path.basename(result["geojson_path"])
+            
+            with open(json_path, 'w', encoding='utf-8') as json_file:
+                json.dump(json_data, json_file, indent=2, ensure_ascii=False)
+            
+            result["json_path"] = json_path
+            result["status"] = "success"
+            print(f"âœ“ JSON saved: {json_path}")
+            
+        except Exception as e:
+            print(f"Error saving JSON: {e}")
+            result["error"] = f"JSON save failed: {str(e)}"
+
+        # Keep browser open for a moment to see results (legacy mode only)
+        await waits.settle(2000, None)
+
+    except Exception as e:
+        print(f"Fatal error: {e}")
+        result["error"] = f"Fatal error: {str(e)}"
     
-    return result
+    finally:
+        result["wait_timings"] = waits.summary()
+        metrics.SCRAPE_WAITS.observe(waits.waited_ms / 1000, kind="waited")
+        metrics.SCRAPE_WAITS.observe(max(0.0, waits.legacy_ms - waits.waited_ms) / 1000, kind="saved")
+        print(f"  Page waits: {result['wait_timings']}")
+        await page.close()
 
 # Run script
 if __name__ == "__main__":
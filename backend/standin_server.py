@@ -0,0 +1,204 @@
+"""
+Local stand-in for the imagery services, for offline benchmarks.
+
+    python backend/standin_server.py --port 8765 --latency-ms 80 --error-rate 0.02
+
+Then run the backend with IMAGERY_CURRENT_PROVIDER=standin,
+IMAGERY_STREET_PROVIDER=standin and IMAGERY_HISTORICAL_PROVIDER=standin
+(see imagery_providers.py). Endpoints:
+
+    GET /tiles/<layer>/<z>/<y>/<x>     recorded tile from the tile cache, else synthetic
+    GET /export/<layer>?bbox=&size=    recorded image from downloads/ whose metadata
+                                       sidecar matches bbox and size, else synthetic
+    GET /health                        request and injected error counts
+
+Layers are esri_world_imagery, esri_world_street_map and historical (replays
+recorded Wayback tiles). Every request is delayed by --latency-ms plus up to
+--jitter-ms, and --error-rate of them get a 503 with Retry-After so the
+client's retries are exercised. Synthetic images are seeded by the request
+and --seed fixes the latency/error sequence, so runs are reproducible.
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from glob import glob
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import tiles
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOWNLOAD_DIR = os.path.join(BASE_DIR, "downloads")
+
+# Synthetic output is capped so a bad size parameter can't exhaust memory
+MAX_EXPORT_SIDE = 4096
+
+
+class StandIn:
+    def __init__(self, latency_ms=50, jitter_ms=20, error_rate=0.0, seed=0):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.exports = self._index_exports()
+
+    def next_request(self):
+        """(delay in seconds, whether to fail) for the next request."""
+        with self.lock:
+            self.requests += 1
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            fail = self.random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return delay, fail
+
+    # ------------------------------------------------------
+    # Recorded data
+    # ------------------------------------------------------
+    def _index_exports(self):
+        """(layer, bbox, width, height) -> image path, from the metadata sidecars in downloads/."""
+        index = {}
+        for sidecar in glob(os.path.join(DOWNLOAD_DIR, "*.json")):
+            try:
+                with open(sidecar, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            image = os.path.splitext(sidecar)[0] + ".png"
+            if not isinstance(meta, dict) or not meta.get("bbox") or not os.path.exists(image):
+                continue
+            index[(meta.get("source"), _bbox_key(meta["bbox"]), meta.get("width"), meta.get("height"))] = image
+        return index
+
+    def recorded_tile(self, layer, z, x, y):
+        if layer == "historical":
+            # Newest Wayback release that has the tile
+            dirs = sorted(glob(os.path.join(tiles.TILE_DIR, "wayback_*")), reverse=True)
+        else:
+            dirs = [os.path.join(tiles.TILE_DIR, layer)]
+        for d in dirs:
+            path = os.path.join(d, str(z), str(x), str(y))
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    return f.read()
+        return None
+
+    def recorded_export(self, layer, bbox, width, height):
+        path = self.exports.get((layer, _bbox_key(bbox), width, height))
+        if path is None:
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def _bbox_key(bbox):
+    return tuple(round(float(v), 6) for v in bbox)
+
+
+def synthetic_image(seed_text, width, height):
+    """
+    Deterministic stand-in imagery: a textured ground colour with a few
+    rectangular "buildings", seeded by seed_text.
+    """
+    rng = np.random.default_rng(zlib.crc32(seed_text.encode("utf-8")))
+    base = rng.integers(60, 160, size=3)
+    img = np.clip(base + rng.normal(0, 12, size=(height, width, 3)), 0, 255).astype(np.uint8)
+    for _ in range(int(rng.integers(3, 12))):
+        x0, y0 = int(rng.integers(0, width)), int(rng.integers(0, height))
+        w, h = int(rng.integers(8, max(9, width // 6))), int(rng.integers(8, max(9, height // 6)))
+        color = tuple(int(c) for c in rng.integers(150, 240, size=3))
+        cv2.rectangle(img, (x0, y0), (x0 + w, y0 + h), color, -1)
+    ok, buffer = cv2.imencode(".png", img)
+    return buffer.tobytes()
+
+
+def make_handler(standin):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body, content_type="image/png", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            parts = [p for p in url.path.split("/") if p]
+
+            if parts == ["health"]:
+                body = json.dumps({"requests": standin.requests, "errors": standin.errors,
+                                   "recorded_exports": len(standin.exports)}).encode("utf-8")
+                return self._send(200, body, "application/json")
+
+            delay, fail = standin.next_request()
+            time.sleep(delay)
+            if fail:
+                return self._send(503, b"injected error", "text/plain", {"Retry-After": "0"})
+
+            try:
+                if len(parts) == 5 and parts[0] == "tiles":
+                    layer = parts[1]
+                    z, y, x = (int(v) for v in parts[2:])
+                    data = standin.recorded_tile(layer, z, x, y) or \
+                        synthetic_image(f"{layer}/{z}/{x}/{y}", tiles.TILE_SIZE, tiles.TILE_SIZE)
+                    return self._send(200, data)
+
+                if len(parts) == 2 and parts[0] == "export":
+                    query = parse_qs(url.query)
+                    bbox = [float(v) for v in query["bbox"][0].split(",")]
+                    width, height = (int(v) for v in query.get("size", ["1024,1024"])[0].split(","))
+                    if len(bbox) != 4 or not (0 < width <= MAX_EXPORT_SIDE and 0 < height <= MAX_EXPORT_SIDE):
+                        raise ValueError("bad bbox or size")
+                    data = standin.recorded_export(parts[1], bbox, width, height) or \
+                        synthetic_image(f"{parts[1]}/{_bbox_key(bbox)}", width, height)
+                    return self._send(200, data)
+            except (KeyError, ValueError) as e:
+                return self._send(400, str(e).encode("utf-8"), "text/plain")
+
+            return self._send(404, b"not found", "text/plain")
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the imagery services")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("STANDIN_PORT", 8765)))
+    parser.add_argument("--latency-ms", type=float, default=float(os.environ.get("STANDIN_LATENCY_MS", 50)))
+    parser.add_argument("--jitter-ms", type=float, default=float(os.environ.get("STANDIN_JITTER_MS", 20)))
+    parser.add_argument("--error-rate", type=float, default=float(os.environ.get("STANDIN_ERROR_RATE", 0.0)))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    standin = StandIn(args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(standin))
+    print(f"Imagery stand-in on http://{args.host}:{args.port} "
+          f"(latency {args.latency_ms:g}+{args.jitter_ms:g} ms, error rate {args.error_rate:g}, "
+          f"{len(standin.exports)} recorded exports)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,18 @@
-﻿import requests
+﻿import http_client
 import math
 from PIL import Image
 from io import BytesIO
 from datetime import datetime
 
-def deg2num(lat_deg, lon_deg, zoom):
-    lat_rad = math.radians(lat_deg)
-    n = 2.0 ** zoom
-    xtile = int((lon_deg + 180.0) / 360.0 * n)
-    ytile = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
-    return (xtile, ytile)
+from tiles import deg2num
+import wayback
 
 def fetch_wayback_config():
     # Helper to try URL and return json or None
     def try_url(url):
         print(f"Trying URL: {url}")
         try:
-            response = requests.get(url)
+            response = http_client.get(url, timeout=30)
             print(f"Status Code: {response.status_code}")
             if response.status_code == 200:
                 try:
@@ -44,15 +40,8 @@ def fetch_wayback_config():
     return res2
 
 def get_closest_release(config, target_date):
-    # releases is a dict where key is release ID/name
-    # But usually config is a standard structure. Let's inspect it or assume list.
-    # Actually checking standard wayback config structure: it's usually just the JSON.
-    # We will print keys to debug if needed, but let's assume it has a list of releases.
-    # Actually, often the config IS the list or has a 'release' key.
-    # Let's try to assume it's a list sorted by date.
-    
-    # Simple logic: find release with 'releaseDate' closest to target.
-    pass 
+    """Release in a Wayback config whose date is closest to target_date ("YYYY-MM-DD")."""
+    return wayback.nearest_in(wayback.build_index(config), target_date)
 
 def main():
     print("Fetching Wayback config...")
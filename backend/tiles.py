@@ -0,0 +1,267 @@
+"""
+XYZ tile fetcher for the ESRI basemaps.
+
+The MapServer /export endpoint renders a fresh 1024x1024 image for every
+request, which is slow and can't be shared between overlapping zones.
+Here the same imagery comes from the cached z/x/y tile service instead.
+Tiles are fetched in parallel and kept in a size-bounded disk cache under
+downloads/cache/tiles/<source>/<z>/<x>/<y>, then mosaicked and resampled
+to the requested lon/lat bbox. Adjacent zones and reruns reuse tiles.
+
+Output images are in EPSG:4326 (like the export with imageSR=4326), so
+pixel coordinates stay linear in lon/lat for geo.lonlat_to_pixel.
+"""
+import os
+import math
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import requests
+from PIL import Image
+
+import artifact_cache
+import http_client
+import metrics
+
+TILE_SIZE = 256
+
+TILE_SOURCES = {
+    "esri_world_imagery": {
+        "url": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
+        "max_zoom": 19,
+    },
+    "esri_world_street_map": {
+        "url": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Street_Map/MapServer/tile/{z}/{y}/{x}",
+        "max_zoom": 19,
+    },
+}
+
+_sources_lock = threading.Lock()
+
+
+def register_source(name, url, max_zoom=19, cache=True):
+    """
+    Add a tile source at runtime (e.g. one Wayback release); url uses {z}/{y}/{x}.
+    cache=False skips the disk cache (e.g. a local benchmark server).
+    """
+    with _sources_lock:
+        TILE_SOURCES[name] = {"url": url, "max_zoom": max_zoom, "cache": cache}
+
+
+TILE_DIR = os.path.join(artifact_cache.CACHE_DIR, "tiles")
+# Tiles fetched at once per mosaic
+FETCH_WORKERS = int(os.environ.get("TILE_FETCH_WORKERS", 8))
+CACHE_MAX_BYTES = int(os.environ.get("TILE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Basemap tiles change rarely; refetch after this many seconds
+CACHE_TTL = int(os.environ.get("TILE_CACHE_TTL", 30 * 24 * 3600))
+# A mosaic is rejected if more than this fraction of its tiles are missing
+MAX_MISSING_FRACTION = 0.25
+
+
+# ==========================================================
+# TILE MATH (slippy map / Web Mercator)
+# ==========================================================
+def deg2num(lat_deg, lon_deg, zoom):
+    lat_rad = math.radians(lat_deg)
+    n = 2.0 ** zoom
+    xtile = int((lon_deg + 180.0) / 360.0 * n)
+    ytile = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return (xtile, ytile)
+
+
+def _global_pixels(lat_deg, lon_deg, zoom):
+    """Fractional global pixel coordinates (arrays allowed) at zoom."""
+    n = TILE_SIZE * 2.0 ** zoom
+    x = (np.asarray(lon_deg, dtype=np.float64) + 180.0) / 360.0 * n
+    lat_rad = np.radians(np.asarray(lat_deg, dtype=np.float64))
+    y = (1.0 - np.arcsinh(np.tan(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def zoom_for(bbox, width, max_zoom):
+    """Lowest zoom whose tiles are at least as detailed as width pixels over bbox."""
+    west, _, east, _ = bbox
+    pixels_per_degree = width / (east - west)
+    zoom = math.ceil(math.log2(pixels_per_degree * 360.0 / TILE_SIZE))
+    return max(0, min(zoom, max_zoom))
+
+
+# ==========================================================
+# DISK CACHE
+# ==========================================================
+_cache_lock = threading.Lock()
+_cache_bytes = None
+
+
+def _tile_path(source, z, x, y):
+    return os.path.join(TILE_DIR, source, str(z), str(x), str(y))
+
+
+def _cache_size():
+    """Total bytes under TILE_DIR, scanned once then kept up to date."""
+    global _cache_bytes
+    if _cache_bytes is None:
+        total = 0
+        for root, _, files in os.walk(TILE_DIR):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        _cache_bytes = total
+    return _cache_bytes
+
+
+def _evict_tiles():
+    """Delete least recently used tiles until under CACHE_MAX_BYTES (caller holds _cache_lock)."""
+    global _cache_bytes
+    entries = []
+    for root, _, files in os.walk(TILE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_atime, st.st_size, path))
+
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    # Evict down to 90% so we don't rescan on every put
+    target = CACHE_MAX_BYTES * 0.9
+    for _, size, path in entries:
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    _cache_bytes = total
+
+
+def _cached_tile(source, z, x, y):
+    path = _tile_path(source, z, x, y)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if time.time() - st.st_mtime > CACHE_TTL:
+        return None
+    # A concurrent _evict_tiles can remove the file after the stat; that is a miss
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        # mtime is when the tile was fetched, atime (set explicitly, so noatime
+        # mounts don't matter) when it was last used for LRU eviction
+        os.utime(path, (time.time(), st.st_mtime))
+    except OSError:
+        return None
+    return data
+
+
+def _store_tile(source, z, x, y, data):
+    global _cache_bytes
+    path = _tile_path(source, z, x, y)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    try:
+        replaced = os.path.getsize(path)
+    except OSError:
+        replaced = 0
+    os.replace(tmp_path, path)
+    with _cache_lock:
+        if _cache_bytes is None:
+            _cache_size()  # first scan already counts the new tile
+        else:
+            # An overwritten (expired) tile only changes the total by the difference
+            _cache_bytes += len(data) - replaced
+        if _cache_bytes > CACHE_MAX_BYTES:
+            _evict_tiles()
+
+
+# ==========================================================
+# FETCHING
+# ==========================================================
+def fetch_tile(source, z, x, y):
+    """Encoded tile bytes from the disk cache or the tile service, or None if unavailable."""
+    use_cache = TILE_SOURCES[source].get("cache", True)
+    if use_cache:
+        data = _cached_tile(source, z, x, y)
+        if data is not None:
+            metrics.CACHE_LOOKUPS.inc(source=f"{source}_tile", result="hit")
+            return data
+        metrics.CACHE_LOOKUPS.inc(source=f"{source}_tile", result="miss")
+
+    url = TILE_SOURCES[source]["url"].format(z=z, x=x, y=y)
+    try:
+        response = http_client.get(url, timeout=30)
+    except requests.RequestException as e:
+        print(f"  Tile {source} {z}/{x}/{y} failed: {e}")
+        return None
+    metrics.record_bytes(source, len(response.content))
+    if response.status_code != 200 or not response.content:
+        return None
+    if use_cache:
+        _store_tile(source, z, x, y, response.content)
+    return response.content
+
+
+def fetch_mosaic(source, bbox, width=1024, height=1024, zoom=None):
+    """
+    Image of bbox assembled from tiles.
+
+    Args:
+        source (str): Key of TILE_SOURCES
+        bbox (list): [west, south, east, north] in EPSG:4326
+        width, height (int): Output size in pixels
+        zoom (int): Tile zoom; by default the lowest one that covers the
+            output resolution
+
+    Returns:
+        PIL.Image.Image: RGB image in EPSG:4326 covering bbox
+
+    Raises:
+        RuntimeError: If too many tiles could not be fetched
+    """
+    west, south, east, north = bbox
+    if zoom is None:
+        zoom = zoom_for(bbox, width, TILE_SOURCES[source]["max_zoom"])
+
+    x0, y0 = deg2num(north, west, zoom)
+    x1, y1 = deg2num(south, east, zoom)
+    coords = [(x, y) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="tiles") as executor:
+        tiles = list(executor.map(lambda c: fetch_tile(source, zoom, c[0], c[1]), coords))
+
+    missing = sum(1 for data in tiles if data is None)
+    if missing > len(coords) * MAX_MISSING_FRACTION:
+        raise RuntimeError(f"{missing} of {len(coords)} {source} tiles unavailable at zoom {zoom}")
+
+    mosaic = np.zeros(((y1 - y0 + 1) * TILE_SIZE, (x1 - x0 + 1) * TILE_SIZE, 3), dtype=np.uint8)
+    for (x, y), data in zip(coords, tiles):
+        if data is None:
+            continue
+        tile = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if tile is None or tile.shape[:2] != (TILE_SIZE, TILE_SIZE):
+            continue
+        top, left = (y - y0) * TILE_SIZE, (x - x0) * TILE_SIZE
+        mosaic[top:top + TILE_SIZE, left:left + TILE_SIZE] = tile
+
+    # Resample the Web Mercator mosaic onto an equal-angle lon/lat grid
+    lons = west + (np.arange(width) + 0.5) * (east - west) / width
+    lats = north - (np.arange(height) + 0.5) * (north - south) / height
+    gx, _ = _global_pixels(0.0, lons, zoom)
+    _, gy = _global_pixels(lats, 0.0, zoom)
+    map_x = np.broadcast_to((gx - x0 * TILE_SIZE - 0.5).astype(np.float32), (height, width))
+    map_y = np.broadcast_to((gy - y0 * TILE_SIZE - 0.5).astype(np.float32)[:, None], (height, width))
+    out = cv2.remap(mosaic, np.ascontiguousarray(map_x), np.ascontiguousarray(map_y), cv2.INTER_LINEAR)
+
+    print(f"  Mosaic {source}: {len(coords)} tiles at z{zoom} ({missing} missing)")
+    return Image.fromarray(cv2.cvtColor(out, cv2.COLOR_BGR2RGB))
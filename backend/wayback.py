@@ -0,0 +1,163 @@
+"""
+ArcGIS World Imagery Wayback as a historical imagery provider.
+
+Wayback publishes every past release of the ESRI World_Imagery basemap.
+The release catalogue (waybackconfig.json) is downloaded once and kept
+as a date-sorted index under downloads/cache/, so picking the release
+closest to a target date is a binary search with no per-request
+catalogue fetch. Each release's tiles go through tiles.py and share its
+disk cache, which gives sub-metre historical imagery on the same grid
+as the current ESRI layer.
+"""
+import os
+import re
+import json
+import time
+import bisect
+import threading
+from datetime import datetime
+
+import artifact_cache
+import http_client
+import tiles
+
+CONFIG_URL = os.environ.get(
+    "WAYBACK_CONFIG_URL",
+    "https://s3-us-west-2.amazonaws.com/config.maptiles.arcgis.com/waybackconfig.json",
+)
+INDEX_PATH = os.path.join(artifact_cache.CACHE_DIR, "wayback_index.json")
+# New releases appear every few weeks; refresh the local index after this long
+INDEX_TTL = int(os.environ.get("WAYBACK_INDEX_TTL", 7 * 24 * 3600))
+# After a failed refresh the stale index is kept and the download retried this much later
+INDEX_RETRY = min(INDEX_TTL, 3600)
+
+TITLE_DATE = re.compile(r"(\d{4}-\d{2}-\d{2})")
+
+_lock = threading.Lock()
+_index = None
+_dates = None
+_expires_at = 0.0
+
+
+def build_index(config):
+    """
+    Sorted release list from a waybackconfig.json payload:
+    [{"date": "YYYY-MM-DD", "release": int, "url": tile template with {z}/{y}/{x}}]
+    """
+    releases = []
+    for release, item in (config or {}).items():
+        if not isinstance(item, dict):
+            continue
+        match = TITLE_DATE.search(item.get("itemTitle", ""))
+        url = item.get("itemURL")
+        if not match or not url:
+            continue
+        url = url.replace("{level}", "{z}").replace("{row}", "{y}").replace("{col}", "{x}")
+        releases.append({"date": match.group(1), "release": int(release), "url": url})
+    releases.sort(key=lambda r: (r["date"], r["release"]))
+    return releases
+
+
+def _download_index():
+    response = http_client.get(CONFIG_URL, timeout=30)
+    response.raise_for_status()
+    index = build_index(response.json())
+    if not index:
+        raise ValueError("Wayback config contained no releases")
+
+    os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+    tmp_path = f"{INDEX_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"fetched_at": time.time(), "releases": index}, f)
+    os.replace(tmp_path, INDEX_PATH)
+    print(f"  Wayback index refreshed: {len(index)} releases")
+    return index
+
+
+def load_index(refresh=False):
+    """
+    The release index, read from disk (or downloaded if missing/stale).
+    A stale index is still used if the refresh fails. The in-memory copy
+    is reloaded once it is INDEX_TTL old, so long-running servers pick up
+    new releases.
+    """
+    global _index, _dates, _expires_at
+    with _lock:
+        if _index is not None and not refresh and time.time() < _expires_at:
+            return _index
+
+        stored = None
+        try:
+            with open(INDEX_PATH, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        index = stored["releases"] if stored else None
+        expires_at = (stored.get("fetched_at", 0) if stored else 0) + INDEX_TTL
+        if refresh or time.time() >= expires_at:
+            try:
+                index = _download_index()
+                expires_at = time.time() + INDEX_TTL
+            except Exception as e:
+                index = index or _index
+                if not index:
+                    raise
+                expires_at = time.time() + INDEX_RETRY
+                print(f"  Wayback index refresh failed, using stored index: {e}")
+
+        _index = index
+        _dates = [r["date"] for r in index]
+        _expires_at = expires_at
+        return _index
+
+
+def nearest_in(index, target_date, dates=None):
+    """
+    Binary search a sorted index (build_index) for the release closest to
+    target_date (datetime or "YYYY-MM-DD"). Ties go to the earlier release.
+    """
+    if not index:
+        return None
+    if isinstance(target_date, datetime):
+        target_date = target_date.strftime("%Y-%m-%d")
+    if dates is None:
+        dates = [r["date"] for r in index]
+
+    i = bisect.bisect_left(dates, target_date)
+    if i == 0:
+        return index[0]
+    if i == len(index):
+        return index[-1]
+
+    target = datetime.strptime(target_date, "%Y-%m-%d")
+    before, after = index[i - 1], index[i]
+    if target - datetime.strptime(before["date"], "%Y-%m-%d") <= datetime.strptime(after["date"], "%Y-%m-%d") - target:
+        return before
+    return after
+
+
+def nearest_release(target_date):
+    """Release from the local index closest to target_date."""
+    index = load_index()
+    return nearest_in(index, target_date, _dates)
+
+
+def source_for(release):
+    """Register the release with tiles.py and return its tile source name."""
+    name = f"wayback_{release['release']}"
+    if name not in tiles.TILE_SOURCES:
+        tiles.register_source(name, release["url"])
+    return name
+
+
+def fetch_historical(bbox, target_date, width=1024, height=1024):
+    """
+    Mosaic of the Wayback release nearest to target_date over bbox.
+
+    Returns:
+        tuple: (PIL.Image.Image in EPSG:4326, release dict)
+    """
+    release = nearest_release(target_date)
+    print(f"  Wayback release {release['release']} ({release['date']}) for {target_date}")
+    return tiles.fetch_mosaic(source_for(release), bbox, width, height), release
@@ -3,6 +3,15 @@ import { X, Download, ZoomIn, Image as ImageIcon } from 'lucide-react';
 
 const API_URL = (import.meta as any).env?.VITE_API_URL || 'http://localhost:5000';
 
+// Sidecar metadata written next to each fetched image (backend/image_metadata.py)
+interface ImageMetadata {
+    label?: string;
+    source?: string;
+    acquired?: string | [string, string] | null;
+    cloud_pct?: number | null;
+    resolution_m?: number;
+}
+
 interface ImageGalleryProps {
     images?: {
         industrial_area?: string;
@@ -12,7 +21,9 @@ interface ImageGalleryProps {
         encroachment_analysis?: string;
         past_overlay?: string;
         present_overlay?: string;
+        change_map?: string;
     };
+    metadata?: Record<string, ImageMetadata>;
     zone?: string;
 }
 
@@ -23,7 +34,18 @@ interface ImageItem {
     description: string;
 }
 
-export function ImageGallery({ images, zone }: ImageGalleryProps) {
+const formatCaption = (meta?: ImageMetadata) => {
+    if (!meta) return null;
+    const parts = [meta.label];
+    if (meta.acquired) {
+        parts.push(Array.isArray(meta.acquired) ? `${meta.acquired[0]} to ${meta.acquired[1]}` : meta.acquired);
+    }
+    if (meta.cloud_pct != null) parts.push(`${meta.cloud_pct}% masked`);
+    if (meta.resolution_m) parts.push(`${meta.resolution_m} m/px`);
+    return parts.filter(Boolean).join(' · ');
+};
+
+export function ImageGallery({ images, metadata, zone }: ImageGalleryProps) {
     const [lightboxImage, setLightboxImage] = useState<ImageItem | null>(null);
 
     if (!images || Object.values(images).filter(Boolean).length === 0) {
@@ -77,6 +99,12 @@ export function ImageGallery({ images, zone }: ImageGalleryProps) {
             label: 'Present Overlay',
             description: 'Approved boundaries overlaid on current satellite'
         },
+        {
+            key: 'change_map',
+            filename: images.change_map || '',
+            label: 'Change Map',
+            description: 'Pixel changes inside the zone (Red=New construction, Orange=Vegetation loss, Magenta=Other)'
+        },
         {
             key: 'osm',
             filename: images.osm || '',
@@ -143,6 +171,9 @@ export function ImageGallery({ images, zone }: ImageGalleryProps) {
                             <div className="p-4">
                                 <h4 className="font-medium text-gray-900 text-sm mb-1">{item.label}</h4>
                                 <p className="text-xs text-gray-600">{item.description}</p>
+                                {metadata?.[item.key] && (
+                                    <p className="text-xs text-gray-500 mt-1">{formatCaption(metadata[item.key])}</p>
+                                )}
                             </div>
                         </div>
                     ))}
@@ -174,6 +205,9 @@ export function ImageGallery({ images, zone }: ImageGalleryProps) {
                                     <div>
                                         <h3 className="text-lg font-semibold text-gray-900">{lightboxImage.label}</h3>
                                         <p className="text-sm text-gray-600 mt-1">{lightboxImage.description}</p>
+                                        {metadata?.[lightboxImage.key] && (
+                                            <p className="text-xs text-gray-500 mt-1">{formatCaption(metadata[lightboxImage.key])}</p>
+                                        )}
                                     </div>
                                     <button
                                         onClick={() => downloadImage(lightboxImage.filename, lightboxImage.label)}
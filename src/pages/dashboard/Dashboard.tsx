@@ -85,6 +85,7 @@ export default function Dashboard() {
           {/* Image Gallery */}
           <ImageGallery
             images={analysisData.images}
+            metadata={analysisData.image_metadata}
             zone={analysisData.zone}
           />
 
@@ -94,9 +95,9 @@ export default function Dashboard() {
               <h3 className="text-lg font-semibold text-gray-900 mb-4">Technical Metrics</h3>
               <div className="grid grid-cols-2 md:grid-cols-4 gap-4">
                 <div className="bg-gray-50 rounded-lg p-4">
-                  <p className="text-sm text-gray-600 mb-1">Boundary Match</p>
+                  <p className="text-sm text-gray-600 mb-1">New Construction</p>
                   <p className="text-2xl font-bold text-teal-700">
-                    {analysisData.metrics?.match_percentage?.toFixed(1) || 'N/A'}%
+                    {analysisData.metrics?.new_construction_percentage?.toFixed(1) ?? 'N/A'}%
                   </p>
                 </div>
                 <div className="bg-gray-50 rounded-lg p-4">
@@ -112,13 +113,13 @@ export default function Dashboard() {
                 <div className="bg-gray-50 rounded-lg p-4">
                   <p className="text-sm text-gray-600 mb-1">Est. Construction</p>
                   <p className="text-2xl font-bold text-blue-700">
-                    {analysisData.groq_analysis?.construction_percentage || 0}%
+                    {analysisData.groq_analysis?.construction_percentage ?? analysisData.metrics?.construction_percentage ?? 0}%
                   </p>
                 </div>
                 <div className="bg-gray-50 rounded-lg p-4">
                   <p className="text-sm text-gray-600 mb-1">Est. Vegetation</p>
                   <p className="text-2xl font-bold text-green-700">
-                    {analysisData.groq_analysis?.vegetation_percentage || 0}%
+                    {analysisData.groq_analysis?.vegetation_percentage ?? analysisData.metrics?.vegetation_percentage ?? 0}%
                   </p>
                 </div>
               </div>